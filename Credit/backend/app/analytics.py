@@ -0,0 +1,297 @@
+"""
+Portfolio analytics over incrementally maintained prediction rollups
+
+Every prediction insert and delete adjusts the matching prediction_rollups
+bucket (user, day, score band, risk level, decision) in the same transaction,
+so the rollups always agree with the predictions table. Portfolio queries
+read buckets, never predictions: their cost grows with the number of days and
+bands in the requested range, not with the number of predictions.
+
+Rollups for predictions written before the table existed, or after a manual
+edit of the predictions table, are rebuilt with:
+    python -m app.analytics rebuild
+"""
+import argparse
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select, text, update
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+
+logger = logging.getLogger(__name__)
+
+# Width of the credit score bands in the score distribution, and the score range
+SCORE_BAND_WIDTH = 50
+MIN_SCORE = 300
+MAX_SCORE = 850
+
+# Rollup user_id for predictions made without a user
+ANONYMOUS_USER_ID = 0
+
+GRANULARITIES = ("day", "week", "month")
+
+# Decisions counted in the approval rate
+APPROVAL_DECISIONS = frozenset({schemas.Decision.APPROVED.value, schemas.Decision.APPROVED_WITH_CONDITIONS.value})
+
+KEY_COLUMNS = ("user_id", "day", "score_band", "risk_level", "decision")
+SUM_COLUMNS = ("predictions", "score_sum", "loan_amount_sum", "loan_amount_count")
+
+Bucket = Tuple[int, date, int, str, str]
+
+Rollup = models.PredictionRollup
+
+
+def score_band(credit_score: int) -> int:
+    """Lower bound of the band a score falls in; the top score joins the highest band"""
+    score = min(max(int(credit_score), MIN_SCORE), MAX_SCORE - 1)
+    return MIN_SCORE + (score - MIN_SCORE) // SCORE_BAND_WIDTH * SCORE_BAND_WIDTH
+
+
+def _label(value) -> str:
+    # Enum members from PredictionCreate.dict() are stored by value
+    return str(getattr(value, "value", value) or "")
+
+
+def bucket_of(row: dict) -> Bucket:
+    """The rollup bucket a prediction row counts towards"""
+    timestamp = row.get("timestamp") or datetime.utcnow()
+    return (
+        row.get("user_id") or ANONYMOUS_USER_ID,
+        timestamp.date(),
+        score_band(row["credit_score"]),
+        _label(row.get("risk_level")),
+        _label(row.get("decision")),
+    )
+
+
+def accumulate(totals: Dict[Bucket, list], rows: Iterable[dict], sign: int = 1):
+    """Adds each row's contribution to its bucket's [predictions, score_sum, loan_amount_sum, loan_amount_count]"""
+    for row in rows:
+        key = bucket_of(row)
+        sums = totals.get(key)
+        if sums is None:
+            sums = totals[key] = [0, 0, 0.0, 0]
+        sums[0] += sign
+        sums[1] += sign * int(row["credit_score"])
+        loan_amount = row.get("loan_amount")
+        if loan_amount is not None:
+            sums[2] += sign * float(loan_amount)
+            sums[3] += sign
+
+
+def _bucket_rows(totals: Dict[Bucket, list]) -> List[dict]:
+    # Sorted, so concurrent writers lock buckets in the same order and cannot deadlock
+    return [
+        {**dict(zip(KEY_COLUMNS, key)), **dict(zip(SUM_COLUMNS, sums))}
+        for key, sums in sorted(totals.items())
+    ]
+
+
+def apply_rollups(db: Session, rows: Iterable[dict], sign: int = 1):
+    """
+    Adds prediction rows to their rollup buckets (sign=-1 removes them)
+
+    Runs in the caller's transaction and does not commit, so the rollups change
+    exactly when the predictions do. Rows are aggregated per bucket first, so a
+    bulk insert costs one upsert per distinct bucket rather than per row.
+    """
+    totals: Dict[Bucket, list] = {}
+    accumulate(totals, rows, sign)
+    if not totals:
+        return
+    values = _bucket_rows(totals)
+
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        statement = upsert(Rollup).values(values)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(KEY_COLUMNS),
+            set_={column: getattr(Rollup, column) + getattr(statement.excluded, column) for column in SUM_COLUMNS},
+        )
+        db.execute(statement)
+        return
+
+    # Portable fallback: update the bucket, insert it when it does not exist yet
+    for value in values:
+        matched = db.execute(
+            update(Rollup)
+            .where(*(getattr(Rollup, column) == value[column] for column in KEY_COLUMNS))
+            .values({column: getattr(Rollup, column) + value[column] for column in SUM_COLUMNS})
+        )
+        if matched.rowcount == 0:
+            db.execute(insert(Rollup).values(value))
+
+
+def rebuild_rollups(db: Session, batch_size: int = 10000, archive=None) -> int:
+    """
+    Recomputes every rollup bucket from the predictions table
+
+    Streams the predictions in batches of batch_size rows, holding only the
+    bucket totals in memory, then replaces the rollups in one transaction. On
+    PostgreSQL the predictions table is locked against writes meanwhile, so
+    predictions written during the rebuild are neither lost nor counted twice.
+    With an archive (archive.PredictionArchive), archived predictions are
+    counted too and table rows before its watermark are skipped.
+
+    Returns:
+        The number of buckets written
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("LOCK TABLE predictions IN SHARE MODE"))
+
+    P = models.Prediction
+    columns = (P.user_id, P.timestamp, P.credit_score, P.risk_level, P.decision, P.loan_amount)
+    totals: Dict[Bucket, list] = {}
+    query = select(*columns)
+    watermark = archive.watermark() if archive is not None else None
+    if watermark is not None:
+        query = query.where(P.timestamp >= watermark)
+        for batch in archive.iter_batches(batch_size):
+            accumulate(totals, batch)
+    result = db.execute(query.execution_options(yield_per=batch_size))
+    for partition in result.mappings().partitions():
+        accumulate(totals, partition)
+
+    db.execute(delete(Rollup))
+    values = _bucket_rows(totals)
+    for start in range(0, len(values), batch_size):
+        db.execute(insert(Rollup), values[start:start + batch_size])
+    db.commit()
+    return len(values)
+
+
+def period_start(day: date, granularity: str) -> date:
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def is_approval(decision: str) -> bool:
+    return decision in APPROVAL_DECISIONS
+
+
+def portfolio_summary(
+    db: Session,
+    user_id: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    granularity: str = "day",
+) -> dict:
+    """
+    Score distribution, approval rate, risk-level mix and average loan amount
+
+    Args:
+        user_id: Restrict to one user's predictions; None covers every user
+        start, end: Inclusive range of days; open-ended when None
+        granularity: Period of the time series, one of GRANULARITIES
+
+    Returns:
+        Totals over the range and one entry per period with predictions
+
+    Raises:
+        ValueError: If the granularity is unknown or the range is empty
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity '{granularity}', expected one of {list(GRANULARITIES)}")
+    if start is not None and end is not None and start > end:
+        raise ValueError("start must not be after end")
+
+    keys = (Rollup.day, Rollup.score_band, Rollup.risk_level, Rollup.decision)
+    query = select(*keys, *(func.sum(getattr(Rollup, column)) for column in SUM_COLUMNS))
+    if user_id is not None:
+        query = query.where(Rollup.user_id == user_id)
+    if start is not None:
+        query = query.where(Rollup.day >= start)
+    if end is not None:
+        query = query.where(Rollup.day <= end)
+    query = query.group_by(*keys)
+
+    total = _Totals()
+    periods: Dict[date, _Totals] = defaultdict(_Totals)
+    bands: Dict[int, int] = defaultdict(int)
+    for day, band, risk_level, decision, count, score_sum, loan_sum, loan_count in db.execute(query):
+        if not count:
+            continue
+        for totals in (total, periods[period_start(day, granularity)]):
+            totals.add(risk_level, decision, count, score_sum, loan_sum, loan_count)
+        bands[band] += count
+
+    return {
+        "granularity": granularity,
+        "start": start,
+        "end": end,
+        **total.summary(),
+        "risk_levels": dict(total.risk_levels),
+        "decisions": dict(total.decisions),
+        "score_distribution": [
+            {"band_start": band, "band_end": band + SCORE_BAND_WIDTH - 1, "predictions": bands[band]}
+            for band in sorted(bands)
+        ],
+        "periods": [
+            {"period": period, **periods[period].summary(), "risk_levels": dict(periods[period].risk_levels)}
+            for period in sorted(periods)
+        ],
+    }
+
+
+class _Totals:
+    __slots__ = ("predictions", "approved", "score_sum", "loan_amount_sum", "loan_amount_count", "risk_levels", "decisions")
+
+    def __init__(self):
+        self.predictions = self.approved = self.score_sum = self.loan_amount_count = 0
+        self.loan_amount_sum = 0.0
+        self.risk_levels: Dict[str, int] = defaultdict(int)
+        self.decisions: Dict[str, int] = defaultdict(int)
+
+    def add(self, risk_level: str, decision: str, count: int, score_sum, loan_sum, loan_count):
+        self.predictions += count
+        self.score_sum += score_sum or 0
+        self.loan_amount_sum += loan_sum or 0.0
+        self.loan_amount_count += loan_count or 0
+        self.risk_levels[risk_level] += count
+        self.decisions[decision] += count
+        if is_approval(decision):
+            self.approved += count
+
+    def summary(self) -> dict:
+        return {
+            "predictions": self.predictions,
+            "approval_rate": self.approved / self.predictions if self.predictions else 0.0,
+            "average_score": self.score_sum / self.predictions if self.predictions else None,
+            "average_loan_amount": (
+                self.loan_amount_sum / self.loan_amount_count if self.loan_amount_count else None
+            ),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prediction rollup maintenance")
+    parser.add_argument("command", choices=["rebuild"], help="rebuild: recompute the rollups from predictions")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Prediction rows read per batch")
+    args = parser.parse_args()
+
+    from .archive import create_archive
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        started = datetime.utcnow()
+        buckets = rebuild_rollups(db, batch_size=args.batch_size, archive=create_archive())
+        logger.info(f"Rebuilt {buckets} rollup buckets in {(datetime.utcnow() - started).total_seconds():.1f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,461 @@
+"""
+Archival of cold prediction history to date-partitioned Parquet files
+
+The predictions table keeps recent predictions only. An archival run moves the
+rows older than PREDICTION_RETENTION_DAYS into one directory per day under
+PREDICTION_ARCHIVE_DIR:
+    day=2025-01-31/part-<first id>-<last id>.parquet
+Rows are streamed from a server-side cursor in id order and appended batch by
+batch to one file per day, with only the latest few days' files open, so memory
+and open files are bounded by the batch size rather than the table size (see
+DayFileWriter).
+
+manifest.json lists the archived files and the watermark: every prediction
+before it is in the archive, every prediction from it on is in the table.
+Readers split on the watermark, so no row is seen twice or missed while a run
+is in progress. A run writes its files, publishes them with the new watermark
+in one atomic replace of the manifest, and only then deletes the archived rows
+from the table; the next run finishes an interrupted delete. Timestamps are
+assigned at insert, so no prediction can arrive below the watermark later.
+
+Rollups are not decremented for archived rows, so portfolio analytics still
+cover the whole history; `python -m app.analytics rebuild` reads the archive too.
+
+Run from Credit/backend:
+    python -m app.archive run [--retention-days 90] [--batch-size 10000]
+    python -m app.archive stats
+"""
+import argparse
+import json
+import logging
+import os
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+# Directory of the archive; empty keeps every prediction in the table
+PREDICTION_ARCHIVE_DIR = os.getenv("PREDICTION_ARCHIVE_DIR", "")
+# Predictions older than this many days are archived, in whole days
+PREDICTION_RETENTION_DAYS = int(os.getenv("PREDICTION_RETENTION_DAYS", "90"))
+# Rows fetched from the cursor, written and deleted per step
+PREDICTION_ARCHIVE_BATCH_SIZE = int(os.getenv("PREDICTION_ARCHIVE_BATCH_SIZE", "10000"))
+# Day files an archival run keeps open at once (one Parquet writer and descriptor each)
+MAX_OPEN_DAY_FILES = int(os.getenv("PREDICTION_ARCHIVE_OPEN_FILES", "4"))
+
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+
+COLUMNS = (
+    "id", "user_id", "timestamp", "client_name", "credit_score", "risk_level", "decision",
+    "income", "loan_amount", "interest_rate", "employment", "loan_purpose",
+)
+
+
+def arrow_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.int64()),
+        ("user_id", pa.int64()),
+        ("timestamp", pa.timestamp("us")),
+        ("client_name", pa.string()),
+        ("credit_score", pa.int64()),
+        ("risk_level", pa.string()),
+        ("decision", pa.string()),
+        ("income", pa.float64()),
+        ("loan_amount", pa.float64()),
+        ("interest_rate", pa.float64()),
+        ("employment", pa.string()),
+        ("loan_purpose", pa.string()),
+    ])
+
+
+def _label(value):
+    # Enum members from PredictionCreate.dict() are stored by value
+    return getattr(value, "value", value)
+
+
+class PredictionArchive:
+    """
+    Reader and writer of an archive directory
+
+    The manifest is re-read whenever its file changes, so API processes see the
+    result of an archival run without restarting.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._manifest: Optional[dict] = None
+        self._mtime: Optional[float] = None
+
+    def manifest(self) -> dict:
+        path = os.path.join(self.root, MANIFEST)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return {"format": FORMAT_VERSION, "watermark": None, "files": []}
+        if mtime != self._mtime:
+            with open(path) as f:
+                manifest = json.load(f)
+            if manifest.get("format") != FORMAT_VERSION:
+                raise ValueError(f"Unsupported archive format {manifest.get('format')} in {path}")
+            self._manifest, self._mtime = manifest, mtime
+        return self._manifest
+
+    def watermark(self) -> Optional[datetime]:
+        """Every prediction before this time is archived; None when nothing is"""
+        value = self.manifest()["watermark"]
+        return datetime.fromisoformat(value) if value else None
+
+    def max_id(self) -> Optional[int]:
+        """Highest archived prediction id; None when nothing is archived"""
+        return max((entry["max_id"] for entry in self.manifest()["files"]), default=None)
+
+    def publish(self, manifest: dict):
+        """Atomically replaces the manifest"""
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, MANIFEST)
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=1)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+    def writer(self) -> "DayFileWriter":
+        return DayFileWriter(self.root, MAX_OPEN_DAY_FILES)
+
+    def remove_unpublished(self) -> int:
+        """Deletes part files no manifest lists, left by a run that stopped before publishing"""
+        listed = {entry["path"] for entry in self.manifest()["files"]}
+        removed = 0
+        if not os.path.isdir(self.root):
+            return removed
+        for day_dir in os.listdir(self.root):
+            if not day_dir.startswith("day="):
+                continue
+            for name in os.listdir(os.path.join(self.root, day_dir)):
+                if os.path.join(day_dir, name) not in listed:
+                    os.remove(os.path.join(self.root, day_dir, name))
+                    removed += 1
+        return removed
+
+    def _paths(self, entries: List[dict]) -> List[str]:
+        return [os.path.join(self.root, entry["path"]) for entry in entries]
+
+    def page(
+        self,
+        user_id: int,
+        limit: int,
+        order_by: str = "timestamp",
+        order_direction: str = "desc",
+        after: Optional[Tuple[object, int]] = None,
+    ) -> List[dict]:
+        """
+        Up to limit of a user's archived predictions following the (value, id) key after
+
+        Ordered like crud.get_predictions_page. Only the sort key and id columns are
+        scanned to pick the page, with the user and cursor filters pushed down to the
+        row groups; whole rows are then read for the picked ids alone. Ordered by
+        timestamp, days are scanned newest (or oldest) first and scanning stops once
+        the page is full.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+
+        descending = order_direction == "desc"
+        days: Dict[str, List[dict]] = defaultdict(list)
+        for entry in self.manifest()["files"]:
+            days[entry["day"]].append(entry)
+        if order_by == "timestamp":
+            groups = [days[day] for day in sorted(days, reverse=descending)]
+            if after is not None:
+                cursor_day = after[0].date().isoformat()
+                groups = [
+                    group for group in groups
+                    if (group[0]["day"] <= cursor_day if descending else group[0]["day"] >= cursor_day)
+                ]
+        else:
+            groups = [[entry for group in days.values() for entry in group]]
+
+        owner = ds.field("user_id") == user_id
+        condition = owner
+        if after is not None:
+            value, last_id = after
+            column, ids = ds.field(order_by), ds.field("id")
+            if descending:
+                condition &= (column < value) | ((column == value) & (ids < last_id))
+            else:
+                condition &= (column > value) | ((column == value) & (ids > last_id))
+        direction = "descending" if descending else "ascending"
+        sort_keys = [(order_by, direction), ("id", direction)]
+
+        candidates = []
+        found = 0
+        for group in groups:
+            for entry in group:
+                keys = pq.read_table(os.path.join(self.root, entry["path"]), columns=[order_by, "id"], filters=condition)
+                if keys.num_rows:
+                    keys = keys.take(pc.select_k_unstable(keys, k=limit, sort_keys=sort_keys))
+                    candidates.append(keys.append_column("path", pa.array([entry["path"]] * keys.num_rows)))
+                    found += keys.num_rows
+            if order_by == "timestamp" and found >= limit:
+                break
+        if not candidates:
+            return []
+        keys = pa.concat_tables(candidates)
+        keys = keys.take(pc.select_k_unstable(keys, k=limit, sort_keys=sort_keys))
+
+        picked: Dict[str, list] = defaultdict(list)
+        for path, row_id in zip(keys["path"].to_pylist(), keys["id"].to_pylist()):
+            picked[path].append(row_id)
+        tables = []
+        for path, row_ids in picked.items():
+            # The id range lets row-group statistics skip the batches holding none of them
+            ids = ds.field("id")
+            picked_rows = owner & (ids >= min(row_ids)) & (ids <= max(row_ids)) & ids.isin(row_ids)
+            tables.append(pq.read_table(os.path.join(self.root, path), schema=arrow_schema(), filters=picked_rows))
+        return pa.concat_tables(tables).sort_by(sort_keys).to_pylist()
+
+    def iter_batches(self, batch_size: int = PREDICTION_ARCHIVE_BATCH_SIZE) -> Iterator[List[dict]]:
+        """Every archived prediction, batch_size rows at a time"""
+        import pyarrow.parquet as pq
+
+        for path in self._paths(self.manifest()["files"]):
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+                yield batch.to_pylist()
+
+    def stats(self) -> dict:
+        manifest = self.manifest()
+        files = manifest["files"]
+        return {
+            "watermark": manifest["watermark"],
+            "files": len(files),
+            "days": len({entry["day"] for entry in files}),
+            "rows": sum(entry["rows"] for entry in files),
+            "bytes": sum(entry["bytes"] for entry in files),
+            "unpurged_files": sum(not entry["purged"] for entry in files),
+        }
+
+
+class DayFileWriter:
+    """
+    Writes streamed rows (in COLUMNS order) to Parquet files, one per day
+
+    Each write() appends the batch to its days' files as row groups sorted by
+    user, so Parquet statistics skip other users' rows, and keeps nothing else in
+    memory. Rows arrive in id order, which follows the days, so only the latest
+    few days have a file open; at most max_open_files are, and a day that turns up
+    again after its file was finished gets another part. Files are named after
+    their first and last id when finished, so writing the same rows again, as a
+    run retried after a crash does, replaces the same files.
+    """
+
+    def __init__(self, root: str, max_open_files: int = MAX_OPEN_DAY_FILES):
+        self.root = root
+        self.max_open_files = max(max_open_files, 1)
+        # day -> [ParquetWriter, temporary path, rows, first id, last id], least recently written first
+        self._days: "OrderedDict[str, list]" = OrderedDict()
+        self._entries: List[dict] = []
+
+    def write(self, rows: List[tuple]):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        by_day: Dict[str, List[tuple]] = defaultdict(list)
+        for row in rows:
+            by_day[row[2].date().isoformat()].append(row)
+
+        schema = arrow_schema()
+        for day, day_rows in by_day.items():
+            day_rows.sort(key=lambda row: (row[1] is None, row[1] or 0, row[2], row[0]))
+            columns = list(zip(*day_rows))
+            table = pa.table(
+                [pa.array([_label(value) for value in column], type=field.type) for column, field in zip(columns, schema)],
+                schema=schema,
+            )
+            state = self._days.get(day)
+            if state is None:
+                if len(self._days) >= self.max_open_files:
+                    self._finish(*self._days.popitem(last=False))
+                path = os.path.join(self.root, f"day={day}", "part.parquet.tmp")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                state = self._days[day] = [pq.ParquetWriter(path, schema, compression="zstd"), path, 0, None, None]
+            else:
+                self._days.move_to_end(day)
+            state[0].write_table(table, row_group_size=8192)
+            state[2] += len(day_rows)
+            first_id, last_id = min(columns[0]), max(columns[0])
+            state[3] = first_id if state[3] is None else min(state[3], first_id)
+            state[4] = last_id if state[4] is None else max(state[4], last_id)
+
+    def open_files(self) -> int:
+        return len(self._days)
+
+    def _finish(self, day: str, state: list):
+        writer, temporary, rows, first_id, last_id = state
+        writer.close()
+        relative = os.path.join(f"day={day}", f"part-{first_id}-{last_id}.parquet")
+        path = os.path.join(self.root, relative)
+        os.replace(temporary, path)
+        self._entries.append({
+            "path": relative, "day": day, "rows": rows, "min_id": first_id, "max_id": last_id,
+            "bytes": os.path.getsize(path), "purged": False,
+        })
+
+    def close(self) -> List[dict]:
+        """Finishes the open files and returns the manifest entries of every file written"""
+        while self._days:
+            self._finish(*self._days.popitem(last=False))
+        entries = sorted(self._entries, key=lambda entry: (entry["day"], entry["min_id"]))
+        self._entries = []
+        return entries
+
+    def abort(self):
+        for writer, temporary, *_ in self._days.values():
+            writer.close()
+            os.remove(temporary)
+        for entry in self._entries:
+            os.remove(os.path.join(self.root, entry["path"]))
+        self._days = OrderedDict()
+        self._entries = []
+
+
+def retention_cutoff(retention_days: int = PREDICTION_RETENTION_DAYS, now: Optional[datetime] = None) -> datetime:
+    """Start of the oldest day kept in the table"""
+    today = (now or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=retention_days)
+
+
+def purge_archived(db: Session, archive: PredictionArchive, batch_size: int = PREDICTION_ARCHIVE_BATCH_SIZE) -> int:
+    """
+    Deletes the rows of published but not yet purged files from the table
+
+    Deletes walk each file's id range batch_size ids at a time through the primary
+    key, one commit per step, so no long transaction or table scan is needed.
+
+    Returns:
+        The number of rows deleted
+    """
+    manifest = archive.manifest()
+    watermark = archive.watermark()
+    pending = [entry for entry in manifest["files"] if not entry["purged"]]
+    if not pending:
+        return 0
+
+    P = models.Prediction
+    deleted = 0
+    for entry in pending:
+        for start in range(entry["min_id"], entry["max_id"] + 1, batch_size):
+            end = min(start + batch_size - 1, entry["max_id"])
+            result = db.execute(delete(P).where(and_(P.id >= start, P.id <= end, P.timestamp < watermark)))
+            deleted += result.rowcount
+            db.commit()
+    archive.publish({
+        **manifest,
+        "files": [{**entry, "purged": True} for entry in manifest["files"]],
+    })
+    return deleted
+
+
+def archive_predictions(
+    db: Session,
+    archive: PredictionArchive,
+    before: datetime,
+    batch_size: int = PREDICTION_ARCHIVE_BATCH_SIZE,
+) -> dict:
+    """
+    Moves predictions timestamped before `before` from the table to the archive
+
+    Returns:
+        Counts of the rows archived and deleted and the files written
+
+    Raises:
+        ValueError: If before is earlier than the archive's watermark
+    """
+    # Finish an interrupted run first, so its rows are not archived twice
+    purged = purge_archived(db, archive, batch_size)
+    removed = archive.remove_unpublished()
+    if removed:
+        logger.info(f"Removed {removed} unpublished files of an interrupted run")
+
+    manifest = archive.manifest()
+    watermark = archive.watermark()
+    if watermark is not None and before < watermark:
+        raise ValueError(f"Cannot archive before {before.isoformat()}: already archived up to {watermark.isoformat()}")
+
+    P = models.Prediction
+    query = select(*(getattr(P, column) for column in COLUMNS)).where(P.timestamp < before)
+    if watermark is not None:
+        query = query.where(P.timestamp >= watermark)
+    query = query.order_by(P.id).execution_options(yield_per=batch_size)
+
+    writer = archive.writer()
+    result = db.execute(query)
+    try:
+        for partition in result.partitions():
+            writer.write(partition)
+        entries = writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        result.close()
+        # End the read transaction: on SQLite it would block the deletes' commits
+        db.rollback()
+
+    archive.publish({
+        **manifest,
+        "watermark": before.isoformat(),
+        "files": manifest["files"] + entries,
+    })
+    purged += purge_archived(db, archive, batch_size)
+    return {
+        "archived": sum(entry["rows"] for entry in entries),
+        "deleted": purged,
+        "files": len(entries),
+        "watermark": before.isoformat(),
+    }
+
+
+def create_archive(root: str = PREDICTION_ARCHIVE_DIR) -> Optional[PredictionArchive]:
+    """The archive when PREDICTION_ARCHIVE_DIR is set, otherwise None"""
+    if not root:
+        return None
+    return PredictionArchive(root)
+
+
+def main(argv: Optional[List[str]] = None):
+    from .database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["run", "stats"])
+    parser.add_argument("--dir", default=PREDICTION_ARCHIVE_DIR, help="Archive directory (PREDICTION_ARCHIVE_DIR)")
+    parser.add_argument("--retention-days", type=int, default=PREDICTION_RETENTION_DAYS)
+    parser.add_argument("--batch-size", type=int, default=PREDICTION_ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    archive = create_archive(args.dir)
+    if archive is None:
+        parser.error("set PREDICTION_ARCHIVE_DIR or pass --dir")
+    if args.command == "stats":
+        logger.info(archive.stats())
+        return
+
+    with SessionLocal() as db:
+        started = datetime.utcnow()
+        summary = archive_predictions(db, archive, retention_cutoff(args.retention_days), args.batch_size)
+        logger.info(f"{summary} in {(datetime.utcnow() - started).total_seconds():.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import logging
+from .cache import TTLCache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -16,8 +17,22 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
 PASSWORD_RESET_TOKEN_EXPIRE_HOURS = 1
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Verified token payloads and resolved users, keyed by the raw bearer token.
+# Entries never outlive the token's own exp claim.
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", "300"))
+token_cache = TTLCache(max_size=AUTH_CACHE_SIZE, default_ttl=AUTH_CACHE_TTL_SECONDS)
+user_cache = TTLCache(max_size=AUTH_CACHE_SIZE, default_ttl=AUTH_CACHE_TTL_SECONDS)
+
+# Password hashing; lower BCRYPT_ROUNDS in development and test environments only
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# Users allowed to read data across all users, e.g. portfolio analytics with scope=all.
+# Comma-separated emails; empty means nobody.
+ADMIN_EMAILS = frozenset(
+    email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()
+)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a hashed version"""
@@ -69,6 +84,27 @@ def create_refresh_token(data: dict, expires_delta: timedelta = None) -> str:
     logger.info(f"Created refresh token expiring at {expire}")
     return encoded_jwt
 
+def decode_token(token: str) -> Optional[dict]:
+    """
+    Decodes and verifies a JWT, reusing the payload of tokens verified before
+    
+    Args:
+        token: JWT token to decode
+        
+    Returns:
+        The token payload if the signature and expiry are valid, None otherwise
+    """
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError as e:
+        logger.error(f"Token verification failed: {str(e)}")
+        return None
+    token_cache.set(token, payload, expires_at=payload.get("exp"))
+    return payload
+
 async def verify_token(token: str, token_type: str = "access") -> Optional[str]:
     """
     Verifies a JWT token and returns the email if valid
@@ -80,20 +116,38 @@ async def verify_token(token: str, token_type: str = "access") -> Optional[str]:
     Returns:
         Email from the token if valid, None otherwise
     """
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        token_type_check: str = payload.get("type")
-        
-        if email is None or token_type_check != token_type:
-            logger.warning(f"Invalid token payload: email={email}, type={token_type_check}")
-            return None
-            
-        logger.info(f"Verified {token_type} token for {email}")
-        return email
-    except JWTError as e:
-        logger.error(f"Token verification failed: {str(e)}")
+    payload = decode_token(token)
+    if payload is None:
+        return None
+
+    email: str = payload.get("sub")
+    token_type_check: str = payload.get("type")
+    
+    if email is None or token_type_check != token_type:
+        logger.warning(f"Invalid token payload: email={email}, type={token_type_check}")
         return None
+        
+    return email
+
+def get_cached_user(token: str):
+    """Returns the user previously resolved for this token, if still cached"""
+    return user_cache.get(token)
+
+def cache_user(token: str, user):
+    """Caches the user resolved for a verified token until the token expires"""
+    payload = token_cache.peek(token)
+    user_cache.set(token, user, expires_at=payload.get("exp") if payload else None)
+
+def invalidate_cached_user(user_id: int) -> int:
+    """Drops every cached entry for a user, e.g. after their account changed"""
+    return user_cache.delete_where(lambda token, user: user.id == user_id)
+
+def auth_cache_stats() -> dict:
+    return {"tokens": token_cache.stats(), "users": user_cache.stats()}
+
+def is_admin(user) -> bool:
+    """Whether the user may read data across all users"""
+    return user.email.lower() in ADMIN_EMAILS
 
 def create_password_reset_token(email: str) -> str:
     """
@@ -0,0 +1,224 @@
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import metrics
+from .concurrency import INFERENCE_WORKERS, run_inference
+from .scoring import ScoringModel
+
+logger = logging.getLogger(__name__)
+
+# Coalesce concurrent /predict calls into one model call per batch
+PREDICT_BATCHING = os.getenv("PREDICT_BATCHING", "false").lower() in ("1", "true", "yes")
+# Largest batch, and the longest a request waits for others to join it
+PREDICT_BATCH_MAX_SIZE = int(os.getenv("PREDICT_BATCH_MAX_SIZE", "64"))
+PREDICT_BATCH_MAX_WAIT_MS = float(os.getenv("PREDICT_BATCH_MAX_WAIT_MS", "2"))
+# Upper bound on waiting plus expected scoring time that batching may add to a request
+PREDICT_BATCH_LATENCY_BUDGET_MS = float(os.getenv("PREDICT_BATCH_LATENCY_BUDGET_MS", "10"))
+
+# Weight of the newest batch in the running estimate of scoring time
+SCORING_TIME_SMOOTHING = 0.2
+
+
+def records_to_columns(scoring_model: ScoringModel, records: List[dict]) -> Dict[str, np.ndarray]:
+    """Stacks preprocess_record outputs into the columnar form the batch path scores"""
+    columns = {}
+    for col in records[0]:
+        values = [record[col] for record in records]
+        columns[col] = np.array(values, dtype=float if col in scoring_model.num_cols else object)
+    return columns
+
+
+def score_records(scoring_model: ScoringModel, records: List[dict]) -> Tuple[np.ndarray, Dict[int, str], float]:
+    """
+    Scores preprocessed records with one model call; runs on the inference executor
+
+    Returns:
+        Default probabilities of the accepted rows in order, an error message per
+        rejected row, and the seconds spent encoding and scoring
+    """
+    started = time.perf_counter()
+    encoded, errors = scoring_model.encode_categorical_batch(records_to_columns(scoring_model, records))
+    if errors:
+        keep = np.ones(len(records), dtype=bool)
+        keep[list(errors)] = False
+        encoded = {col: values[keep] for col, values in encoded.items()}
+    probabilities = scoring_model.predict_default_probabilities(encoded, len(records) - len(errors))
+    return probabilities, errors, time.perf_counter() - started
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-application predictions into batch model calls
+
+    A request joins the pending batch and the batch is dispatched to the
+    inference executor as soon as any of these holds:
+    - the scorer is idle (fewer than max_in_flight batches running), so a lone
+      request is never held back;
+    - the batch has max_batch_size requests;
+    - the oldest request has waited the flush delay (checked by a timer and on
+      every arrival, since the timer fires late when the event loop is busy).
+
+    The flush delay is max_wait, shortened so that waiting plus the running
+    estimate of batch scoring time stays within latency_budget. While batches
+    are running, requests that arrive meanwhile queue up behind them, so batches
+    grow with load and the executor hop, encoding setup and model call are paid
+    once per batch rather than once per request.
+
+    Requests scored against different model versions are never mixed: a request
+    for another version flushes the pending batch first. Rows the encoder
+    rejects fail only their own request, with a ValueError as on the unbatched
+    path.
+    """
+
+    def __init__(
+        self,
+        max_batch_size: int = 64,
+        max_wait: float = 0.002,
+        latency_budget: float = 0.010,
+        max_in_flight: int = 1,
+    ):
+        if max_wait > latency_budget:
+            raise ValueError(f"Batch wait {max_wait * 1000}ms exceeds the latency budget {latency_budget * 1000}ms")
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.latency_budget = latency_budget
+        self.max_in_flight = max_in_flight
+
+        self._pending: List[tuple] = []
+        self._pending_model: Optional[ScoringModel] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+        self.in_flight = 0
+        self.scoring_seconds_estimate = 0.0
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+        self.max_wait_seconds = 0.0
+
+    async def predict(self, scoring_model: ScoringModel, features: dict) -> Tuple[float, float]:
+        """
+        Probability of default for one preprocessed application
+
+        Returns:
+            The probability and the seconds its batch took to encode and score
+
+        Raises:
+            ValueError: If the encoder rejects the application
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if self._pending and self._pending_model is not scoring_model:
+            self._flush()
+        self._pending.append((features, future, time.perf_counter()))
+        self._pending_model = scoring_model
+
+        if (
+            len(self._pending) >= self.max_batch_size
+            or self.in_flight < self.max_in_flight
+            # The timer is late when the event loop is busy; do not let it hold the batch back
+            or time.perf_counter() - self._pending[0][2] >= self.flush_delay()
+        ):
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.flush_delay(), self._flush)
+
+        prob_default, seconds, waited = await future
+        metrics.record_stage("batch_wait", waited)
+        metrics.record_stage("predict", seconds)
+        return prob_default, seconds
+
+    def flush_delay(self) -> float:
+        return max(0.0, min(self.max_wait, self.latency_budget - self.scoring_seconds_estimate))
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, scoring_model = self._pending, self._pending_model
+        self._pending, self._pending_model = [], None
+        self.in_flight += 1
+        flushed = time.perf_counter()
+        # A fresh context, so the batch is not attributed to whichever request flushed it
+        task = contextvars.Context().run(
+            asyncio.get_running_loop().create_task, self._score(scoring_model, batch, flushed)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _score(self, scoring_model: ScoringModel, batch: List[tuple], flushed: float):
+        try:
+            probabilities, errors, seconds = await run_inference(
+                score_records, scoring_model, [features for features, _, _ in batch]
+            )
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.in_flight -= 1
+            if self._pending and self.in_flight < self.max_in_flight:
+                self._flush()
+
+        self.batches += 1
+        self.rows += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        self.scoring_seconds_estimate += SCORING_TIME_SMOOTHING * (seconds - self.scoring_seconds_estimate)
+        metrics.inference_batch_rows.observe(len(batch), "predict")
+
+        position = 0
+        for row, (_, future, enqueued) in enumerate(batch):
+            waited = flushed - enqueued
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            if row in errors:
+                result = None
+            else:
+                result = (float(probabilities[position]), seconds, waited)
+                position += 1
+            if future.done():
+                continue
+            if result is None:
+                future.set_exception(ValueError(errors[row]))
+            else:
+                future.set_result(result)
+
+    async def stop(self):
+        """Dispatches whatever is pending and waits for running batches"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "latency_budget_ms": self.latency_budget * 1000,
+            "batches": self.batches,
+            "rows": self.rows,
+            "avg_batch_size": round(self.rows / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "in_flight": self.in_flight,
+            "pending": len(self._pending),
+            "scoring_ms_estimate": round(self.scoring_seconds_estimate * 1000, 3),
+            "max_wait_observed_ms": round(self.max_wait_seconds * 1000, 3),
+        }
+
+
+def create_batcher() -> Optional[MicroBatcher]:
+    """The /predict batcher configured from the environment, or None when batching is off"""
+    if not PREDICT_BATCHING:
+        return None
+    return MicroBatcher(
+        max_batch_size=PREDICT_BATCH_MAX_SIZE,
+        max_wait=PREDICT_BATCH_MAX_WAIT_MS / 1000,
+        latency_budget=PREDICT_BATCH_LATENCY_BUDGET_MS / 1000,
+        max_in_flight=max(INFERENCE_WORKERS, 1),
+    )
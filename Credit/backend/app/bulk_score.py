@@ -0,0 +1,407 @@
+"""
+Offline bulk scoring of a CSV or Parquet portfolio file
+
+Streams the input in fixed-size chunks, scores each chunk with the same
+preprocessing, category encoding and scorer as the API, and appends the results
+(score, risk level, decision, key factors) to the output before reading the next
+chunk, so peak memory is bounded by the chunk size rather than the file size.
+After every chunk a checkpoint is written next to the output; --resume continues
+from the last completed chunk.
+
+Input columns may use either the API field names (loanAmount, industrySector, ...)
+or the model feature names (loan_amount, industry_sector, ...).
+
+Output is a CSV file, or a directory of Parquet part files (one per chunk) when
+the output path ends in .parquet.
+
+With --workers N chunks are scored on N processes (see parallel_scoring) while
+reading, writing and checkpointing stay in input order in the main process.
+
+Run from Credit/backend:
+    python -m app.bulk_score portfolio.csv scores.csv --chunk-size 50000
+    python -m app.bulk_score portfolio.parquet scores.parquet --resume
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .scoring import (
+    FEATURE_MAPPING, current_model, calculate_credit_scores, determine_risk_levels, determine_decisions,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 50000
+
+OUTPUT_COLUMNS = [
+    "row", "client_name", "credit_score", "risk_level", "decision",
+    "approval_probability", "key_factors", "error",
+]
+
+
+def is_parquet(path: str) -> bool:
+    return path.lower().endswith((".parquet", ".pq"))
+
+
+def checkpoint_path(output_path: str) -> str:
+    return output_path.rstrip("/\\") + ".checkpoint.json"
+
+
+def resolve_columns(available: List[str], id_column: Optional[str]) -> Dict[str, str]:
+    """
+    Maps each API form field to the input column holding it
+
+    Raises:
+        ValueError: If a feature is present under neither its API nor its model name
+    """
+    source = {}
+    missing = []
+    for form_field, model_feature in FEATURE_MAPPING.items():
+        if form_field in available:
+            source[form_field] = form_field
+        elif model_feature in available:
+            source[form_field] = model_feature
+        else:
+            missing.append(form_field)
+    if missing:
+        raise ValueError(f"Input is missing columns: {', '.join(missing)}")
+    if id_column and id_column in available:
+        source["client_name"] = id_column
+    return source
+
+
+def read_csv_columns(path: str) -> List[str]:
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def read_parquet_columns(path: str) -> List[str]:
+    import pyarrow.parquet as pq
+
+    return pq.ParquetFile(path).schema_arrow.names
+
+
+def iter_csv_chunks(path: str, source: Dict[str, str], chunk_size: int, skip_rows: int) -> Iterator[pd.DataFrame]:
+    num_cols = current_model().num_cols
+    categorical = [column for field, column in source.items() if FEATURE_MAPPING.get(field) not in num_cols]
+    reader = pd.read_csv(
+        path,
+        usecols=sorted(set(source.values())),
+        dtype={column: str for column in categorical},
+        chunksize=chunk_size,
+        # A callable keeps memory flat however many rows were already scored
+        skiprows=(lambda line: 0 < line <= skip_rows) if skip_rows else None,
+    )
+    with reader:
+        yield from reader
+
+
+def iter_parquet_chunks(path: str, source: Dict[str, str], chunk_size: int, skip_rows: int) -> Iterator[pd.DataFrame]:
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    # Skip whole row groups that were already scored, then trim inside the first remaining one
+    first_group, group_start = 0, 0
+    metadata = parquet_file.metadata
+    while first_group < metadata.num_row_groups and group_start + metadata.row_group(first_group).num_rows <= skip_rows:
+        group_start += metadata.row_group(first_group).num_rows
+        first_group += 1
+    if first_group == metadata.num_row_groups:
+        return
+    trim = skip_rows - group_start
+
+    batches = parquet_file.iter_batches(
+        batch_size=chunk_size,
+        columns=sorted(set(source.values())),
+        row_groups=range(first_group, metadata.num_row_groups),
+    )
+    for batch in batches:
+        if trim:
+            dropped = min(trim, batch.num_rows)
+            batch = batch.slice(dropped)
+            trim -= dropped
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+def serialize_key_factors(factors: List[dict]) -> List[str]:
+    """JSON-encodes key factors, reusing the text for the (few) distinct combinations"""
+    cache: Dict[tuple, str] = {}
+    encoded = []
+    for item in factors:
+        key = (tuple(item["positive"]), tuple(item["negative"]))
+        text = cache.get(key)
+        if text is None:
+            text = cache[key] = json.dumps(item)
+        encoded.append(text)
+    return encoded
+
+
+def score_chunk(frame: pd.DataFrame, source: Dict[str, str], first_row: int) -> pd.DataFrame:
+    """
+    Scores one chunk of raw input rows
+
+    Rows with missing or non-numeric numeric features, and rows whose categories
+    the unseen-category policy rejects, are kept in the output with an error and
+    no score.
+    """
+    scoring_model = current_model()
+    n_rows = len(frame)
+    raw = {}
+    errors: Dict[int, str] = {}
+    for form_field, model_feature in FEATURE_MAPPING.items():
+        values = frame[source[form_field]]
+        if model_feature in scoring_model.num_cols:
+            values = pd.to_numeric(values, errors="coerce")
+            for row in np.flatnonzero(~np.isfinite(values.to_numpy(dtype=float))):
+                errors.setdefault(int(row), f"{form_field}: missing or not a number")
+        raw[form_field] = values.to_numpy()
+
+    columns = scoring_model.preprocess_columns(raw)
+    unseen_masks: Dict[str, np.ndarray] = {}
+    encoded, encoding_errors = scoring_model.encode_categorical_batch(columns, unseen_masks)
+    for row, message in encoding_errors.items():
+        errors.setdefault(row, message)
+
+    keep = np.ones(n_rows, dtype=bool)
+    if errors:
+        keep[list(errors)] = False
+        encoded = {col: values[keep] for col, values in encoded.items()}
+        columns = {col: values[keep] for col, values in columns.items()}
+        unseen_masks = {col: mask[keep] for col, mask in unseen_masks.items()}
+    n_scored = int(keep.sum())
+
+    credit_score = np.full(n_rows, None, dtype=object)
+    risk_level = np.full(n_rows, None, dtype=object)
+    decision = np.full(n_rows, None, dtype=object)
+    approval_probability = np.full(n_rows, np.nan)
+    key_factors = np.full(n_rows, None, dtype=object)
+    if n_scored:
+        prob_default = scoring_model.predict_default_probabilities(encoded, n_scored)
+        scores = calculate_credit_scores(prob_default)
+        credit_score[keep] = scores
+        risk_level[keep] = determine_risk_levels(scores)
+        decision[keep] = determine_decisions(scores)
+        approval_probability[keep] = np.round(100 * (1 - prob_default), 1)
+        key_factors[keep] = serialize_key_factors(scoring_model.key_factors_batch(encoded, n_scored, unseen_masks))
+
+    error = np.full(n_rows, None, dtype=object)
+    for row, message in errors.items():
+        error[row] = message
+
+    client_name = frame[source["client_name"]].to_numpy() if "client_name" in source else np.full(n_rows, None)
+    # Text columns stay object dtype so every chunk has the same schema, whatever pandas would infer
+    return pd.DataFrame({
+        "row": np.arange(first_row, first_row + n_rows),
+        "client_name": pd.Series(client_name, dtype=object),
+        "credit_score": pd.array(credit_score, dtype="Int64"),
+        "risk_level": pd.Series(risk_level, dtype=object),
+        "decision": pd.Series(decision, dtype=object),
+        "approval_probability": approval_probability,
+        "key_factors": pd.Series(key_factors, dtype=object),
+        "error": pd.Series(error, dtype=object),
+    }, columns=OUTPUT_COLUMNS)
+
+
+class CsvSink:
+    """Appends chunks to one CSV file; its size is the resume point"""
+
+    def __init__(self, path: str, position: Optional[int]):
+        self.path = path
+        # Drop anything written after the last checkpoint
+        mode = "r+b" if position is not None and os.path.exists(path) else "wb"
+        self._file = open(path, mode)
+        if position is not None:
+            self._file.truncate(position)
+            self._file.seek(position)
+
+    def write(self, chunk: pd.DataFrame, chunk_index: int):
+        chunk.to_csv(self._file, mode="wb", header=self._file.tell() == 0, index=False)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def position(self) -> int:
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetSink:
+    """Writes each chunk as its own part file inside the output directory"""
+
+    def __init__(self, path: str, first_chunk: int):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        # Parts at or after the resume point are from an interrupted run
+        for name in os.listdir(path):
+            if name.startswith("part-") and int(name[5:10]) >= first_chunk:
+                os.remove(os.path.join(path, name))
+
+    def write(self, chunk: pd.DataFrame, chunk_index: int):
+        target = os.path.join(self.path, f"part-{chunk_index:05d}.parquet")
+        chunk.to_parquet(target + ".tmp", index=False)
+        os.replace(target + ".tmp", target)
+
+    def position(self) -> Optional[int]:
+        return None
+
+    def close(self):
+        pass
+
+
+def load_checkpoint(path: str, expected: dict) -> Tuple[int, int, Optional[int]]:
+    """
+    Reads the resume point written after the last completed chunk
+
+    Returns:
+        (completed chunks, completed rows, output position), all zero/None without a checkpoint
+
+    Raises:
+        ValueError: If the checkpoint belongs to a different input or chunking
+    """
+    if not os.path.exists(path):
+        return 0, 0, None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    for key, value in expected.items():
+        if checkpoint.get(key) != value:
+            raise ValueError(
+                f"Checkpoint {path} was written for {key}={checkpoint.get(key)!r}, not {value!r}; "
+                f"rerun without --resume to start over"
+            )
+    return checkpoint["chunks"], checkpoint["rows"], checkpoint.get("output_position")
+
+
+def save_checkpoint(path: str, state: dict):
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+
+def _with_first_row(chunks: Iterator[pd.DataFrame], first_row: int) -> Iterator[Tuple[pd.DataFrame, int]]:
+    for frame in chunks:
+        yield frame, first_row
+        first_row += len(frame)
+
+
+def score_file(
+    input_path: str,
+    output_path: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    resume: bool = False,
+    id_column: Optional[str] = "client_name",
+    workers: Optional[int] = 1,
+) -> dict:
+    """
+    Scores every row of input_path into output_path, chunk by chunk
+
+    With more than one worker (None means SCORING_WORKERS) chunks are scored on a
+    process pool and still written, and checkpointed, in input order.
+
+    Returns:
+        Row counts, elapsed seconds and throughput for this run
+    """
+    if chunk_size <= 0:
+        raise ValueError("chunk_size must be positive")
+
+    parquet_input = is_parquet(input_path)
+    available = read_parquet_columns(input_path) if parquet_input else read_csv_columns(input_path)
+    source = resolve_columns(available, id_column)
+
+    checkpoint_file = checkpoint_path(output_path)
+    identity = {
+        "input": os.path.abspath(input_path),
+        "input_size": os.path.getsize(input_path),
+        "chunk_size": chunk_size,
+    }
+    if resume:
+        chunks_done, rows_done, position = load_checkpoint(checkpoint_file, identity)
+    else:
+        chunks_done, rows_done, position = 0, 0, None
+        if os.path.exists(checkpoint_file):
+            os.remove(checkpoint_file)
+    if rows_done:
+        logger.info(f"Resuming after chunk {chunks_done} ({rows_done} rows already scored)")
+
+    sink = ParquetSink(output_path, chunks_done) if is_parquet(output_path) else CsvSink(output_path, position)
+    chunks = (iter_parquet_chunks if parquet_input else iter_csv_chunks)(input_path, source, chunk_size, rows_done)
+
+    scorer = None
+    if workers != 1:
+        from .parallel_scoring import ParallelScorer
+
+        scorer = ParallelScorer(workers, chunk_size).start()
+        results = scorer.score_chunks(chunks, source, rows_done)
+    else:
+        results = (score_chunk(frame, source, first_row) for frame, first_row in _with_first_row(chunks, rows_done))
+
+    started = time.perf_counter()
+    chunk_started = started
+    rows = scored = 0
+    try:
+        for result in results:
+            sink.write(result, chunks_done)
+
+            chunks_done += 1
+            rows_done += len(result)
+            rows += len(result)
+            scored += int(result["error"].isna().sum())
+            save_checkpoint(checkpoint_file, {
+                **identity, "chunks": chunks_done, "rows": rows_done, "output_position": sink.position(),
+            })
+
+            now = time.perf_counter()
+            elapsed, chunk_started = now - chunk_started, now
+            logger.info(
+                f"Chunk {chunks_done}: {len(result)} rows in {elapsed:.2f}s "
+                f"({len(result) / elapsed:,.0f} rows/s), {rows_done} rows done"
+            )
+    finally:
+        sink.close()
+        if scorer is not None:
+            scorer.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "rows": rows,
+        "scored": scored,
+        "failed": rows - scored,
+        "total_rows": rows_done,
+        "chunks": chunks_done,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="CSV or Parquet file of applications")
+    parser.add_argument("output", help="CSV file, or .parquet directory, for the scores")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows read and scored at a time")
+    parser.add_argument("--resume", action="store_true", help="Continue after the last completed chunk")
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Scoring processes (default: SCORING_WORKERS, one per core)"
+    )
+    parser.add_argument("--id-column", default="client_name", help="Input column copied to the output as client_name")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        summary = score_file(args.input, args.output, args.chunk_size, args.resume, args.id_column, args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+
+    print(
+        f"Scored {summary['scored']} of {summary['rows']} rows ({summary['failed']} failed) "
+        f"in {summary['seconds']:.2f}s, {summary['rows_per_second']:,.0f} rows/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
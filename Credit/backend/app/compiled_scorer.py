@@ -0,0 +1,179 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class CompiledScorer:
+    """
+    Flattened, dependency-free version of the scoring pipeline
+
+    The pickled model is a StandardScaler + OneHotEncoder ColumnTransformer in front
+    of a binary LogisticRegression, fed with label-encoded categoricals. At load time
+    all of that collapses into plain NumPy arrays and dicts so that scoring is a dot
+    product: no DataFrame construction, no column reindexing and no sklearn input
+    validation on the request path. Categorical inputs are the label codes produced
+    by encoding.CategoryEncoder.
+    """
+
+    def __init__(
+        self,
+        num_cols: List[str],
+        num_weights: np.ndarray,
+        intercept: float,
+        code_weights: Dict[str, np.ndarray],
+        scaler_mean: np.ndarray,
+        scaler_scale: np.ndarray,
+        num_coef: np.ndarray,
+        category_index: Dict[str, Dict[str, int]],
+    ):
+        self.num_cols = list(num_cols)
+        self.cat_cols = list(code_weights)
+        # Scaler folded into the coefficients: logit = x @ num_weights + intercept + sum(cat weights)
+        self.num_weights = num_weights
+        self.intercept = intercept
+        # Label code -> logit contribution, one array per categorical column
+        self.code_weights = code_weights
+        # Raw parameters, kept for introspection and explanations
+        self.scaler_mean = scaler_mean
+        self.scaler_scale = scaler_scale
+        self.num_coef = num_coef
+        self.category_index = category_index
+
+    @classmethod
+    def from_model_data(cls, model_data: dict) -> "CompiledScorer":
+        """
+        Extracts scaler, encoder and logistic parameters from the loaded artifact
+
+        Args:
+            model_data: Dictionary loaded from credit_scoring_model.pkl
+
+        Returns:
+            A CompiledScorer producing the same probabilities as model.predict_proba
+
+        Raises:
+            ValueError: If the pipeline contains steps that cannot be compiled
+        """
+        model = model_data['model']
+        label_encoders = model_data['label_encoders']
+        steps = dict(getattr(model, 'steps', []))
+        preprocessor = steps.get('preprocessor', model_data.get('preprocessor'))
+        classifier = model.steps[-1][1] if hasattr(model, 'steps') else model
+
+        if preprocessor is None or not hasattr(preprocessor, 'transformers_'):
+            raise ValueError("Model has no fitted ColumnTransformer")
+        if not hasattr(classifier, 'coef_') or classifier.coef_.shape[0] != 1:
+            raise ValueError("Final estimator is not a binary linear classifier")
+        if list(classifier.classes_) != [0, 1]:
+            raise ValueError(f"Unexpected classifier classes: {list(classifier.classes_)}")
+
+        coef = np.asarray(classifier.coef_[0], dtype=float)
+        intercept = float(classifier.intercept_[0])
+
+        num_cols: List[str] = []
+        scaler_mean = scaler_scale = num_coef = None
+        category_index: Dict[str, Dict[str, int]] = {}
+        code_weights: Dict[str, np.ndarray] = {}
+        offset = 0
+
+        for name, transformer, columns in preprocessor.transformers_:
+            if transformer == 'drop' or len(columns) == 0:
+                continue
+            if transformer == 'passthrough':
+                raise ValueError(f"Passthrough columns in '{name}' are not supported")
+
+            final_step = transformer.steps[-1][1] if hasattr(transformer, 'steps') else transformer
+            if hasattr(transformer, 'steps') and len(transformer.steps) != 1:
+                raise ValueError(f"Transformer '{name}' has more than one step")
+
+            if hasattr(final_step, 'mean_') and hasattr(final_step, 'scale_'):
+                if num_cols:
+                    raise ValueError("More than one numeric transformer")
+                num_cols = list(columns)
+                scaler_mean = np.asarray(final_step.mean_, dtype=float)
+                scaler_scale = np.asarray(final_step.scale_, dtype=float)
+                num_coef = coef[offset:offset + len(num_cols)]
+                offset += len(num_cols)
+            elif hasattr(final_step, 'categories_'):
+                if getattr(final_step, 'drop_idx_', None) is not None:
+                    raise ValueError("OneHotEncoder with dropped categories is not supported")
+                for col, categories in zip(columns, final_step.categories_):
+                    classes = [str(value) for value in label_encoders[col].classes_]
+                    onehot_position = {int(code): offset + i for i, code in enumerate(categories)}
+                    offset += len(categories)
+
+                    # Label code -> one-hot column; codes the one-hot encoder never
+                    # saw are ignored, i.e. contribute nothing to the logit
+                    index = {}
+                    weights = np.zeros(len(classes))
+                    for code, value in enumerate(classes):
+                        position = onehot_position.get(code)
+                        if position is not None:
+                            index[value] = position
+                            weights[code] = coef[position]
+                    weights.setflags(write=False)
+                    category_index[col] = index
+                    code_weights[col] = weights
+            else:
+                raise ValueError(f"Unsupported transformer '{name}'")
+
+        if offset != coef.shape[0]:
+            raise ValueError(f"Compiled {offset} features but the model has {coef.shape[0]}")
+
+        num_weights = num_coef / scaler_scale
+        intercept -= float(np.dot(scaler_mean / scaler_scale, num_coef))
+
+        return cls(
+            num_cols=num_cols,
+            num_weights=num_weights,
+            intercept=intercept,
+            code_weights=code_weights,
+            scaler_mean=scaler_mean,
+            scaler_scale=scaler_scale,
+            num_coef=num_coef,
+            category_index=category_index,
+        )
+
+    def predict_proba_record(self, features: dict) -> float:
+        """
+        Scores one encoded application
+
+        Args:
+            features: Model feature name -> value, with categoricals as label codes
+
+        Returns:
+            Probability of default
+        """
+        logit = self.intercept
+        for col, weight in zip(self.num_cols, self.num_weights):
+            logit += float(features.get(col, 0.0)) * weight
+        for col in self.cat_cols:
+            if col in features:
+                logit += self.code_weights[col][features[col]]
+
+        return float(1.0 / (1.0 + np.exp(-logit)))
+
+    def predict_proba_columns(self, columns: Dict[str, np.ndarray], n_rows: Optional[int] = None) -> np.ndarray:
+        """
+        Scores a batch given as columnar arrays
+
+        Args:
+            columns: Model feature name -> array, with categoricals as label code arrays
+            n_rows: Number of rows, only needed when columns is empty
+
+        Returns:
+            Array of default probabilities in row order
+        """
+        if n_rows is None:
+            n_rows = len(next(iter(columns.values())))
+
+        numeric = np.zeros((n_rows, len(self.num_cols)))
+        for i, col in enumerate(self.num_cols):
+            if col in columns:
+                numeric[:, i] = columns[col]
+        logit = numeric @ self.num_weights + self.intercept
+
+        for col in self.cat_cols:
+            if col in columns:
+                logit += self.code_weights[col][columns[col]]
+
+        return 1.0 / (1.0 + np.exp(-logit))
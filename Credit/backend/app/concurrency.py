@@ -0,0 +1,146 @@
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Worker limits; 0 runs the work inline on the event loop (the old behaviour, useful for benchmarks)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(min(4, os.cpu_count() or 1))))
+DB_WORKERS = int(os.getenv("DB_WORKERS", "8"))
+
+inference_executor: Optional[ThreadPoolExecutor] = (
+    ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix="inference")
+    if INFERENCE_WORKERS > 0 else None
+)
+db_executor: Optional[ThreadPoolExecutor] = (
+    ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+    if DB_WORKERS > 0 else None
+)
+
+# Password hashing pool; 0 uses the event loop's shared default pool without admission control
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+
+
+class ExecutorSaturated(Exception):
+    """Raised when a bounded executor already has its maximum amount of queued work"""
+
+
+class BoundedExecutor:
+    """
+    Thread pool with admission control
+
+    At most max_workers tasks run and max_queue more wait; further submissions
+    are refused with ExecutorSaturated instead of queueing without bound.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, name: str):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _release(self, _future):
+        with self._lock:
+            self._in_flight -= 1
+            self.completed += 1
+
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        with self._lock:
+            if self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorSaturated(f"{self.name} pool is saturated")
+            self._in_flight += 1
+        future = self._executor.submit(partial(func, *args, **kwargs))
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "queue_capacity": self.max_queue,
+            "in_flight": self._in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+password_executor: Optional[BoundedExecutor] = (
+    BoundedExecutor(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE, "password")
+    if PASSWORD_HASH_WORKERS > 0 else None
+)
+
+
+async def _run(executor: Optional[ThreadPoolExecutor], func: Callable[..., T], *args, **kwargs) -> T:
+    if executor is None:
+        return func(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    # Run in a copy of the caller's context, like asyncio.to_thread, so per-request
+    # state such as the metrics stage timings follows the work onto the worker thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(executor, partial(context.run, func, *args, **kwargs))
+
+
+def timed(func: Callable[..., T], *args, **kwargs) -> Tuple[T, float]:
+    """Calls func and returns its result with the seconds it took, to time work inside an executor"""
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+async def run_inference(func: Callable[..., T], *args, **kwargs) -> T:
+    """Runs CPU-bound scoring work on the bounded inference pool"""
+    return await _run(inference_executor, func, *args, **kwargs)
+
+
+async def run_db(func: Callable[..., T], *args, **kwargs) -> T:
+    """Runs blocking SQLAlchemy work on the bounded database pool"""
+    return await _run(db_executor, func, *args, **kwargs)
+
+
+async def run_in_session(db, func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Runs a synchronous crud function against either kind of session
+
+    An AsyncSession runs it through run_sync, so the driver I/O is awaited natively
+    on the event loop; a regular Session runs it on the database pool.
+    """
+    if hasattr(db, "run_sync"):
+        return await db.run_sync(func, *args, **kwargs)
+    return await run_db(func, db, *args, **kwargs)
+
+
+async def run_password(func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Runs bcrypt hashing or verification on the dedicated password pool
+
+    Raises:
+        ExecutorSaturated: If the pool's queue is full
+    """
+    if password_executor is None:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, partial(func, *args, **kwargs))
+    return await password_executor.run(func, *args, **kwargs)
+
+
+def shutdown_executors():
+    """Waits for in-flight work and stops the worker threads"""
+    for executor in (inference_executor, db_executor, password_executor):
+        if executor is not None:
+            executor.shutdown(wait=True)
+    logger.info("Inference, database and password executors shut down")
@@ -1,11 +1,20 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from passlib.context import CryptContext
+from sqlalchemy import desc, insert, tuple_
 from datetime import datetime
-from . import models, schemas
-from typing import List, Optional
+import base64
+import json
+from . import models, schemas, auth, email_utils, outbox
+from .analytics import apply_rollups
+from .archive import PredictionArchive
+from typing import List, Optional, Tuple
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = auth.pwd_context
+
+# Columns /predictions may be ordered by; each has a (user_id, column, id) index
+SORTABLE_PREDICTION_COLUMNS = {
+    "timestamp": models.Prediction.timestamp,
+    "credit_score": models.Prediction.credit_score,
+}
 
 # User CRUD operations
 def get_user_by_email(db: Session, email: str) -> Optional[models.User]:
@@ -17,14 +26,23 @@ def get_user(db: Session, user_id: int) -> Optional[models.User]:
 def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[models.User]:
     return db.query(models.User).offset(skip).limit(limit).all()
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = pwd_context.hash(user.password)
+def create_user(
+    db: Session,
+    user: schemas.UserCreate,
+    hashed_password: Optional[str] = None,
+    welcome_email: bool = False,
+):
+    if hashed_password is None:
+        hashed_password = pwd_context.hash(user.password)
     db_user = models.User(
         email=user.email,
         username=user.username,
         hashed_password=hashed_password,
     )
     db.add(db_user)
+    if welcome_email:
+        # Committed with the user: no email for a failed signup, no signup without its email
+        outbox.enqueue_email(db, **email_utils.welcome_email(user.email, user.username))
     db.commit()
     db.refresh(db_user)
     return db_user
@@ -42,6 +60,7 @@ def update_user(
             db_user.hashed_password = hashed_password
         db.commit()
         db.refresh(db_user)
+        auth.invalidate_cached_user(user_id)
     return db_user
 
 def authenticate_user(db: Session, email: str, password: str):
@@ -64,10 +83,42 @@ def create_prediction(
         timestamp=datetime.utcnow()
     )
     db.add(db_prediction)
+    apply_rollups(db, [_rollup_row(db_prediction)])
     db.commit()
     db.refresh(db_prediction)
     return db_prediction
 
+def create_predictions_bulk(
+    db: Session,
+    predictions: List[schemas.PredictionCreate],
+    user_id: Optional[int] = None
+) -> int:
+    """Insert many predictions with a single multi-row INSERT and one commit"""
+    timestamp = datetime.utcnow()
+    rows = [
+        {**prediction.dict(), "user_id": user_id, "timestamp": timestamp}
+        for prediction in predictions
+    ]
+    return insert_prediction_rows(db, rows)
+
+def insert_prediction_rows(db: Session, rows: List[dict]) -> int:
+    """Insert prepared prediction rows with a single multi-row INSERT and one commit, updating their rollups"""
+    if rows:
+        db.execute(insert(models.Prediction), rows)
+        apply_rollups(db, rows)
+        db.commit()
+    return len(rows)
+
+def _rollup_row(prediction: models.Prediction) -> dict:
+    return {
+        "user_id": prediction.user_id,
+        "timestamp": prediction.timestamp,
+        "credit_score": prediction.credit_score,
+        "risk_level": prediction.risk_level,
+        "decision": prediction.decision,
+        "loan_amount": prediction.loan_amount,
+    }
+
 def get_prediction(db: Session, prediction_id: int) -> Optional[models.Prediction]:
     return db.query(models.Prediction).filter(models.Prediction.id == prediction_id).first()
 
@@ -82,14 +133,96 @@ def get_predictions(
     query = db.query(models.Prediction).filter(models.Prediction.user_id == user_id)
     
     # Apply ordering
-    order_column = getattr(models.Prediction, order_by, models.Prediction.timestamp)
+    order_column = SORTABLE_PREDICTION_COLUMNS.get(order_by, models.Prediction.timestamp)
     if order_direction.lower() == "desc":
-        query = query.order_by(desc(order_column))
+        query = query.order_by(desc(order_column), desc(models.Prediction.id))
     else:
-        query = query.order_by(order_column)
+        query = query.order_by(order_column, models.Prediction.id)
     
     return query.offset(skip).limit(limit).all()
 
+def encode_prediction_cursor(prediction: models.Prediction, order_by: str, order_direction: str) -> str:
+    """Opaque cursor pointing just after the given row in the requested ordering"""
+    value = getattr(prediction, order_by)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = {"o": order_by, "d": order_direction, "v": value, "id": prediction.id}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_prediction_cursor(cursor: str, order_by: str, order_direction: str) -> Tuple[object, int]:
+    """
+    Decodes a cursor produced by encode_prediction_cursor
+    
+    Raises:
+        ValueError: If the cursor is malformed or was issued for a different ordering
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value, last_id = payload["v"], int(payload["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Malformed cursor") from e
+    if payload.get("o") != order_by or payload.get("d") != order_direction:
+        raise ValueError("Cursor was issued for a different ordering")
+    if order_by == "timestamp":
+        value = datetime.fromisoformat(value)
+    return value, last_id
+
+def get_predictions_page(
+    db: Session,
+    user_id: int,
+    limit: int = 100,
+    order_by: str = "timestamp",
+    order_direction: str = "desc",
+    cursor: Optional[str] = None,
+    archive: Optional[PredictionArchive] = None
+) -> Tuple[List[models.Prediction], Optional[str]]:
+    """
+    Keyset pagination over a user's predictions
+    
+    Each page seeks directly to the position after the cursor's (column, id) pair
+    through the (user_id, column, id) index, so page cost does not grow with depth.
+    With an archive, table rows from its watermark on are merged with the archived
+    ones, which are returned as detached Prediction objects.
+    
+    Returns:
+        The page of predictions and the cursor for the next page, or None on the last page
+        
+    Raises:
+        ValueError: If order_by is not sortable or the cursor is invalid
+    """
+    if order_by not in SORTABLE_PREDICTION_COLUMNS:
+        raise ValueError(f"Cannot order by '{order_by}', expected one of {sorted(SORTABLE_PREDICTION_COLUMNS)}")
+    order_direction = "asc" if order_direction.lower() == "asc" else "desc"
+    order_column = SORTABLE_PREDICTION_COLUMNS[order_by]
+    key = tuple_(order_column, models.Prediction.id)
+
+    query = db.query(models.Prediction).filter(models.Prediction.user_id == user_id)
+    after = None
+    if cursor:
+        after = value, last_id = decode_prediction_cursor(cursor, order_by, order_direction)
+        query = query.filter(key < tuple_(value, last_id) if order_direction == "desc" else key > tuple_(value, last_id))
+    watermark = archive.watermark() if archive is not None else None
+    if watermark is not None:
+        query = query.filter(models.Prediction.timestamp >= watermark)
+
+    if order_direction == "desc":
+        query = query.order_by(desc(order_column), desc(models.Prediction.id))
+    else:
+        query = query.order_by(order_column, models.Prediction.id)
+
+    rows = query.limit(limit + 1).all()
+    # Newest first, a full page of table rows comes before every archived row
+    if watermark is not None and not (order_by == "timestamp" and order_direction == "desc" and len(rows) > limit):
+        archived = archive.page(user_id, limit + 1, order_by, order_direction, after)
+        rows.extend(models.Prediction(**row) for row in archived)
+        rows.sort(key=lambda row: (getattr(row, order_by), row.id), reverse=order_direction == "desc")
+        rows = rows[:limit + 1]
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_prediction_cursor(rows[-1], order_by, order_direction)
+
 def get_user_prediction_count(db: Session, user_id: int) -> int:
     return db.query(models.Prediction).filter(models.Prediction.user_id == user_id).count()
 
@@ -99,6 +232,7 @@ def delete_prediction(db: Session, prediction_id: int, user_id: int) -> bool:
         models.Prediction.user_id == user_id
     ).first()
     if db_prediction:
+        apply_rollups(db, [_rollup_row(db_prediction)], sign=-1)
         db.delete(db_prediction)
         db.commit()
         return True
@@ -1,17 +1,147 @@
+import os
 import smtplib
+import time
 from email.message import EmailMessage
+from typing import Optional
 
-SMTP_SERVER = "smtp.gmail.com"
-SMTP_PORT = 587
-SENDER_EMAIL = "your_email@gmail.com"
-SENDER_PASSWORD = "your_app_password"  # Use App Password if 2FA is on
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SENDER_EMAIL = os.getenv("SMTP_SENDER_EMAIL", "your_email@gmail.com")
+SENDER_PASSWORD = os.getenv("SMTP_SENDER_PASSWORD", "your_app_password")  # Use App Password if 2FA is on
+# Local relays and test servers may speak plain SMTP without TLS or authentication
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() in ("1", "true", "yes")
+SMTP_LOGIN = os.getenv("SMTP_LOGIN", "true").lower() in ("1", "true", "yes")
+SMTP_TIMEOUT_SECONDS = float(os.getenv("SMTP_TIMEOUT_SECONDS", "10"))
+# A pooled connection idle for longer is closed rather than reused (servers drop idle clients)
+SMTP_IDLE_SECONDS = float(os.getenv("SMTP_IDLE_SECONDS", "60"))
 
-def send_welcome_email(recipient_email, username):
+
+def welcome_email(recipient_email, username) -> dict:
+    """Subject and body of the registration email, as stored in the outbox"""
+    return {
+        "recipient": recipient_email,
+        "subject": "Welcome to Credit Score App",
+        "body": f"Hi {username},\n\nThank you for registering!",
+    }
+
+
+def build_message(recipient: str, subject: str, body: str, sender: str = SENDER_EMAIL) -> EmailMessage:
     msg = EmailMessage()
-    msg["Subject"] = "Welcome to Credit Score App"
-    msg["From"] = SENDER_EMAIL
-    msg["To"] = recipient_email
-    msg.set_content(f"Hi {username},\n\nThank you for registering!")
+    msg["Subject"] = subject
+    msg["From"] = sender
+    msg["To"] = recipient
+    msg.set_content(body)
+    return msg
+
+
+# Refusals of one message; any other SMTP or socket error concerns the connection or the server
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+def is_permanent_failure(error: Exception) -> bool:
+    """Whether retrying the message cannot help: a 5xx refusal of it or of its every recipient"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+        return 500 <= error.smtp_code < 600
+    return False
+
+
+class SmtpMailer:
+    """
+    One SMTP connection reused across messages
+
+    Connecting, STARTTLS and login happen once per connection rather than per
+    message. A connection the server dropped is reopened once before the send
+    is reported as failed. Not thread-safe: use it from one thread.
+    """
+
+    def __init__(
+        self,
+        host: str = SMTP_SERVER,
+        port: int = SMTP_PORT,
+        username: Optional[str] = SENDER_EMAIL,
+        password: Optional[str] = SENDER_PASSWORD,
+        sender: str = SENDER_EMAIL,
+        starttls: bool = SMTP_STARTTLS,
+        login: bool = SMTP_LOGIN,
+        timeout: float = SMTP_TIMEOUT_SECONDS,
+        idle_timeout: float = SMTP_IDLE_SECONDS,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sender = sender
+        self.starttls = starttls
+        self.login = login
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+        self.connections = 0
+        self.sent = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.login:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        self.connections += 1
+        return smtp
+
+    def send(self, recipient: str, subject: str, body: str):
+        """
+        Sends one message over the pooled connection
+
+        Raises:
+            smtplib.SMTPException or OSError: If the message was not accepted
+        """
+        msg = build_message(recipient, subject, body, sender=self.sender)
+        if self._smtp is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            self.close()
+        for attempt in range(2):
+            reused = self._smtp is not None
+            if self._smtp is None:
+                self._smtp = self._connect()
+            try:
+                self._smtp.send_message(msg)
+                break
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                self.close()
+                # Only a connection that was already open may have gone stale
+                if not reused or attempt:
+                    raise
+            except smtplib.SMTPException:
+                # The server refused this message; reset the transaction so the connection stays usable
+                self._reset()
+                raise
+        self._last_used = time.monotonic()
+        self.sent += 1
+
+    def _reset(self):
+        try:
+            self._smtp.rset()
+        except (smtplib.SMTPException, OSError):
+            self.close()
+
+    def close(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+        self._smtp = None
+
+
+def send_welcome_email(recipient_email, username):
+    msg = build_message(**welcome_email(recipient_email, username))
 
     try:
         with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as smtp:
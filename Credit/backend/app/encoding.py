@@ -0,0 +1,220 @@
+import threading
+from types import MappingProxyType
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Policies for category values the label encoders never saw
+UNSEEN_FIRST_CLASS = "first_class"
+UNSEEN_MISSING = "missing"
+UNSEEN_REJECT = "reject"
+UNSEEN_POLICIES = (UNSEEN_FIRST_CLASS, UNSEEN_MISSING, UNSEEN_REJECT)
+
+# Earlier names of the policies, still accepted from configuration
+UNSEEN_POLICY_ALIASES = {"most_frequent": UNSEEN_FIRST_CLASS}
+
+# Classes that stand for an absent value, in order of preference
+MISSING_CLASSES = ("<UNK>", "missing")
+
+# The notebook that trained the shipped model appended this to every category
+# value before label encoding ('Retail' -> 'Retail_', True -> 'True_', NaN -> 'nan_')
+TRAINED_SUFFIX = "_"
+
+# Raw has_guarantee style values and the boolean they were trained as
+BOOLEAN_KEYS = {"1": "True", "0": "False", "True": "True", "False": "False"}
+
+
+class UnseenCategoryError(ValueError):
+    """Raised under the reject policy when a value has no code"""
+
+    def __init__(self, column: str, value: str):
+        super().__init__(f"Unseen category '{value}' in column '{column}'")
+        self.column = column
+        self.value = value
+
+
+def category_key(value, suffix: str = "", boolean: bool = False) -> str:
+    """
+    Normalize a raw categorical value to the string form used by the encoders
+
+    Args:
+        suffix: Appended to the value, for classes trained with TRAINED_SUFFIX
+        boolean: Key 0/1 as False/True, for columns trained on booleans
+    """
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return "nan" + suffix if suffix else "missing"
+    key = str(value)
+    if boolean:
+        key = BOOLEAN_KEYS.get(key, key)
+    return key + suffix
+
+
+class CategoryTable:
+    """Read-only raw value -> label code lookup for one categorical column"""
+
+    def __init__(self, column: str, classes: List[str], policy: str):
+        policy = UNSEEN_POLICY_ALIASES.get(policy, policy)
+        if policy not in UNSEEN_POLICIES:
+            raise ValueError(f"Unknown unseen-category policy '{policy}', expected one of {UNSEEN_POLICIES}")
+
+        self.column = column
+        self.policy = policy
+        self.codes = MappingProxyType({value: code for code, value in enumerate(classes)})
+        trained = [value for value in classes if value not in MISSING_CLASSES]
+        self.suffix = TRAINED_SUFFIX if trained and all(value.endswith(TRAINED_SUFFIX) for value in trained) else ""
+        self.boolean = {f"True{self.suffix}", f"False{self.suffix}"} <= set(trained)
+        self.missing_code = next((self.codes[value] for value in MISSING_CLASSES if value in self.codes), None)
+
+        if policy == UNSEEN_FIRST_CLASS:
+            # Code 0, the alphabetically first class; the label encoders keep no
+            # frequencies, so this is an arbitrary but stable stand-in
+            self.fallback_code: Optional[int] = 0
+        elif policy == UNSEEN_MISSING:
+            if self.missing_code is None:
+                raise ValueError(f"Column '{column}' has no missing-value class")
+            self.fallback_code = self.missing_code
+        else:
+            self.fallback_code = None
+
+    def key(self, value) -> str:
+        """The class a raw value was trained as"""
+        return category_key(value, self.suffix, self.boolean)
+
+    def known_values(self) -> List[str]:
+        """Raw values of the trained classes, as the API receives them"""
+        values = []
+        for value in self.codes:
+            if value in MISSING_CLASSES or value == f"nan{self.suffix}":
+                continue
+            values.append(value[:len(value) - len(self.suffix)])
+        return values
+
+    def is_known(self, value) -> bool:
+        return self.key(value) in self.codes
+
+    def encode(self, value) -> Tuple[int, bool]:
+        """
+        Encodes a single value
+
+        Returns:
+            The label code and whether the value was unseen
+
+        Raises:
+            UnseenCategoryError: If the value is unseen and the policy is reject
+        """
+        code = self.codes.get(self.key(value))
+        if code is not None:
+            return code, False
+        if self.fallback_code is None:
+            raise UnseenCategoryError(self.column, category_key(value))
+        return self.fallback_code, True
+
+    def encode_array(self, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Encodes a whole column, looking up each distinct value once
+
+        Returns:
+            Array of label codes (-1 for rejected values) and a boolean mask of unseen rows
+        """
+        uniques, inverse = np.unique(
+            np.array([self.key(value) for value in values], dtype=object),
+            return_inverse=True,
+        )
+        unique_codes = np.array([self.codes.get(value, -1) for value in uniques], dtype=np.int64)
+        codes = unique_codes[inverse]
+        unseen = codes < 0
+        if self.fallback_code is not None:
+            codes[unseen] = self.fallback_code
+        return codes, unseen
+
+
+class CategoryEncoder:
+    """
+    Lookup tables for every categorical model feature, built once at model load
+
+    Unseen values are not logged per request; they are tallied in per-column
+    counters that can be read with unseen_counts().
+    """
+
+    def __init__(self, tables: Dict[str, CategoryTable]):
+        self.tables = MappingProxyType(dict(tables))
+        self._unseen = {column: 0 for column in tables}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_label_encoders(cls, label_encoders: dict, cat_cols: List[str], policy: str = UNSEEN_FIRST_CLASS) -> "CategoryEncoder":
+        return cls.from_classes({col: label_encoders[col].classes_ for col in cat_cols}, policy)
+
+    @classmethod
+    def from_classes(cls, classes: Dict[str, List[str]], policy: str = UNSEEN_FIRST_CLASS) -> "CategoryEncoder":
+        """Builds the tables from each column's classes, in label code order"""
+        return cls({col: CategoryTable(col, [str(value) for value in values], policy) for col, values in classes.items()})
+
+    def _count_unseen(self, column: str, count: int):
+        with self._lock:
+            self._unseen[column] += count
+
+    def unseen_counts(self) -> Dict[str, int]:
+        """Snapshot of unseen values seen so far, per column"""
+        with self._lock:
+            return dict(self._unseen)
+
+    def encode_value(self, column: str, value, count_unseen: bool = True) -> int:
+        try:
+            code, unseen = self.tables[column].encode(value)
+        except UnseenCategoryError:
+            if count_unseen:
+                self._count_unseen(column, 1)
+            raise
+        if unseen and count_unseen:
+            self._count_unseen(column, 1)
+        return code
+
+    def encode_record(self, features: dict, count_unseen: bool = True) -> dict:
+        """
+        Returns a copy of a preprocessed record with categorical values replaced by codes
+
+        Args:
+            count_unseen: False when re-encoding a record that was already counted,
+                e.g. to explain an application after scoring it
+
+        Raises:
+            UnseenCategoryError: If a value is unseen and the policy is reject
+        """
+        encoded = dict(features)
+        for column in self.tables:
+            if column in encoded:
+                encoded[column] = self.encode_value(column, encoded[column], count_unseen)
+        return encoded
+
+    def unseen_columns(self, features: dict) -> List[str]:
+        """Categorical columns of a preprocessed record whose value has no trained class"""
+        return [column for column, table in self.tables.items() if column in features and not table.is_known(features[column])]
+
+    def encode_columns(
+        self, columns: Dict[str, np.ndarray], unseen_masks: Optional[Dict[str, np.ndarray]] = None
+    ) -> Tuple[Dict[str, np.ndarray], Dict[int, str]]:
+        """
+        Returns a copy of columnar data with categorical arrays replaced by code arrays
+
+        Args:
+            unseen_masks: If given, filled with each categorical column's mask of unseen rows
+
+        Returns:
+            The encoded columns and, under the reject policy, an error message per rejected row
+        """
+        encoded = dict(columns)
+        errors: Dict[int, str] = {}
+        for column, table in self.tables.items():
+            if column not in encoded:
+                continue
+            codes, unseen = table.encode_array(encoded[column])
+            if unseen_masks is not None:
+                unseen_masks[column] = unseen
+            if unseen.any():
+                self._count_unseen(column, int(unseen.sum()))
+                if table.fallback_code is None:
+                    for row in np.flatnonzero(unseen):
+                        errors.setdefault(int(row), str(UnseenCategoryError(column, category_key(encoded[column][row]))))
+            encoded[column] = codes
+        return encoded, errors
@@ -0,0 +1,221 @@
+"""
+Model-derived key factors for the linear scorer
+
+For a logistic regression on standardized numerics and one-hot categoricals
+the logit is a sum of per-feature terms, so each feature's contribution to a
+decision is exact rather than estimated:
+- numeric: coefficient x scaled value, i.e. weight x (value - training mean),
+  measured against the training mean, where the scaled value is zero;
+- categorical: the weight of the application's category minus the average
+  weight of the categories the model was trained on (the label encoders keep
+  no frequencies, so every category counts equally in the baseline). A value
+  the encoder did not recognize contributes the weight of its fallback code,
+  but is reported as unrecognized rather than as the fallback category.
+
+Contributions are in logit units of the probability of default: a positive
+contribution raises the risk and is reported as a negative factor.
+"""
+import os
+from typing import Collection, Dict, List, Optional
+
+import numpy as np
+
+from .compiled_scorer import CompiledScorer
+from .encoding import MISSING_CLASSES
+
+# Factors listed on each side of a decision, and the smallest |contribution| (in logit
+# units) worth listing
+EXPLANATION_TOP_K = int(os.getenv("EXPLANATION_TOP_K", "3"))
+EXPLANATION_MIN_CONTRIBUTION = float(os.getenv("EXPLANATION_MIN_CONTRIBUTION", "0.05"))
+
+# Batches up to this size are explained row by row, below the point where array set-up pays off
+SMALL_BATCH_ROWS = 8
+
+FEATURE_LABELS = {
+    "age": "age",
+    "income": "income",
+    "loan_amount": "loan amount",
+    "interest_rate": "interest rate",
+    "turnover": "turnover",
+    "customer_tenure": "customer tenure",
+    "avg_days_late_current": "days late on current loans",
+    "num_late_payments_current": "number of late payments",
+    "unpaid_amount": "unpaid amount",
+    "industry_sector": "Industry sector",
+    "credit_type": "Credit type",
+    "has_guarantee": "Guarantee",
+    "guarantee_type": "Guarantee type",
+    "repayment_frequency": "Repayment frequency",
+}
+
+
+def display_category(value: str) -> str:
+    # The training data suffixed every category with "_"
+    return "unknown" if value in MISSING_CLASSES else value.rstrip("_")
+
+
+class LinearExplainer:
+    """
+    Per-feature logit contributions and top drivers for whole batches
+
+    Everything that does not depend on the application (baselines, weights,
+    factor labels) is computed once per model version; explaining a batch is an
+    (n_rows, n_features) array build, one argsort and a label lookup per listed
+    factor.
+    """
+
+    def __init__(self, scorer: CompiledScorer, classes: Dict[str, List[str]]):
+        self.num_cols = list(scorer.num_cols)
+        self.cat_cols = list(scorer.cat_cols)
+        self.num_weights = np.asarray(scorer.num_weights, dtype=float)
+        self.num_baseline = np.asarray(scorer.scaler_mean, dtype=float)
+        self.code_weights = scorer.code_weights
+
+        # Flat table of factor labels: two per numeric feature (below/above the mean),
+        # then one per category code and one for unrecognized values
+        labels: List[str] = []
+        self.num_label_offsets = np.arange(0, 2 * len(self.num_cols), 2)
+        for col in self.num_cols:
+            label = FEATURE_LABELS.get(col, col.replace("_", " "))
+            labels.extend((f"Low {label}", f"High {label}"))
+
+        self.cat_baseline = np.zeros(len(self.cat_cols))
+        self.cat_label_offsets = np.zeros(len(self.cat_cols), dtype=np.int64)
+        self.cat_unseen_labels = np.zeros(len(self.cat_cols), dtype=np.int64)
+        for j, col in enumerate(self.cat_cols):
+            trained = [code for code, value in enumerate(classes[col]) if value in scorer.category_index[col]]
+            if trained:
+                self.cat_baseline[j] = float(np.mean(self.code_weights[col][trained]))
+            self.cat_label_offsets[j] = len(labels)
+            label = FEATURE_LABELS.get(col, col.replace("_", " ").capitalize())
+            labels.extend(f"{label}: {display_category(value)}" for value in classes[col])
+            self.cat_unseen_labels[j] = len(labels)
+            labels.append(f"{label}: unrecognized")
+        self.labels = np.array(labels, dtype=object)
+
+        # The same parameters as Python scalars and lists, for explain_record
+        self._num_terms = list(zip(
+            self.num_cols, self.num_baseline.tolist(), self.num_weights.tolist(), self.num_label_offsets.tolist()
+        ))
+        self._cat_terms = list(zip(
+            self.cat_cols, self.cat_baseline.tolist(),
+            [self.code_weights[col].tolist() for col in self.cat_cols], self.cat_label_offsets.tolist(),
+            self.cat_unseen_labels.tolist(),
+        ))
+
+    def contributions(self, encoded: Dict[str, np.ndarray], n_rows: Optional[int] = None) -> np.ndarray:
+        """
+        Logit contributions of an encoded columnar batch
+
+        Returns:
+            Array of shape (n_rows, len(num_cols) + len(cat_cols)), columns in that order;
+            a feature absent from the batch contributes nothing
+        """
+        if n_rows is None:
+            n_rows = len(next(iter(encoded.values())))
+        result = np.zeros((n_rows, len(self.num_cols) + len(self.cat_cols)))
+        for j, col in enumerate(self.num_cols):
+            if col in encoded:
+                result[:, j] = (np.asarray(encoded[col], dtype=float) - self.num_baseline[j]) * self.num_weights[j]
+        offset = len(self.num_cols)
+        for j, col in enumerate(self.cat_cols):
+            if col in encoded:
+                result[:, offset + j] = self.code_weights[col][encoded[col]] - self.cat_baseline[j]
+        return result
+
+    def _label_ids(
+        self, encoded: Dict[str, np.ndarray], contributions: np.ndarray, unseen_masks: Dict[str, np.ndarray]
+    ) -> np.ndarray:
+        n_rows = contributions.shape[0]
+        ids = np.empty(contributions.shape, dtype=np.int64)
+        for j, col in enumerate(self.num_cols):
+            above = np.asarray(encoded[col], dtype=float) > self.num_baseline[j] if col in encoded else np.zeros(n_rows, bool)
+            ids[:, j] = self.num_label_offsets[j] + above
+        offset = len(self.num_cols)
+        for j, col in enumerate(self.cat_cols):
+            codes = np.asarray(encoded[col]) if col in encoded else np.zeros(n_rows, dtype=np.int64)
+            ids[:, offset + j] = self.cat_label_offsets[j] + codes
+            if col in unseen_masks:
+                ids[unseen_masks[col], offset + j] = self.cat_unseen_labels[j]
+        return ids
+
+    def explain_columns(
+        self,
+        encoded: Dict[str, np.ndarray],
+        n_rows: Optional[int] = None,
+        top_k: int = EXPLANATION_TOP_K,
+        min_contribution: float = EXPLANATION_MIN_CONTRIBUTION,
+        unseen_masks: Optional[Dict[str, np.ndarray]] = None,
+    ) -> List[dict]:
+        """
+        Key factors of an encoded columnar batch
+
+        Args:
+            unseen_masks: Per categorical column, the rows whose value the encoder did
+                not recognize (see CategoryEncoder.encode_columns)
+
+        Returns:
+            One {"positive": [...], "negative": [...]} per row, strongest first: positive
+            factors lower the probability of default, negative ones raise it
+        """
+        if n_rows is None:
+            n_rows = len(next(iter(encoded.values())))
+        unseen_masks = unseen_masks or {}
+        if n_rows <= SMALL_BATCH_ROWS:
+            return [
+                self.explain_record(
+                    {col: values[row] for col, values in encoded.items()}, top_k, min_contribution,
+                    unseen=[col for col, mask in unseen_masks.items() if mask[row]],
+                )
+                for row in range(n_rows)
+            ]
+
+        contributions = self.contributions(encoded, n_rows)
+        ids = self._label_ids(encoded, contributions, unseen_masks)
+        top_k = min(top_k, contributions.shape[1])
+
+        order = np.argsort(contributions, axis=1)
+        lowering, raising = order[:, :top_k], order[:, ::-1][:, :top_k]
+        # Sorted by strength, so the factors above the threshold are a prefix of each row
+        n_lowering = (np.take_along_axis(contributions, lowering, axis=1) <= -min_contribution).sum(axis=1)
+        n_raising = (np.take_along_axis(contributions, raising, axis=1) >= min_contribution).sum(axis=1)
+        lowering_labels = self.labels[np.take_along_axis(ids, lowering, axis=1)].tolist()
+        raising_labels = self.labels[np.take_along_axis(ids, raising, axis=1)].tolist()
+
+        return [
+            {"positive": positive[:n_positive], "negative": negative[:n_negative]}
+            for positive, n_positive, negative, n_negative in zip(
+                lowering_labels, n_lowering.tolist(), raising_labels, n_raising.tolist()
+            )
+        ]
+
+    def explain_record(
+        self,
+        encoded: dict,
+        top_k: int = EXPLANATION_TOP_K,
+        min_contribution: float = EXPLANATION_MIN_CONTRIBUTION,
+        unseen: Collection[str] = (),
+    ) -> dict:
+        """
+        Key factors of one application whose categoricals are already label codes
+
+        Same result as explain_columns on a one-row batch, computed on plain floats:
+        for a single row, array set-up would cost more than the arithmetic.
+
+        Args:
+            unseen: Categorical columns whose value the encoder did not recognize
+        """
+        contributions, labels = [], []
+        for col, baseline, weight, offset in self._num_terms:
+            value = float(encoded.get(col, baseline))
+            contributions.append((value - baseline) * weight)
+            labels.append(offset + (value > baseline))
+        for col, baseline, weights, offset, unseen_label in self._cat_terms:
+            code = int(encoded.get(col, 0))
+            contributions.append(weights[code] - baseline if col in encoded else 0.0)
+            labels.append(unseen_label if col in unseen else offset + code)
+
+        order = sorted(range(len(contributions)), key=contributions.__getitem__, reverse=True)
+        raising = [self.labels[labels[j]] for j in order[:top_k] if contributions[j] >= min_contribution]
+        lowering = [self.labels[labels[j]] for j in reversed(order[-top_k:]) if contributions[j] <= -min_contribution]
+        return {"positive": lowering, "negative": raising}
@@ -0,0 +1,376 @@
+"""
+Cached, memory-mapped feature matrix of a training dataset
+
+Every notebook experiment re-reads the CSV and label-encodes it again. The
+feature store does that once: the dataset is streamed through the same reader
+as app.train and written as .npy files with compact dtypes,
+
+- numeric.npy: float32, rows x NUM_COLS, column-major so each feature is contiguous;
+- codes.<column>.npy: int8 label codes (int16/int32 for large vocabularies);
+- target.npy: int8;
+- meta.json: columns, label classes, row counts, source.
+
+under FEATURE_STORE_DIR/<key>, where the key hashes the file's contents and
+the preprocessing configuration. Any later run on the same data opens the
+arrays with np.load(mmap_mode='r'): no parsing, no encoding and no copy, the
+pages are shared with every other process reading the same store.
+
+Mutual information, the notebook's grid search (with the fitted preprocessor
+cached between candidates) and app.train --feature-store read from it.
+
+Usage (from Credit/backend):
+    python -m app.feature_store build history.csv
+    python -m app.feature_store mi history.csv
+    python -m app.feature_store grid history.csv --n-jobs -1
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .encoding import CategoryTable, UNSEEN_FIRST_CLASS
+from .train import (
+    CAT_COLS, DEFAULT_CHUNK_SIZE, GUARANTEE_TRUE_VALUES, NUM_COLS, UNKNOWN_CLASS, ChunkReader, encode_normalized,
+    holdout_mask,
+)
+
+logger = logging.getLogger(__name__)
+
+# Where materialized feature matrices are kept, one directory per key
+FEATURE_STORE_DIR = os.getenv("FEATURE_STORE_DIR", "feature_store")
+
+# Part of the key: bump when the layout or the preprocessing changes
+STORE_FORMAT_VERSION = 1
+
+# The notebook's decision tree search
+NOTEBOOK_TREE_GRID = {
+    'classifier__max_depth': [3, 5, 7, 10, None],
+    'classifier__min_samples_split': [2, 5, 10],
+    'classifier__criterion': ['gini', 'entropy'],
+}
+
+
+def code_dtype(n_classes: int) -> np.dtype:
+    """Smallest signed integer type holding every label code"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_classes <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def file_digest(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def store_key(path: str, target: str = "status") -> str:
+    """Hash of the data's contents and everything that shapes its preprocessing"""
+    config = {
+        "format_version": STORE_FORMAT_VERSION,
+        "source": file_digest(path),
+        "num_cols": NUM_COLS,
+        "cat_cols": CAT_COLS,
+        "target": target,
+        "unknown_class": UNKNOWN_CLASS,
+        "guarantee_true_values": GUARANTEE_TRUE_VALUES,
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:32]
+
+
+class FeatureMatrix:
+    """
+    Read-only view of a materialized store
+
+    numeric, codes and target are memory-mapped; slicing them reads only the
+    pages touched.
+    """
+
+    def __init__(self, directory: str):
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        self.directory = directory
+        self.key = meta["key"]
+        self.source = meta["source"]
+        self.target_name = meta["target"]
+        self.num_cols: List[str] = meta["num_cols"]
+        self.cat_cols: List[str] = meta["cat_cols"]
+        self.classes: Dict[str, List[str]] = meta["classes"]
+        self.vocabularies: Dict[str, List[str]] = meta["vocabularies"]
+        self.n_rows: int = meta["rows"]
+        self.skipped_rows: int = meta["skipped_rows"]
+
+        self.numeric = np.load(os.path.join(directory, "numeric.npy"), mmap_mode="r")
+        self.codes = {col: np.load(os.path.join(directory, f"codes.{col}.npy"), mmap_mode="r") for col in self.cat_cols}
+        self.target = np.load(os.path.join(directory, "target.npy"), mmap_mode="r")
+
+    @property
+    def nbytes(self) -> int:
+        return self.numeric.nbytes + self.target.nbytes + sum(codes.nbytes for codes in self.codes.values())
+
+    def frame(self):
+        """
+        DataFrame of the numeric features and label codes, as the notebook's
+        pipelines take them, backed by the memory maps rather than a copy
+        """
+        import pandas as pd
+
+        columns = {col: self.numeric[:, i] for i, col in enumerate(self.num_cols)}
+        columns.update(self.codes)
+        return pd.DataFrame(columns, copy=False)
+
+    def label_encoders(self) -> dict:
+        from sklearn.preprocessing import LabelEncoder
+
+        encoders = {}
+        for col in self.cat_cols:
+            encoder = LabelEncoder()
+            encoder.classes_ = np.array(self.classes[col], dtype=object)
+            encoders[col] = encoder
+        return encoders
+
+    def chunks(
+        self, chunk_size: int = DEFAULT_CHUNK_SIZE, holdout_every: Optional[int] = None
+    ) -> Iterator[Tuple[np.ndarray, Dict[str, np.ndarray], np.ndarray, np.ndarray]]:
+        """
+        (numeric, label codes, target, holdout mask) per chunk, as app.train
+        consumes them; holdout rows are every holdout_every-th row of the store
+        """
+        for start in range(0, self.n_rows, chunk_size):
+            stop = min(start + chunk_size, self.n_rows)
+            yield (
+                np.asarray(self.numeric[start:stop], dtype=np.float64),
+                {col: codes[start:stop] for col, codes in self.codes.items()},
+                np.asarray(self.target[start:stop], dtype=np.int64),
+                holdout_mask(start, stop - start, holdout_every),
+            )
+
+
+def materialize(path: str, directory: str, target: str = "status", chunk_size: int = DEFAULT_CHUNK_SIZE, key: str = ""):
+    """
+    Writes the feature matrix of a CSV or Parquet file to directory
+
+    Two streaming passes: the first collects the vocabularies and the row count,
+    the second encodes each chunk into preallocated memory-mapped arrays, so
+    memory stays bounded by chunk_size. The directory appears atomically, fully
+    written.
+
+    Raises:
+        ValueError: If the data lacks feature columns or changes between the passes
+    """
+    import pandas as pd
+    from numpy.lib.format import open_memmap
+
+    reader = ChunkReader(path, target, chunk_size, None)
+    vocabularies = {col: set() for col in CAT_COLS}
+    n_rows = 0
+    for numeric, categories, _, _ in reader:
+        n_rows += len(numeric)
+        for col, values in categories.items():
+            vocabularies[col].update(pd.unique(values).tolist())
+    classes = {col: sorted(vocabularies[col] | {UNKNOWN_CLASS}) for col in CAT_COLS}
+    tables = {col: CategoryTable(col, classes[col], UNSEEN_FIRST_CLASS) for col in CAT_COLS}
+
+    tmp_directory = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+    try:
+        numeric_out = open_memmap(
+            os.path.join(tmp_directory, "numeric.npy"), mode="w+", dtype=np.float32,
+            shape=(n_rows, len(NUM_COLS)), fortran_order=True,
+        )
+        codes_out = {
+            col: open_memmap(
+                os.path.join(tmp_directory, f"codes.{col}.npy"), mode="w+",
+                dtype=code_dtype(len(classes[col])), shape=(n_rows,),
+            )
+            for col in CAT_COLS
+        }
+        target_out = open_memmap(os.path.join(tmp_directory, "target.npy"), mode="w+", dtype=np.int8, shape=(n_rows,))
+
+        row = 0
+        for numeric, categories, target_values, _ in reader:
+            stop = row + len(numeric)
+            if stop > n_rows:
+                raise ValueError(f"{path} changed while the feature store was written")
+            numeric_out[row:stop] = numeric
+            for col, values in categories.items():
+                codes_out[col][row:stop] = encode_normalized(tables[col], values)
+            target_out[row:stop] = target_values
+            row = stop
+        if row != n_rows:
+            raise ValueError(f"{path} changed while the feature store was written")
+        for array in (numeric_out, target_out, *codes_out.values()):
+            array.flush()
+        del numeric_out, target_out, codes_out
+
+        meta = {
+            "key": key,
+            "source": os.path.basename(path),
+            "target": target,
+            "num_cols": NUM_COLS,
+            "cat_cols": CAT_COLS,
+            "classes": classes,
+            "vocabularies": {col: sorted(values) for col, values in vocabularies.items()},
+            "rows": n_rows,
+            "skipped_rows": reader.skipped,
+            "created_at": time.time(),
+        }
+        with open(os.path.join(tmp_directory, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        try:
+            os.rename(tmp_directory, directory)
+        except OSError:
+            # Built concurrently by another process; its copy is identical
+            if not os.path.exists(os.path.join(directory, "meta.json")):
+                raise
+    finally:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+
+
+def open_store(
+    path: str,
+    target: str = "status",
+    store_dir: Optional[str] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    rebuild: bool = False,
+) -> FeatureMatrix:
+    """The feature matrix of path, materialized first unless a store with its key exists"""
+    store_dir = store_dir or FEATURE_STORE_DIR
+    key = store_key(path, target)
+    directory = os.path.join(store_dir, key)
+    if rebuild:
+        shutil.rmtree(directory, ignore_errors=True)
+    if not os.path.exists(os.path.join(directory, "meta.json")):
+        os.makedirs(store_dir, exist_ok=True)
+        started = time.perf_counter()
+        materialize(path, directory, target=target, chunk_size=chunk_size, key=key)
+        logger.info(f"Materialized feature store {key} from {path} in {time.perf_counter() - started:.2f}s")
+    return FeatureMatrix(directory)
+
+
+def mutual_information(matrix: FeatureMatrix, max_rows: Optional[int] = None, seed: int = 42):
+    """
+    Mutual information of each feature with the target, highest first
+
+    Label codes are scored as discrete features, which gives a category's
+    information as a whole rather than per one-hot column as the notebook
+    did. Each feature is read as its own contiguous column, so no combined
+    matrix is built.
+    """
+    import pandas as pd
+    from sklearn.feature_selection import mutual_info_classif
+
+    rows = slice(None)
+    if max_rows and max_rows < matrix.n_rows:
+        rows = np.sort(np.random.default_rng(seed).choice(matrix.n_rows, max_rows, replace=False))
+    target = np.asarray(matrix.target[rows])
+
+    scores = {}
+    for i, col in enumerate(matrix.num_cols):
+        scores[col] = mutual_info_classif(matrix.numeric[rows, i:i + 1], target, random_state=seed)[0]
+    for col in matrix.cat_cols:
+        scores[col] = mutual_info_classif(
+            matrix.codes[col][rows].reshape(-1, 1), target, discrete_features=True, random_state=seed
+        )[0]
+    return pd.Series(scores, name="MI Scores").sort_values(ascending=False)
+
+
+def notebook_pipeline(classifier, cache_dir: Optional[str] = None):
+    """
+    The notebook's preprocessing and classifier, caching the fitted
+    preprocessor in cache_dir: candidates of a grid search that share a fold
+    then fit it once, in every worker
+    """
+    from sklearn.compose import ColumnTransformer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ('num', Pipeline(steps=[('scaler', StandardScaler())]), NUM_COLS),
+            ('cat', Pipeline(steps=[('onehot', OneHotEncoder(handle_unknown='ignore'))]), CAT_COLS),
+        ],
+        remainder='drop',
+    )
+    return Pipeline(steps=[('preprocessor', preprocessor), ('classifier', classifier)], memory=cache_dir)
+
+
+def grid_search(
+    matrix: FeatureMatrix,
+    param_grid: Optional[dict] = None,
+    classifier=None,
+    cv: int = 5,
+    n_jobs: int = -1,
+    cache_dir: Optional[str] = None,
+    max_rows: Optional[int] = None,
+):
+    """
+    Runs the notebook's GridSearchCV (decision tree, ROC AUC) on the store
+
+    Args:
+        cache_dir: Where fitted preprocessors are cached; defaults to a
+            directory inside the store, so repeated searches reuse them too
+        max_rows: Search on the first max_rows rows only
+
+    Returns:
+        The fitted GridSearchCV
+    """
+    from sklearn.model_selection import GridSearchCV
+    from sklearn.tree import DecisionTreeClassifier
+
+    X = matrix.frame()
+    y = matrix.target
+    if max_rows and max_rows < matrix.n_rows:
+        X, y = X.iloc[:max_rows], y[:max_rows]
+    pipeline = notebook_pipeline(
+        classifier if classifier is not None else DecisionTreeClassifier(random_state=42),
+        cache_dir=cache_dir or os.path.join(matrix.directory, "transformer_cache"),
+    )
+    search = GridSearchCV(pipeline, param_grid or NOTEBOOK_TREE_GRID, cv=cv, scoring='roc_auc', n_jobs=n_jobs)
+    search.fit(X, np.asarray(y))
+    return search
+
+
+def main(argv: Optional[List[str]] = None):
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["build", "mi", "grid"])
+    parser.add_argument("data", help="CSV or Parquet training data with the notebook's columns")
+    parser.add_argument("--target", default="status")
+    parser.add_argument("--store-dir", default=FEATURE_STORE_DIR)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--rebuild", action="store_true", help="Materialize again even if the store exists")
+    parser.add_argument("--max-rows", type=int, help="mi, grid: use this many rows")
+    parser.add_argument("--cv", type=int, default=5)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    matrix = open_store(args.data, args.target, args.store_dir, args.chunk_size, rebuild=args.rebuild)
+    logger.info(
+        f"store {matrix.key}: {matrix.n_rows} rows ({matrix.skipped_rows} skipped), "
+        f"{matrix.nbytes / 1e6:.1f} MB, ready in {time.perf_counter() - started:.2f}s"
+    )
+
+    started = time.perf_counter()
+    if args.command == "mi":
+        logger.info(mutual_information(matrix, max_rows=args.max_rows).to_string())
+    elif args.command == "grid":
+        search = grid_search(matrix, cv=args.cv, n_jobs=args.n_jobs, max_rows=args.max_rows)
+        logger.info(f"best ROC AUC {search.best_score_:.4f} with {search.best_params_}")
+    else:
+        return
+    logger.info(f"{args.command} took {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
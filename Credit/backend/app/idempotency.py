@@ -0,0 +1,321 @@
+"""
+Idempotency-Key support for the scoring endpoints
+
+A client that retries a request with the same Idempotency-Key header gets the
+stored response of the first attempt: the application is not scored again and
+no second prediction is recorded. Requests with the same key that arrive while
+the first is still running wait for it and share its result instead of racing
+it.
+
+Only successful responses are stored. When the first attempt fails, the
+requests waiting on it fail with the same error, and a later retry runs again.
+Reusing a key for a different payload is rejected.
+
+Stores are pluggable (get/claim/complete/release):
+- MemoryIdempotencyStore: bounded LRU in the worker; duplicates that reach
+  another worker are scored again;
+- SqlIdempotencyStore: a table shared by every worker; the primary key on the
+  idempotency key makes exactly one worker claim it, and duplicates arriving
+  at other workers poll until the claim completes.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from . import models
+from .cache import TTLCache
+from .concurrency import run_db
+
+logger = logging.getLogger(__name__)
+
+# Where responses are kept: "memory" (per worker), "sql" (shared by all workers) or "off"
+IDEMPOTENCY_STORE = os.getenv("IDEMPOTENCY_STORE", "memory").lower()
+# How long a key's response is replayed, and how many keys the memory store holds
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "100000"))
+# How long a duplicate waits for the first request when that one runs in another worker,
+# and the age after which an unfinished claim is considered abandoned (e.g. a crashed worker)
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "30"))
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyKeyReused(ValueError):
+    """The key was first used with a different payload"""
+
+
+class IdempotencyInProgress(Exception):
+    """Another worker is still computing the response for this key"""
+
+
+def request_fingerprint(payload: Any) -> str:
+    """Hash of a JSON-compatible request payload, independent of key order"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+@dataclass(frozen=True)
+class IdempotencyRecord:
+    fingerprint: str
+    # None while the request holding the claim is still running
+    response: Optional[Any] = None
+
+    @property
+    def completed(self) -> bool:
+        return self.response is not None
+
+
+class MemoryIdempotencyStore:
+    """Bounded in-process store; entries expire after ttl seconds"""
+
+    blocking = False
+
+    def __init__(self, max_keys: int = 100000, ttl: float = 86400.0, lock_timeout: float = 60.0):
+        self._cache = TTLCache(max_size=max_keys, default_ttl=ttl)
+        self._claimed_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.lock_timeout = lock_timeout
+
+    def get(self, key: str) -> Optional[IdempotencyRecord]:
+        return self._cache.get(key)
+
+    def claim(self, key: str, fingerprint: str) -> bool:
+        with self._lock:
+            existing = self._cache.peek(key)
+            claimed_at = self._claimed_at.get(key)
+            if existing is not None and (
+                existing.completed or (claimed_at is not None and time.monotonic() - claimed_at < self.lock_timeout)
+            ):
+                return False
+            self._cache.set(key, IdempotencyRecord(fingerprint))
+            self._claimed_at[key] = time.monotonic()
+            return True
+
+    def complete(self, key: str, fingerprint: str, response: Any):
+        with self._lock:
+            self._cache.set(key, IdempotencyRecord(fingerprint, response))
+            self._claimed_at.pop(key, None)
+
+    def release(self, key: str):
+        with self._lock:
+            record = self._cache.peek(key)
+            if record is not None and not record.completed:
+                self._cache.delete(key)
+            self._claimed_at.pop(key, None)
+
+    def stats(self) -> dict:
+        return {"backend": "memory", **self._cache.stats()}
+
+
+class SqlIdempotencyStore:
+    """
+    Store in the idempotency_keys table, shared by every worker
+
+    Methods are blocking and run on the database pool. Expired rows are
+    deleted at most once per purge_interval, so the table stays bounded by the
+    keys seen within one ttl.
+    """
+
+    blocking = True
+
+    def __init__(self, session_factory, ttl: float = 86400.0, lock_timeout: float = 60.0, purge_interval: float = 300.0):
+        self.session_factory = session_factory
+        self.ttl = timedelta(seconds=ttl)
+        self.lock_timeout = timedelta(seconds=lock_timeout)
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+        self.purged = 0
+
+    def get(self, key: str) -> Optional[IdempotencyRecord]:
+        T = models.IdempotencyKey
+        with self.session_factory() as db:
+            row = db.execute(
+                select(T.fingerprint, T.response).where(T.key == key, T.expires_at > datetime.utcnow())
+            ).first()
+        if row is None:
+            return None
+        return IdempotencyRecord(row.fingerprint, None if row.response is None else json.loads(row.response))
+
+    def claim(self, key: str, fingerprint: str) -> bool:
+        T = models.IdempotencyKey
+        now = datetime.utcnow()
+        with self.session_factory() as db:
+            self._purge(db, now)
+            # Expired entries and abandoned claims give the key up
+            db.execute(delete(T).where(T.key == key, or_(
+                T.expires_at <= now,
+                and_(T.response.is_(None), T.created_at <= now - self.lock_timeout),
+            )))
+            db.add(T(key=key, fingerprint=fingerprint, response=None, created_at=now, expires_at=now + self.ttl))
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                return False
+        return True
+
+    def complete(self, key: str, fingerprint: str, response: Any):
+        T = models.IdempotencyKey
+        with self.session_factory() as db:
+            db.execute(update(T).where(T.key == key, T.fingerprint == fingerprint).values(response=json.dumps(response)))
+            db.commit()
+
+    def release(self, key: str):
+        T = models.IdempotencyKey
+        with self.session_factory() as db:
+            db.execute(delete(T).where(T.key == key, T.response.is_(None)))
+            db.commit()
+
+    def _purge(self, db, now: datetime):
+        if time.monotonic() - self._last_purge < self.purge_interval:
+            return
+        self._last_purge = time.monotonic()
+        T = models.IdempotencyKey
+        self.purged += db.execute(delete(T).where(T.expires_at <= now)).rowcount or 0
+
+    def stats(self) -> dict:
+        return {"backend": "sql", "purged": self.purged}
+
+
+class IdempotencyManager:
+    """
+    Runs each idempotency key's computation at most once per store lifetime
+
+    In-flight computations are tracked per worker, so duplicates within a
+    worker wait on the same future with no store round trip. The store's
+    claim() arbitrates between workers.
+    """
+
+    def __init__(self, store, wait_timeout: float = 30.0, poll_interval: float = 0.05):
+        self.store = store
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.executed = 0
+        self.replayed = 0
+        self.coalesced = 0
+        self.rejected = 0
+
+    async def _call(self, func, *args):
+        if self.store.blocking:
+            return await run_db(func, *args)
+        return func(*args)
+
+    async def execute(
+        self, key: str, fingerprint: str, compute: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        """
+        Returns the response for key, computing it with compute() only if no
+        earlier request with this key produced one
+
+        Args:
+            key: Idempotency key, namespaced by the caller (e.g. per endpoint)
+            fingerprint: request_fingerprint() of the payload
+            compute: Produces the JSON-compatible response; exceptions propagate
+
+        Returns:
+            The response and whether it was replayed rather than computed here
+
+        Raises:
+            ValueError: If the key is empty or longer than MAX_KEY_LENGTH
+            IdempotencyKeyReused: If the key was used with a different payload
+            IdempotencyInProgress: If another worker still holds the key after wait_timeout
+        """
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise ValueError(f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+
+        leader = self._in_flight.get(key)
+        if leader is not None:
+            self.coalesced += 1
+            record = await asyncio.shield(leader)
+            return self._replay(record, fingerprint), True
+
+        # Registered before the first await, so later duplicates in this worker find it
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            record = await self._claim_or_wait(key, fingerprint)
+            if record is not None:
+                future.set_result(record)
+                return self._replay(record, fingerprint), True
+
+            try:
+                response = await compute()
+            except BaseException:
+                await self._call(self.store.release, key)
+                raise
+            record = IdempotencyRecord(fingerprint, response)
+            await self._call(self.store.complete, key, fingerprint, response)
+            self.executed += 1
+            future.set_result(record)
+            return response, False
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e)
+                # Marks the exception retrieved when no duplicate was waiting for it
+                future.exception()
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def _claim_or_wait(self, key: str, fingerprint: str) -> Optional[IdempotencyRecord]:
+        """None once this worker holds the claim; the stored record if the key completed"""
+        deadline = time.monotonic() + self.wait_timeout
+        delay = self.poll_interval
+        while True:
+            record = await self._call(self.store.get, key)
+            if record is not None and record.completed:
+                return record
+            if record is not None and record.fingerprint != fingerprint:
+                self.rejected += 1
+                raise IdempotencyKeyReused("Idempotency-Key was already used for a different request")
+            # Also tried while another request holds the key: the store hands over abandoned claims
+            if await self._call(self.store.claim, key, fingerprint):
+                return None
+            if time.monotonic() >= deadline:
+                raise IdempotencyInProgress("A request with this Idempotency-Key is still being processed")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+    def _replay(self, record: IdempotencyRecord, fingerprint: str) -> Any:
+        if record.fingerprint != fingerprint:
+            self.rejected += 1
+            raise IdempotencyKeyReused("Idempotency-Key was already used for a different request")
+        self.replayed += 1
+        return record.response
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._in_flight),
+            "executed": self.executed,
+            "replayed": self.replayed,
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "store": self.store.stats(),
+        }
+
+
+def create_manager(session_factory=None) -> Optional[IdempotencyManager]:
+    """The manager configured from the environment, or None when IDEMPOTENCY_STORE is off"""
+    if IDEMPOTENCY_STORE == "off":
+        return None
+    if IDEMPOTENCY_STORE == "sql":
+        store = SqlIdempotencyStore(session_factory, ttl=IDEMPOTENCY_TTL_SECONDS, lock_timeout=IDEMPOTENCY_LOCK_SECONDS)
+    elif IDEMPOTENCY_STORE == "memory":
+        store = MemoryIdempotencyStore(
+            max_keys=IDEMPOTENCY_MAX_KEYS, ttl=IDEMPOTENCY_TTL_SECONDS, lock_timeout=IDEMPOTENCY_LOCK_SECONDS
+        )
+    else:
+        raise RuntimeError(f"Unknown IDEMPOTENCY_STORE '{IDEMPOTENCY_STORE}', expected 'memory', 'sql' or 'off'")
+    return IdempotencyManager(store, wait_timeout=IDEMPOTENCY_WAIT_SECONDS)
@@ -1,29 +1,100 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Request
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Body, Header
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from fastapi.security import OAuth2PasswordRequestForm
-from passlib.context import CryptContext
 from sqlalchemy.orm import Session
-import joblib
-import pandas as pd
 import numpy as np
-from datetime import datetime
+from datetime import date, datetime
+import json
 import logging
-from typing import Optional, List
-from pydantic import BaseModel, Field
-from . import schemas, crud, auth
-from .database import SessionLocal, engine, Base
+import os
+from typing import Optional, List, Any, AsyncIterator, Tuple
+from pydantic import BaseModel, Field, ValidationError
+from . import analytics, schemas, crud, auth, ndjson
+from .concurrency import run_db, run_inference, run_in_session, run_password, password_executor, ExecutorSaturated, shutdown_executors, timed
+from .scoring import (
+    registry, current_model, ScoringModel, preprocess_batch, calculate_credit_score, calculate_credit_scores,
+    determine_decision, determine_risk_level,
+)
+from .prediction_log import PredictionWriter, PredictionLogClosed, PredictionLogFull
+from .outbox import create_outbox
+from .archive import create_archive
+from . import metrics
+from .batching import create_batcher
+from .metrics import TimingMiddleware, stage, record_since_start
+from .idempotency import (
+    IdempotencyInProgress, IdempotencyKeyReused, create_manager, request_fingerprint,
+    MAX_KEY_LENGTH as MAX_IDEMPOTENCY_KEY_LENGTH,
+)
+from .prediction_cache import PredictionCache, PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL_SECONDS
+from .shadow import ShadowScorer, load_challengers, SHADOW_MODELS, SHADOW_SAMPLE_RATE, SHADOW_QUEUE_ROWS
+from .database import SessionLocal, AsyncSessionLocal, USE_ASYNC_DB, get_async_db, engine, async_engine
+from .migrate import migrate
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize database
-Base.metadata.create_all(bind=engine)
+# Schema creation is a separate deploy step (python -m app.migrate); set this to
+# run it when the app starts instead, e.g. for local development
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "false").lower() in ("1", "true", "yes")
 
 app = FastAPI()
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Write-behind persistence for /predict
+prediction_writer = PredictionWriter(
+    AsyncSessionLocal if USE_ASYNC_DB else SessionLocal,
+    is_async=USE_ASYNC_DB,
+    batch_size=int(os.getenv("PREDICTION_LOG_BATCH_SIZE", "500")),
+    max_age=float(os.getenv("PREDICTION_LOG_MAX_AGE_MS", "250")) / 1000,
+    max_queue=int(os.getenv("PREDICTION_LOG_QUEUE_SIZE", "10000")),
+    enqueue_timeout=float(os.getenv("PREDICTION_LOG_ENQUEUE_TIMEOUT_MS", "1000")) / 1000,
+)
+
+# Challenger models scored off the request path for comparison with the serving model
+shadow_scorer = ShadowScorer(
+    load_challengers(SHADOW_MODELS),
+    sample_rate=SHADOW_SAMPLE_RATE,
+    max_pending_rows=SHADOW_QUEUE_ROWS,
+)
+
+# Optional coalescing of concurrent /predict calls into batch model calls (PREDICT_BATCHING)
+predict_batcher = create_batcher()
+
+# Stored responses for requests retried with the same Idempotency-Key (IDEMPOTENCY_STORE)
+idempotency_manager = create_manager(SessionLocal)
+
+# Background delivery of queued emails (EMAIL_OUTBOX); registration enqueues a welcome email when enabled
+email_outbox = create_outbox(SessionLocal)
+
+# Parquet archive of predictions older than the retention period (PREDICTION_ARCHIVE_DIR), read by /predictions
+prediction_archive = create_archive()
+
+# Default probabilities of recently scored applications, for resubmitted forms
+prediction_cache = PredictionCache(max_size=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL_SECONDS)
+registry.add_listener(lambda scoring_model: prediction_cache.invalidate_others(scoring_model.version))
+
+@app.on_event("startup")
+async def start_background_workers():
+    if MIGRATE_ON_STARTUP:
+        await run_db(migrate, archive=prediction_archive)
+    await prediction_writer.start()
+    await shadow_scorer.start()
+    if email_outbox is not None:
+        await email_outbox.start()
+    registry.start()
+
+@app.on_event("shutdown")
+async def stop_background_workers():
+    registry.stop()
+    if predict_batcher is not None:
+        await predict_batcher.stop()
+    await shadow_scorer.stop()
+    if email_outbox is not None:
+        await email_outbox.stop()
+    await prediction_writer.stop()
+    shutdown_executors()
 
 # CORS configuration
 app.add_middleware(
@@ -34,6 +105,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request counters, latency histograms and the Server-Timing header
+app.add_middleware(TimingMiddleware)
+
 # Database dependency
 def get_db():
     db = SessionLocal()
@@ -42,17 +116,9 @@ def get_db():
     finally:
         db.close()
 
-# Load model and encoders
-try:
-    model_data = joblib.load('app/credit_scoring_model.pkl')
-    model = model_data['model']
-    label_encoders = model_data['label_encoders']
-    num_cols = model_data['num_cols']
-    cat_cols = model_data['cat_cols']
-    logger.info("Model and encoders loaded successfully")
-except Exception as e:
-    logger.error(f"Failed to load model: {str(e)}")
-    raise RuntimeError(f"Model loading failed: {str(e)}")
+# Session for the async endpoints: an AsyncSession when USE_ASYNC_DB is set, otherwise a
+# regular Session whose work runs on the database executor (see run_in_session)
+get_request_db = get_async_db if USE_ASYNC_DB else get_db
 
 # Pydantic models
 class CreditApplication(BaseModel):
@@ -87,46 +153,27 @@ class CreditScoreResponse(BaseModel):
     modelVersion: str
     timestamp: str
 
-# Feature mapping
-FEATURE_MAPPING = {
-    "age": "age",
-    "income": "income",
-    "loanAmount": "loan_amount",
-    "interestRate": "interest_rate",
-    "turnover": "turnover",
-    "customerTenure": "customer_tenure",
-    "avgDaysLateCurrent": "avg_days_late_current",
-    "numLatePaymentsCurrent": "num_late_payments_current",
-    "unpaidAmount": "unpaid_amount",
-    "industrySector": "industry_sector",
-    "creditType": "credit_type",
-    "hasGuarantee": "has_guarantee",
-    "guaranteeType": "guarantee_type",
-    "repaymentFrequency": "repayment_frequency"
-}
+class BatchPredictionItem(BaseModel):
+    index: int
+    result: Optional[CreditScoreResponse] = None
+    error: Optional[str] = None
 
-# Authentication endpoints
-@app.post("/register", response_model=schemas.User)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, user.email)
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(db=db, user=user)
+class BatchPredictionResponse(BaseModel):
+    total: int
+    succeeded: int
+    failed: int
+    results: List[BatchPredictionItem]
 
-@app.post("/login", response_model=schemas.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = crud.authenticate_user(db, form_data.username, form_data.password)
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect email or password",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    access_token = auth.create_access_token(data={"sub": user.email})
-    return {"access_token": access_token, "token_type": "bearer"}
+# Upper bound on applications accepted by a single /predict/batch call
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "50000"))
 
-@app.get("/users/me", response_model=schemas.User)
-async def read_users_me(request: Request, db: Session = Depends(get_db)):
+# Applications scored per model call on /predict/stream, and the longest line it will parse
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "1000"))
+MAX_STREAM_LINE_BYTES = int(os.getenv("MAX_STREAM_LINE_BYTES", "65536"))
+
+# Shared authentication dependency
+async def get_current_user(request: Request, db: Session = Depends(get_request_db)) -> schemas.User:
+    """Resolve the bearer token to a user, served from the auth cache when possible"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -135,131 +182,195 @@ async def read_users_me(request: Request, db: Session = Depends(get_db)):
     token = request.headers.get("Authorization")
     if not token:
         raise credentials_exception
+    token = token.split(" ")[1] if " " in token else token
+
+    user = auth.get_cached_user(token)
+    if user is not None:
+        return user
+
     try:
-        token = token.split(" ")[1] if " " in token else token
         email = await auth.verify_token(token)
         if email is None:
             raise credentials_exception
-        user = crud.get_user_by_email(db, email=email)
-        if user is None:
+        db_user = await run_in_session(db, crud.get_user_by_email, email=email)
+        if db_user is None:
             raise credentials_exception
-        return user
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Authentication error: {str(e)}")
         raise credentials_exception
 
-# Helper functions
-def preprocess_input(data: dict) -> pd.DataFrame:
-    """Convert form data to model input format"""
-    input_dict = {}
-    
-    for form_field, model_feature in FEATURE_MAPPING.items():
-        if form_field in data:
-            if model_feature in num_cols:
-                input_dict[model_feature] = float(data[form_field])
-            elif model_feature == 'has_guarantee':
-                input_dict[model_feature] = 1 if str(data[form_field]).lower() in ['yes', 'true', '1'] else 0
-            else:
-                input_dict[model_feature] = str(data[form_field])
-    
-    return pd.DataFrame([input_dict])
-
-def encode_categorical_features(df: pd.DataFrame) -> pd.DataFrame:
-    """Encode categorical features using saved label encoders with proper unknown value handling"""
-    for col in cat_cols:
-        if col in df.columns:
-            raw_value = df[col].iloc[0]
-            str_value = str(raw_value) if not pd.isna(raw_value) else "missing"
-            
-            # Handle unseen categories by using the most frequent category
-            if str_value not in label_encoders[col].classes_:
-                logger.warning(f"Unseen category '{str_value}' in column '{col}', using most frequent category")
-                str_value = label_encoders[col].classes_[0]
-            
-            df[col] = label_encoders[col].transform([str_value])[0]
-    
-    return df
-
-def calculate_credit_score(prob_default: float) -> int:
-    """Convert probability of default to credit score (300-850)"""
-    odds = (1 - prob_default) / (prob_default + 1e-9)
-    score = 300 + (50 * np.log10(odds))
-    return int(np.clip(score, 300, 850))
-
-def determine_risk_level(score: int) -> str:
-    """Categorize risk based on credit score"""
-    if score >= 750:
-        return "Very Low"
-    elif score >= 650:
-        return "Low"
-    elif score >= 550:
-        return "Medium"
-    elif score >= 450:
-        return "High"
-    return "Very High"
-
-def get_key_factors(input_data: dict) -> dict:
-    """Generate key positive/negative factors for decision"""
-    factors = {"positive": [], "negative": []}
-    
-    if input_data.get('income', 0) > 100000:
-        factors["positive"].append("High income")
-    if input_data.get('customer_tenure', 0) > 24:
-        factors["positive"].append("Long customer tenure")
-    
-    if input_data.get('avg_days_late_current', 0) > 15:
-        factors["negative"].append("Frequent late payments")
-    if input_data.get('num_late_payments_current', 0) > 3:
-        factors["negative"].append("Multiple late payments")
-    
-    debt_ratio = input_data.get('loan_amount', 0) / max(input_data.get('income', 1), 1)
-    if debt_ratio > 0.35:
-        factors["negative"].append(f"High debt ratio ({debt_ratio:.0%})")
-    
-    return factors
+    user = schemas.User.model_validate(db_user)
+    auth.cache_user(token, user)
+    return user
+
+async def run_password_or_503(func, *args):
+    """Run bcrypt work on the password pool, shedding load with 503 when it is saturated"""
+    try:
+        return await run_password(func, *args)
+    except ExecutorSaturated:
+        logger.warning("Password hashing pool saturated, rejecting request")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication service is busy, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+# Authentication endpoints
+@app.post("/register", response_model=schemas.User)
+async def register(user: schemas.UserCreate, db: Session = Depends(get_request_db)):
+    db_user = await run_in_session(db, crud.get_user_by_email, user.email)
+    if db_user:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    hashed_password = await run_password_or_503(auth.get_password_hash, user.password)
+    db_user = await run_in_session(
+        db, crud.create_user, user=user, hashed_password=hashed_password, welcome_email=email_outbox is not None
+    )
+    if email_outbox is not None:
+        email_outbox.notify()
+    return db_user
+
+@app.post("/login", response_model=schemas.Token)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_request_db)):
+    user = await run_in_session(db, crud.get_user_by_email, form_data.username)
+    if user and not await run_password_or_503(auth.verify_password, form_data.password, user.hashed_password):
+        user = None
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect email or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    access_token = auth.create_access_token(data={"sub": user.email})
+    return {"access_token": access_token, "token_type": "bearer"}
+
+@app.get("/users/me", response_model=schemas.User)
+async def read_users_me(user: schemas.User = Depends(get_current_user)):
+    return user
+
+async def log_prediction(prediction_data: dict, user_id: Optional[int] = None):
+    """Queue a single prediction for the write-behind log, skipping records that fail validation"""
+    try:
+        prediction = schemas.PredictionCreate(**prediction_data)
+    except ValidationError as e:
+        logger.error(f"Failed to save prediction: {str(e)}")
+        return
+
+    try:
+        await prediction_writer.enqueue(
+            {**prediction.dict(), "user_id": user_id, "timestamp": datetime.utcnow()}
+        )
+    except PredictionLogFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Prediction log is saturated, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+    except PredictionLogClosed:
+        # In flight while the worker shuts down; another worker can take the retry
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is shutting down, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+def save_batch_predictions(db: Session, predictions: List[schemas.PredictionCreate]):
+    """Persist batch predictions with one bulk insert, logging rather than failing on errors"""
+    if not predictions:
+        return
+    try:
+        crud.create_predictions_bulk(db, predictions, user_id=None)
+    except Exception as e:
+        logger.error(f"Failed to save batch predictions: {str(e)}")
+
+async def run_idempotent(path: str, idempotency_key: str, payload: Any, compute):
+    """
+    Returns compute()'s JSON-compatible response, or the stored one when the key was used before
+
+    Replays carry an Idempotent-Replayed header; concurrent requests with the key share one computation.
+    """
+    if not idempotency_key or len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key must be 1 to {MAX_IDEMPOTENCY_KEY_LENGTH} characters"
+        )
+    try:
+        content, replayed = await idempotency_manager.execute(
+            f"{path}:{idempotency_key}", request_fingerprint(payload), compute
+        )
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    except IdempotencyInProgress as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e), headers={"Retry-After": "1"})
+    if replayed:
+        return JSONResponse(content, headers={"Idempotent-Replayed": "true"})
+    return content
 
 # Protected prediction endpoint
 @app.post("/predict", response_model=CreditScoreResponse)
 async def predict_credit_score(
     application: CreditApplication,
-    db: Session = Depends(get_db)
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
-    """Endpoint for credit scoring prediction (no authentication required)"""
+    """
+    Endpoint for credit scoring prediction (no authentication required)
+
+    Retries sending the same Idempotency-Key get the first response back, without
+    scoring or recording the application again.
+    """
+    record_since_start("validate")
+    if idempotency_key is None or idempotency_manager is None:
+        return await score_application(application)
+    return await run_idempotent("/predict", idempotency_key, application.dict(), lambda: score_application(application))
+
+async def score_application(application: CreditApplication) -> dict:
+    """Scores and records one application, returning the /predict response"""
     try:
         logger.info(f"Received application for {application.client_name}")
         
-        app_data = application.dict()
-        input_df = preprocess_input(app_data)
+        # One version for the whole request, even if the registry swaps models meanwhile
+        scoring_model = current_model()
+        with stage("preprocess"):
+            features = scoring_model.preprocess_record(application.dict())
+        with stage("cache"):
+            cache_key = prediction_cache.key(scoring_model.version, features)
+            prob_default = prediction_cache.get(cache_key)
         
-        try:
-            input_df = encode_categorical_features(input_df)
-        except ValueError as e:
-            logger.error(f"Encoding error: {str(e)}")
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail=f"Invalid input data: {str(e)}"
-            )
-        
-        if hasattr(model, 'feature_names_in_'):
-            missing_features = set(model.feature_names_in_) - set(input_df.columns)
-            if missing_features:
-                for feature in missing_features:
-                    if feature in cat_cols:
-                        input_df[feature] = label_encoders[feature].transform(["missing"])[0]
+        if prob_default is None:
+            try:
+                # Includes the hop to the inference executor (and any batching wait); the
+                # model work itself is timed as encode/predict
+                with stage("inference"):
+                    if predict_batcher is not None:
+                        prob_default, inference_seconds = await predict_batcher.predict(scoring_model, features)
                     else:
-                        input_df[feature] = 0.0
-            input_df = input_df[model.feature_names_in_]
+                        prob_default, inference_seconds = await run_inference(
+                            timed, infer_one, scoring_model, features
+                        )
+                        metrics.inference_batch_rows.observe(1, "predict")
+            except ValueError as e:
+                logger.error(f"Encoding error: {str(e)}")
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=f"Invalid input data: {str(e)}"
+                )
+            prediction_cache.set(cache_key, prob_default)
+            score = calculate_credit_score(prob_default)
+            shadow_scorer.submit(scoring_model.version, np.array([score]), inference_seconds, features=features)
+        else:
+            score = calculate_credit_score(prob_default)
         
-        prob_default = model.predict_proba(input_df)[0][1]
-        score = calculate_credit_score(prob_default)
         approval_prob = 100 * (1 - prob_default)
-        decision = "Approved" if score >= 650 else "Approved with conditions" if score >= 550 else "Declined"
+        decision = determine_decision(score)
+        risk_level = determine_risk_level(score)
+        metrics.predictions.inc("predict", decision, risk_level)
         
         # If you still want to store predictions without user association
         prediction_data = {
             "client_name": application.client_name,
             "credit_score": score,
-            "risk_level": determine_risk_level(score),
+            "risk_level": risk_level,
             "decision": decision,
             "income": application.income,
             "loan_amount": application.loanAmount,
@@ -269,21 +380,23 @@ async def predict_credit_score(
             "user_id": None  # No user association
         }
         
-        try:
-            crud.create_prediction(db, schemas.PredictionCreate(**prediction_data))
-        except Exception as e:
-            logger.error(f"Failed to save prediction: {str(e)}")
+        with stage("record"):
+            await log_prediction(prediction_data)
         
-        response = {
-            "client": application.client_name,
-            "creditScore": score,
-            "riskLevel": determine_risk_level(score),
-            "approvalProbability": f"{approval_prob:.1f}%",
-            "decision": decision,
-            "keyFactors": get_key_factors(input_df.iloc[0].to_dict()),
-            "modelVersion": "1.0",
-            "timestamp": datetime.now().isoformat()
-        }
+        with stage("explain"):
+            key_factors = scoring_model.key_factors(features)
+
+        with stage("response"):
+            response = {
+                "client": application.client_name,
+                "creditScore": score,
+                "riskLevel": risk_level,
+                "approvalProbability": f"{approval_prob:.1f}%",
+                "decision": decision,
+                "keyFactors": key_factors,
+                "modelVersion": scoring_model.version,
+                "timestamp": datetime.now().isoformat()
+            }
         
         logger.info(f"Processed application for {application.client_name} - Score: {score}")
         return response
@@ -297,37 +410,270 @@ async def predict_credit_score(
             detail=f"Prediction failed: {str(e)}"
         )
 
+def infer_one(scoring_model: ScoringModel, features: dict) -> float:
+    """Encodes and scores one application, timing the two steps; runs on the inference executor"""
+    with stage("encode"):
+        encoded = scoring_model.category_encoder.encode_record(features)
+    with stage("predict"):
+        return scoring_model.predict_encoded_probability(encoded)
+
+def score_batch(records: List[dict]) -> Tuple[BatchPredictionResponse, List[schemas.PredictionCreate]]:
+    """
+    Scores a batch of raw application payloads with a single model call
+    
+    Args:
+        records: Raw application dictionaries, validated one by one
+        
+    Returns:
+        Per-row results in input order, with an error message for rows that failed validation,
+        and the prediction records to persist
+    """
+    items: List[BatchPredictionItem] = [None] * len(records)
+    applications: List[CreditApplication] = []
+    positions: List[int] = []
+
+    with stage("validate"):
+        for index, record in enumerate(records):
+            try:
+                applications.append(CreditApplication(**record))
+                positions.append(index)
+            except (ValidationError, TypeError) as e:
+                if isinstance(e, ValidationError):
+                    message = "; ".join(
+                        f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()
+                    )
+                else:
+                    message = "Application must be a JSON object"
+                items[index] = BatchPredictionItem(index=index, error=message)
+
+    scoring_model = current_model()
+    if applications:
+        with stage("preprocess"):
+            app_data = [application.dict() for application in applications]
+            preprocessed = preprocess_batch(app_data, scoring_model)
+        with stage("encode"):
+            unseen_masks: dict = {}
+            columns, encoding_errors = scoring_model.encode_categorical_batch(preprocessed, unseen_masks)
+
+        if encoding_errors:
+            for row, message in encoding_errors.items():
+                items[positions[row]] = BatchPredictionItem(index=positions[row], error=message)
+            keep = np.ones(len(applications), dtype=bool)
+            keep[list(encoding_errors)] = False
+            columns = {col: values[keep] for col, values in columns.items()}
+            unseen_masks = {col: mask[keep] for col, mask in unseen_masks.items()}
+            if shadow_scorer.enabled:
+                preprocessed = {col: values[keep] for col, values in preprocessed.items()}
+            applications = [application for application, kept in zip(applications, keep) if kept]
+            positions = [index for index, kept in zip(positions, keep) if kept]
+
+    predictions: List[schemas.PredictionCreate] = []
+    if applications:
+        prob_default, inference_seconds = timed(
+            scoring_model.predict_default_probabilities, columns, len(applications)
+        )
+        metrics.record_stage("predict", inference_seconds)
+        metrics.inference_batch_rows.observe(len(applications), "batch")
+        scores = calculate_credit_scores(prob_default)
+        shadow_scorer.submit(scoring_model.version, scores, inference_seconds, columns=preprocessed)
+
+        with stage("explain"):
+            key_factors = scoring_model.key_factors_batch(columns, len(applications), unseen_masks)
+
+        with stage("response"):
+            timestamp = datetime.now().isoformat()
+            outcomes: dict = {}
+
+            unsaved = 0
+            for i, (index, application) in enumerate(zip(positions, applications)):
+                score = int(scores[i])
+                risk_level = determine_risk_level(score)
+                decision = determine_decision(score)
+                outcomes[decision, risk_level] = outcomes.get((decision, risk_level), 0) + 1
+
+                try:
+                    predictions.append(schemas.PredictionCreate(
+                        client_name=application.client_name,
+                        credit_score=score,
+                        risk_level=risk_level,
+                        decision=decision,
+                        income=application.income,
+                        loan_amount=application.loanAmount,
+                        interest_rate=application.interestRate,
+                        employment=application.employment,
+                        loan_purpose=application.loanPurpose
+                    ))
+                except ValidationError:
+                    unsaved += 1
+
+                items[index] = BatchPredictionItem(index=index, result=CreditScoreResponse(
+                    client=application.client_name,
+                    creditScore=score,
+                    riskLevel=risk_level,
+                    approvalProbability=f"{100 * (1 - prob_default[i]):.1f}%",
+                    decision=decision,
+                    keyFactors=key_factors[i],
+                    modelVersion=scoring_model.version,
+                    timestamp=timestamp
+                ))
+
+        for (decision, risk_level), n in outcomes.items():
+            metrics.predictions.inc("batch", decision, risk_level, amount=n)
+
+        if unsaved:
+            logger.error(f"Failed to save {unsaved} batch predictions: record validation failed")
+
+    succeeded = len(applications)
+    response = BatchPredictionResponse(
+        total=len(records),
+        succeeded=succeeded,
+        failed=len(records) - succeeded,
+        results=items
+    )
+    return response, predictions
+
+def predict_batch(records: List[dict], db: Session) -> BatchPredictionResponse:
+    """
+    Scores a batch of raw application payloads and bulk-inserts the predictions
+    
+    Args:
+        records: Raw application dictionaries, validated one by one
+        db: Database session used for the bulk insert of predictions
+        
+    Returns:
+        Per-row results in input order, with an error message for rows that failed validation
+    """
+    response, predictions = score_batch(records)
+    save_batch_predictions(db, predictions)
+    return response
+
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_credit_score_batch(
+    records: List[Any] = Body(...),
+    db: Session = Depends(get_request_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """
+    Endpoint for scoring many applications in one vectorized pass (no authentication required)
+
+    Supports Idempotency-Key like /predict.
+    """
+    if len(records) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch size {len(records)} exceeds the limit of {MAX_BATCH_SIZE}"
+        )
+    if idempotency_key is None or idempotency_manager is None:
+        return await score_and_record_batch(records, db)
+
+    async def compute():
+        return jsonable_encoder(await score_and_record_batch(records, db))
+
+    return await run_idempotent("/predict/batch", idempotency_key, records, compute)
+
+async def score_and_record_batch(records: List[Any], db) -> BatchPredictionResponse:
+    """Scores a batch and records its predictions, returning the /predict/batch response"""
+    try:
+        logger.info(f"Received batch of {len(records)} applications")
+        response, predictions = await run_inference(score_batch, records)
+        with stage("record"):
+            await run_in_session(db, save_batch_predictions, predictions)
+        logger.info(f"Processed batch - {response.succeeded} scored, {response.failed} rejected")
+        return response
+    except Exception as e:
+        logger.error(f"Batch prediction error: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Batch prediction failed: {str(e)}"
+        )
+
+
+@app.post("/predict/stream")
+async def predict_credit_score_stream(request: Request):
+    """
+    Endpoint for scoring an NDJSON upload of applications, one JSON object per line (no authentication required)
+
+    The body is parsed as it arrives and scored STREAM_CHUNK_ROWS lines at a time;
+    each chunk's results are streamed back as NDJSON lines {"index": i, "result": {...}}
+    or {"index": i, "error": "..."} before the next chunk is read, so memory stays
+    bounded whatever the upload size. Invalid lines are reported inline and the
+    stream goes on. A final {"summary": {...}} line carries the totals.
+    """
+    return ndjson.UploadStreamingResponse(request, stream_scores)
+
+async def stream_scores(body: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Scores and records an NDJSON body chunk by chunk, yielding the response lines"""
+    total = succeeded = 0
+    async for lines in ndjson.iter_batches(body, STREAM_CHUNK_ROWS, MAX_STREAM_LINE_BYTES):
+        items: List[BatchPredictionItem] = [
+            BatchPredictionItem(index=total + i, error=error) for i, (_, error) in enumerate(lines)
+        ]
+        positions = [i for i, (_, error) in enumerate(lines) if error is None]
+        if positions:
+            try:
+                response, predictions = await run_inference(score_batch, [lines[i][0] for i in positions])
+            except Exception as e:
+                logger.error(f"Stream chunk scoring error: {str(e)}", exc_info=True)
+                for i in positions:
+                    items[i].error = f"Prediction failed: {str(e)}"
+            else:
+                for i, item in zip(positions, response.results):
+                    item.index = total + i
+                    items[i] = item
+                succeeded += response.succeeded
+                with stage("record"):
+                    await run_db(save_stream_predictions, predictions)
+        total += len(lines)
+        yield "".join(item.model_dump_json(exclude_none=True) + "\n" for item in items).encode()
+
+    logger.info(f"Processed stream - {succeeded} scored, {total - succeeded} rejected")
+    summary = {"total": total, "succeeded": succeeded, "failed": total - succeeded}
+    yield (json.dumps({"summary": summary}) + "\n").encode()
+
+def save_stream_predictions(predictions: List[schemas.PredictionCreate]):
+    """Persists one streamed chunk in its own session: the response outlives request-scoped sessions"""
+    if not predictions:
+        return
+    with SessionLocal() as db:
+        save_batch_predictions(db, predictions)
+
+
+# Largest page /predictions will return
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
 
-@app.get("/predictions", response_model=List[schemas.Prediction])
+@app.get("/predictions", response_model=schemas.PredictionPage)
 async def get_predictions(
-    request: Request,
-    skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    order_by: str = "timestamp",
+    order_direction: str = "desc",
+    user: schemas.User = Depends(get_current_user),
+    db: Session = Depends(get_request_db)
 ):
-    """Get historical predictions for the authenticated user"""
+    """Get historical predictions for the authenticated user, one keyset page at a time"""
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"limit must be between 1 and {MAX_PAGE_SIZE}"
+        )
     try:
-        auth_header = request.headers.get("Authorization")
-        if not auth_header:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Authorization header missing"
-            )
-        
-        token = auth_header.split(" ")[1] if " " in auth_header else auth_header
-        email = await auth.verify_token(token)
-        user = crud.get_user_by_email(db, email=email)
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid user"
-            )
-        
-        predictions = crud.get_predictions(db, user_id=user.id, skip=skip, limit=limit)
-        return predictions
+        predictions, next_cursor = await run_in_session(
+            db,
+            crud.get_predictions_page,
+            user_id=user.id,
+            limit=limit,
+            order_by=order_by,
+            order_direction=order_direction,
+            cursor=cursor,
+            archive=prediction_archive
+        )
+        return {"items": predictions, "next_cursor": next_cursor}
     
-    except HTTPException:
-        raise
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Error fetching predictions: {str(e)}")
         raise HTTPException(
@@ -335,10 +681,129 @@ async def get_predictions(
             detail="Failed to fetch predictions"
         )
 
+@app.get("/analytics/portfolio", response_model=schemas.PortfolioAnalytics)
+async def get_portfolio_analytics(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    granularity: str = "day",
+    scope: str = "user",
+    user: schemas.User = Depends(get_current_user),
+    db: Session = Depends(get_request_db)
+):
+    """
+    Score distribution, approval rate, risk-level mix and average loan amount over time
+
+    Read from the prediction rollups, so the cost depends on the date range, not on the
+    number of predictions. scope=user covers the caller's predictions, scope=all every
+    prediction, including those logged without a user, and is open to admins only
+    (ADMIN_EMAILS).
+    """
+    if scope not in ("user", "all"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="scope must be 'user' or 'all'"
+        )
+    if scope == "all" and not auth.is_admin(user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="scope=all requires an admin account"
+        )
+    try:
+        return await run_in_session(
+            db,
+            analytics.portfolio_summary,
+            user_id=user.id if scope == "user" else None,
+            start=start,
+            end=end,
+            granularity=granularity
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@app.get("/shadow")
+async def get_shadow_stats():
+    """Aggregated champion/challenger comparison from shadow scoring"""
+    return shadow_scorer.stats()
+
+def service_metrics():
+    """Gauges and counters read from the existing stats objects when /metrics is scraped"""
+    pools = []
+    for name, bound_engine in (("sync", engine), ("async", async_engine)):
+        pool = getattr(bound_engine, "pool", None)
+        if pool is not None and hasattr(pool, "checkedout"):
+            pools.append(({"engine": name}, pool))
+    yield ("credit_db_pool_size", "gauge", "Configured connection pool size",
+           [(labels, pool.size()) for labels, pool in pools])
+    yield ("credit_db_pool_checked_out", "gauge", "Connections currently in use",
+           [(labels, pool.checkedout()) for labels, pool in pools])
+    yield ("credit_db_pool_overflow", "gauge", "Connections open beyond the pool size",
+           [(labels, max(pool.overflow(), 0)) for labels, pool in pools])
+
+    scoring_model = current_model()
+    yield ("credit_model_info", "gauge", "Model version being served", [({"version": scoring_model.version}, 1)])
+    yield ("credit_unseen_categories_total", "counter", "Category values the served model never saw, by column",
+           [({"version": scoring_model.version, "column": column}, count)
+            for column, count in scoring_model.category_encoder.unseen_counts().items()])
+
+    log_stats = prediction_writer.stats()
+    yield ("credit_prediction_log_queue_depth", "gauge", "Predictions waiting to be written",
+           [({}, log_stats["queue_depth"])])
+    yield ("credit_prediction_log_records_total", "counter", "Prediction log records by outcome",
+           [({"outcome": outcome}, log_stats[outcome]) for outcome in ("enqueued", "flushed", "failed", "rejected")])
+
+    cache_stats = prediction_cache.stats()
+    if cache_stats["enabled"]:
+        yield ("credit_prediction_cache_lookups_total", "counter", "/predict result cache lookups",
+               [({"result": "hit"}, cache_stats["hits"]), ({"result": "miss"}, cache_stats["misses"])])
+        yield ("credit_prediction_cache_entries", "gauge", "/predict result cache size",
+               [({}, cache_stats["size"])])
+
+    if email_outbox is not None:
+        outbox_stats = email_outbox.stats()
+        queue = outbox_stats["queue"]
+        yield ("credit_email_outbox_queued", "gauge", "Undelivered outbox emails by status",
+               [({"status": status}, queue.get(status, 0)) for status in ("pending", "sending", "dead")])
+        yield ("credit_email_outbox_oldest_pending_seconds", "gauge", "Age of the oldest undelivered outbox email",
+               [({}, queue.get("oldest_pending_seconds", 0.0))])
+        yield ("credit_email_outbox_send_rate", "gauge", "Emails sent per second of SMTP time",
+               [({}, outbox_stats["send_rate_per_second"])])
+
+    if password_executor is not None:
+        pool_stats = password_executor.stats()
+        yield ("credit_password_pool_in_flight", "gauge", "Password hashes queued or running",
+               [({}, pool_stats["in_flight"])])
+        yield ("credit_password_pool_rejected_total", "counter", "Password hashes refused with 503",
+               [({}, pool_stats["rejected"])])
+
+metrics.registry.add_collector(service_metrics)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text-format metrics"""
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "model_loaded": model is not None}
+    scoring_model = current_model()
+    return {
+        "status": "healthy",
+        "model_loaded": scoring_model is not None,
+        "model_version": scoring_model.version,
+        "model_registry": registry.stats(),
+        "unseen_categories": scoring_model.category_encoder.unseen_counts(),
+        "prediction_log": prediction_writer.stats(),
+        "auth_cache": auth.auth_cache_stats(),
+        "prediction_cache": prediction_cache.stats(),
+        "predict_batching": predict_batcher.stats() if predict_batcher is not None else None,
+        "idempotency": idempotency_manager.stats() if idempotency_manager is not None else None,
+        "email_outbox": email_outbox.stats() if email_outbox is not None else None,
+        "prediction_archive": prediction_archive.stats() if prediction_archive is not None else None,
+        "password_pool": password_executor.stats() if password_executor else None
+    }
 
 if __name__ == "__main__":
     import uvicorn
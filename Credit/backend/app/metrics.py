@@ -0,0 +1,330 @@
+"""
+Prometheus-style metrics and per-request stage timings
+
+Counters and histograms are updated on the request path with a lock and a
+bisect, nothing more; collectors registered with add_collector() read the
+existing stats objects (DB pool, prediction log, caches) only when /metrics is
+scraped. render() produces the Prometheus text exposition format.
+
+TimingMiddleware gives every HTTP request a RequestTimings in a context
+variable. Code on the request path wraps its stages in `with stage("name"):`;
+each stage is observed in the credit_stage_duration_seconds histogram and,
+with SERVER_TIMING enabled, listed in the response's Server-Timing header.
+Executor work started through app.concurrency keeps the request's context, so
+stages timed on worker threads are attributed to the request too.
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from starlette.datastructures import MutableHeaders
+
+# Attach a Server-Timing header with the stage durations to every HTTP response
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+LAG_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0, 21600.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (metric name, type, help, [(labels, value), ...]) produced by collectors at scrape time
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in values:
+            lines.append(f"{self.name}{_format_labels(dict(zip(self.labelnames, labels)))} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with optional labels
+
+    Besides the Prometheus rendering, each series keeps its max and answers
+    bucket-edge quantiles, so unregistered instances also serve as in-process
+    summaries (see shadow.ComparisonStats).
+    """
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float], labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        # labels -> [per-bucket counts (last one is +Inf), sum, count, max]
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def _get_series(self, labels: tuple) -> list:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0, None]
+        return series
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._get_series(labels)
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+            series[3] = value if series[3] is None else max(series[3], value)
+
+    def observe_array(self, values: np.ndarray, *labels: str):
+        """observe() for every value of an array, counting each bucket once"""
+        if not len(values):
+            return
+        indexes, counts = np.unique(np.searchsorted(self.buckets, values, side="left"), return_counts=True)
+        total, top = float(values.sum()), float(values.max())
+        with self._lock:
+            series = self._get_series(labels)
+            for index, n in zip(indexes.tolist(), counts.tolist()):
+                series[0][index] += n
+            series[1] += total
+            series[2] += len(values)
+            series[3] = top if series[3] is None else max(series[3], top)
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def quantile(self, q: float, *labels: str) -> Optional[float]:
+        """Upper edge of the bucket holding the q-th value (the max for the +Inf bucket)"""
+        series = self._series.get(labels)
+        if not series or not series[2]:
+            return None
+        seen = 0
+        for index, n in enumerate(series[0]):
+            seen += n
+            if seen >= q * series[2]:
+                return self.buckets[index] if index < len(self.buckets) else series[3]
+        return series[3]
+
+    def summary(self, *labels: str) -> dict:
+        """Count, mean, p50, p99, max and per-bucket counts of one series, for JSON stats"""
+        with self._lock:
+            counts, total, count, top = self._series.get(labels) or ([0] * (len(self.buckets) + 1), 0.0, 0, None)
+            counts = list(counts)
+        return {
+            "count": count,
+            "mean": round(total / count, 4) if count else None,
+            "p50": self.quantile(0.5, *labels),
+            "p99": self.quantile(0.99, *labels),
+            "max": top,
+            "buckets": {
+                **{f"le_{edge}": n for edge, n in zip(self.buckets, counts)},
+                "overflow": counts[-1],
+            },
+        }
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = [(labels, list(series[0]), series[1], series[2]) for labels, series in self._series.items()]
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, counts, total, count in snapshot:
+            label_dict = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for edge, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                bucket_labels = _format_labels({**label_dict, "le": _format_value(float(edge))})
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(label_dict)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(label_dict)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: list = []
+        self.collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float], labelnames: Sequence[str] = ()) -> Histogram:
+        metric = Histogram(name, help, buckets, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Family]]):
+        """Registers collector(), called on every scrape, yielding (name, type, help, samples) families"""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            for name, kind, help, samples in collector():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    "credit_http_requests_total", "HTTP requests by route and status", ("method", "path", "status")
+)
+http_duration = registry.histogram(
+    "credit_http_request_duration_seconds", "HTTP request latency by route", LATENCY_BUCKETS, ("method", "path")
+)
+stage_duration = registry.histogram(
+    "credit_stage_duration_seconds", "Time spent in each stage of a request", LATENCY_BUCKETS, ("path", "stage")
+)
+predictions = registry.counter(
+    "credit_predictions_total", "Scored applications by endpoint, decision and risk level",
+    ("endpoint", "decision", "risk_level"),
+)
+inference_batch_rows = registry.histogram(
+    "credit_inference_batch_rows", "Rows per model call", BATCH_SIZE_BUCKETS, ("endpoint",)
+)
+email_deliveries = registry.counter(
+    "credit_email_outbox_deliveries_total", "Outbox email send attempts by outcome (sent, retried, dead)", ("outcome",)
+)
+email_delivery_lag = registry.histogram(
+    "credit_email_outbox_lag_seconds", "Time from enqueueing an email to its delivery", LAG_BUCKETS
+)
+
+
+class RequestTimings:
+    """Stage durations of one request, in the order they finished"""
+
+    __slots__ = ("scope", "started", "stages")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.started = time.perf_counter()
+        self.stages: List[Tuple[str, float]] = []
+
+    @property
+    def path(self) -> str:
+        """The matched route's path template (e.g. /predictions/{id}), "unmatched" before routing or on 404"""
+        return getattr(self.scope.get("route"), "path", None) or "unmatched"
+
+    def header(self, total: float) -> str:
+        parts = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.stages]
+        parts.append(f"total;dur={total * 1000:.3f}")
+        return ", ".join(parts)
+
+
+_current: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+
+
+def record_stage(name: str, seconds: float):
+    """Records a stage timed elsewhere, e.g. returned from executor work"""
+    timings = _current.get()
+    if timings is None:
+        stage_duration.observe(seconds, "", name)
+        return
+    timings.stages.append((name, seconds))
+    stage_duration.observe(seconds, timings.path, name)
+
+
+def record_since_start(name: str):
+    """Records the time from the start of the request until now, e.g. routing and body validation"""
+    timings = _current.get()
+    if timings is not None:
+        record_stage(name, time.perf_counter() - timings.started)
+
+
+class stage:
+    """Context manager timing one stage of the current request"""
+
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record_stage(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware counting and timing requests and adding Server-Timing
+
+    Requests and stages are labelled with the matched route's path template,
+    so label cardinality stays bounded. A plain ASGI middleware rather than
+    BaseHTTPMiddleware, which would add a task and a stream per request.
+    """
+
+    def __init__(self, app, server_timing: bool = SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings(scope)
+        token = _current.set(timings)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", timings.header(time.perf_counter() - timings.started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            elapsed = time.perf_counter() - timings.started
+            http_requests.inc(scope["method"], timings.path, str(status_code))
+            http_duration.observe(elapsed, scope["method"], timings.path)
@@ -0,0 +1,99 @@
+"""
+Creates and upgrades the database schema
+
+Run once per deploy, before starting the API workers, so that worker start-up
+never touches the schema:
+    python -m app.migrate
+
+Each run
+- creates missing tables;
+- creates the missing indexes of existing tables, e.g. the keyset pagination
+  indexes on predictions;
+- on SQLite, rebuilds a predictions table created without AUTOINCREMENT. The
+  archive (archive.py) empties the table of old rows, and SQLite would then
+  hand out their ids again. The rebuild copies the rows in one transaction and
+  starts the id sequence after the highest id in the table or the archive.
+Columns of existing tables are not altered.
+"""
+import logging
+from typing import Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from . import models  # noqa: F401  registers the tables on Base.metadata
+from .archive import PredictionArchive, create_archive
+from .database import Base, engine
+
+logger = logging.getLogger(__name__)
+
+LEGACY_PREDICTIONS = "predictions_legacy"
+
+
+def migrate(bind: Engine = engine, archive: Optional[PredictionArchive] = None):
+    """
+    Creates missing tables and indexes and rebuilds a SQLite predictions table without AUTOINCREMENT
+
+    Args:
+        archive: The prediction archive, whose ids a rebuilt table must not reuse
+    """
+    Base.metadata.create_all(bind=bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+    if bind.dialect.name == "sqlite" and not _has_autoincrement(bind, models.Prediction.__tablename__):
+        _rebuild_predictions(bind, archive)
+    logger.info(f"Schema is up to date on {bind.url.render_as_string(hide_password=True)}")
+
+
+def _has_autoincrement(bind: Engine, table: str) -> bool:
+    with bind.connect() as conn:
+        sql = conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table}
+        ).scalar()
+    return sql is not None and "AUTOINCREMENT" in sql.upper()
+
+
+def _rebuild_predictions(bind: Engine, archive: Optional[PredictionArchive]):
+    table = models.Prediction.__table__
+    old_columns = {column["name"] for column in inspect(bind).get_columns(table.name)}
+    columns = ", ".join(column.name for column in table.columns if column.name in old_columns)
+
+    # pysqlite commits before DDL on its own; an explicit transaction keeps the rebuild atomic
+    with bind.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            conn.exec_driver_sql(f"ALTER TABLE {table.name} RENAME TO {LEGACY_PREDICTIONS}")
+            _drop_indexes(conn, LEGACY_PREDICTIONS)
+            table.create(conn)
+            copied = conn.exec_driver_sql(
+                f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {LEGACY_PREDICTIONS} ORDER BY id"
+            ).rowcount
+            conn.exec_driver_sql(f"DROP TABLE {LEGACY_PREDICTIONS}")
+            last_id = max(
+                conn.exec_driver_sql(f"SELECT coalesce(max(id), 0) FROM {table.name}").scalar(),
+                (archive.max_id() if archive is not None else None) or 0,
+            )
+            conn.exec_driver_sql("DELETE FROM sqlite_sequence WHERE name = ?", (table.name,))
+            conn.exec_driver_sql("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table.name, last_id))
+            conn.exec_driver_sql("COMMIT")
+        except BaseException:
+            conn.exec_driver_sql("ROLLBACK")
+            raise
+    logger.info(f"Rebuilt {table.name} with AUTOINCREMENT: {copied} rows, new ids start after {last_id}")
+
+
+def _drop_indexes(conn: Connection, table: str):
+    # Indexes follow a renamed table and keep their names, which the new table needs
+    names = conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,)
+    ).scalars().all()
+    for name in names:
+        conn.exec_driver_sql(f'DROP INDEX "{name}"')
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    migrate(archive=create_archive())
@@ -0,0 +1,224 @@
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Artifact file types, most preferred first: an exported .npz loads much faster than
+# the pickle it was exported from, so it wins when both exist for a version
+ARTIFACT_SUFFIXES = (".npz", ".pkl")
+# Optional file in the model directory naming the version to serve, overriding "newest"
+PIN_FILE = "ACTIVE"
+
+
+def version_key(version: str) -> list:
+    """Natural sort key, so "1.10" sorts after "1.9" and "v2" after "v1" """
+    return [(0, int(part), "") if part.isdigit() else (1, 0, part) for part in re.split(r"(\d+)", version) if part]
+
+
+class ModelRegistry:
+    """
+    Serves one active model version and hot-swaps it when the artifacts change
+
+    Artifacts are <version>.pkl or <version>.npz files in a directory (the .npz
+    when both exist). The registry serves the newest version (natural sort
+    order), or the version named in an ACTIVE file when one exists. A
+    background thread polls the directory; a new version is loaded and warmed
+    up on that thread and only then swapped in, with a single reference
+    assignment, so requests never wait for a load. Callers take
+    registry.active once per request and use that object throughout.
+
+    The previously active version stays loaded: pinning it in ACTIVE, or deleting
+    the newer artifact, swaps back to it instantly without reloading. Artifacts
+    that fail to load or warm up are skipped until the file changes again.
+    Copy artifacts in under a temporary name and rename them into place.
+
+    Without a directory the registry serves a single fixed file and never polls.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str, str], object],
+        directory: Optional[str] = None,
+        path: Optional[str] = None,
+        version: str = "1.0",
+        poll_interval: float = 10.0,
+    ):
+        if directory is None and path is None:
+            raise ValueError("ModelRegistry needs a model directory or a model path")
+        # loader(path, version) returns a warmed-up model exposing .version
+        self.loader = loader
+        self.directory = directory
+        self.path = path
+        self.default_version = version
+        self.poll_interval = poll_interval
+
+        self.active = None
+        self.previous = None
+        self.activated_at: Optional[datetime] = None
+        self.swaps = 0
+        self.last_error: Optional[str] = None
+        self._failed: Dict[str, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[object], None]] = []
+
+    def add_listener(self, callback: Callable[[object], None]):
+        """Registers callback(model), called with the newly active model after every swap or rollback"""
+        self._listeners.append(callback)
+
+    def available(self) -> Dict[str, str]:
+        """Version -> artifact path for every artifact in the directory"""
+        if self.directory is None:
+            return {self.default_version: self.path}
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return {}
+        artifacts: Dict[str, str] = {}
+        for suffix in ARTIFACT_SUFFIXES:
+            for name in names:
+                if name.endswith(suffix) and not name.startswith("."):
+                    artifacts.setdefault(name[:-len(suffix)], os.path.join(self.directory, name))
+        return artifacts
+
+    def pinned_version(self) -> Optional[str]:
+        if self.directory is None:
+            return None
+        try:
+            with open(os.path.join(self.directory, PIN_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def desired_version(self, available: Dict[str, str]) -> Optional[str]:
+        pinned = self.pinned_version()
+        if pinned is not None:
+            if pinned in available:
+                return pinned
+            logger.warning(f"Pinned model version '{pinned}' has no artifact, serving the newest instead")
+        usable = [version for version in available if not self._is_failed(version, available[version])]
+        return max(usable, key=version_key) if usable else None
+
+    def load(self):
+        """
+        Loads the initial version synchronously
+
+        Raises:
+            RuntimeError: If no artifact exists or the chosen one cannot be loaded
+        """
+        available = self.available()
+        version = self.desired_version(available)
+        if version is None:
+            raise RuntimeError(f"No model artifacts found in {self.directory or self.path}")
+        self._swap(self.loader(available[version], version))
+
+    def poll(self) -> bool:
+        """
+        Brings the active model in line with the directory
+
+        Returns:
+            True if a different version is now being served
+        """
+        available = self.available()
+        version = self.desired_version(available)
+        if version is None or (self.active is not None and version == self.active.version):
+            return False
+        if self.previous is not None and version == self.previous.version:
+            self.rollback()
+            return True
+        if self._is_failed(version, available[version]):
+            return False
+
+        started = time.perf_counter()
+        try:
+            model = self.loader(available[version], version)
+        except Exception as e:
+            self._failed[version] = self._signature(available[version])
+            self.last_error = f"{version}: {str(e)}"
+            logger.error(f"Failed to load model version '{version}', still serving "
+                         f"'{self.active.version if self.active else None}': {str(e)}")
+            return False
+        self._swap(model)
+        logger.info(f"Model version '{version}' loaded and warmed up in {time.perf_counter() - started:.2f}s")
+        return True
+
+    def rollback(self):
+        """Swaps the previous version back in without reloading it"""
+        with self._lock:
+            if self.previous is None:
+                raise RuntimeError("No previous model version to roll back to")
+            self.active, self.previous = self.previous, self.active
+            self.activated_at = datetime.utcnow()
+            self.swaps += 1
+            active = self.active
+        logger.warning(f"Rolled back to model version '{self.active.version}' (from '{self.previous.version}')")
+        self._notify(active)
+
+    def start(self):
+        """Starts polling the directory on a daemon thread"""
+        if self.directory is None or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="model-registry", daemon=True)
+        self._thread.start()
+        logger.info(f"Watching {self.directory} for model versions every {self.poll_interval}s")
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "active_version": self.active.version if self.active else None,
+            "previous_version": self.previous.version if self.previous else None,
+            "activated_at": self.activated_at.isoformat() if self.activated_at else None,
+            "available_versions": sorted(self.available(), key=version_key),
+            "pinned_version": self.pinned_version(),
+            "swaps": self.swaps,
+            "last_error": self.last_error,
+            "watching": self._thread is not None,
+        }
+
+    def _swap(self, model):
+        with self._lock:
+            self.previous, self.active = self.active, model
+            self.activated_at = datetime.utcnow()
+            if self.previous is not None:
+                self.swaps += 1
+        self._failed.pop(model.version, None)
+        self._notify(model)
+
+    def _notify(self, model):
+        for callback in self._listeners:
+            try:
+                callback(model)
+            except Exception as e:
+                logger.error(f"Model swap listener failed: {str(e)}")
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"Model registry poll failed: {str(e)}")
+
+    def _is_failed(self, version: str, path: str) -> bool:
+        return self._failed.get(version) == self._signature(path)
+
+    @staticmethod
+    def _signature(path: str) -> Tuple[float, int]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return (0.0, 0)
+        return (stat.st_mtime, stat.st_size)
+
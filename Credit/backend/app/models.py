@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean
+from sqlalchemy import BigInteger, Column, Date, Integer, String, Float, DateTime, ForeignKey, Boolean, Index, Text, UniqueConstraint
 from sqlalchemy.orm import relationship
 from .database import Base
 from datetime import datetime
@@ -16,6 +16,13 @@ class User(Base):
 
 class Prediction(Base):
     __tablename__ = "predictions"
+    __table_args__ = (
+        # Keyset pagination of a user's history, one index per sortable column
+        Index("ix_predictions_user_timestamp_id", "user_id", "timestamp", "id"),
+        Index("ix_predictions_user_credit_score_id", "user_id", "credit_score", "id"),
+        # Archived rows keep their ids (see archive.py), which SQLite would otherwise reuse
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     client_name = Column(String, index=True)
@@ -35,4 +42,76 @@ class Prediction(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     
     # Relationship to user
-    user = relationship("User", back_populates="predictions")
\ No newline at end of file
+    user = relationship("User", back_populates="predictions")
+
+class PredictionRollup(Base):
+    """
+    Daily prediction totals per user, score band, risk level and decision
+    
+    Maintained in the same transaction as every prediction insert and delete
+    (see analytics.py), so dashboard queries read O(buckets) rows instead of
+    scanning predictions. Rebuild with `python -m app.analytics rebuild`.
+    """
+    __tablename__ = "prediction_rollups"
+    __table_args__ = (
+        UniqueConstraint("user_id", "day", "score_band", "risk_level", "decision", name="uq_prediction_rollups_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    # 0 for predictions made without a user; a NULL would defeat the unique bucket key
+    user_id = Column(Integer, nullable=False)
+    day = Column(Date, nullable=False)
+    # Lower bound of the 50-point credit score band
+    score_band = Column(Integer, nullable=False)
+    risk_level = Column(String, nullable=False)
+    decision = Column(String, nullable=False)
+
+    predictions = Column(Integer, nullable=False, default=0)
+    score_sum = Column(BigInteger, nullable=False, default=0)
+    loan_amount_sum = Column(Float, nullable=False, default=0.0)
+    loan_amount_count = Column(Integer, nullable=False, default=0)
+
+class IdempotencyKey(Base):
+    """
+    Responses stored under client Idempotency-Key headers, shared by every worker
+
+    A row without a response is a claim: the request is being computed. See
+    idempotency.SqlIdempotencyStore.
+    """
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(300), primary_key=True)
+    # Hash of the request payload, so a key cannot be replayed for a different request
+    fingerprint = Column(String(64), nullable=False)
+    response = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class OutboxEmail(Base):
+    """
+    Email queued for delivery by outbox.EmailOutbox
+
+    Inserted in the transaction of the change that triggers it (e.g. the new
+    user), so a committed change always gets its email and a rolled back one
+    never does. status is pending, sending (claimed by a worker until
+    locked_until), sent or dead (gave up; see last_error).
+    """
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        # The worker's poll: due pending messages, oldest first
+        Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    recipient = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(String(16), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # Claim token and lease of the worker sending it; an expired lease is claimed again
+    claimed_by = Column(String(64), nullable=True)
+    locked_until = Column(DateTime, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
@@ -0,0 +1,126 @@
+"""
+Incremental NDJSON parsing of streamed request bodies
+
+Lines are split out of the body chunks as they arrive and handed on in batches,
+so only one partial line and one batch are ever held in memory. A line that
+is not valid JSON, or is longer than the configured limit, becomes an error
+entry in its batch instead of failing the whole body. UploadStreamingResponse
+streams results back while the body is still being uploaded.
+"""
+import asyncio
+import json
+from typing import Any, AsyncIterator, Callable, List, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+
+# (parsed value, None) for a decoded line, (None, message) for one that could not be decoded
+Line = Tuple[Any, Optional[str]]
+
+
+def parse_line(line: bytes) -> Line:
+    try:
+        return json.loads(line), None
+    except ValueError as e:
+        # JSONDecodeError and UnicodeDecodeError
+        return None, f"Invalid JSON: {e}"
+
+
+class LineSplitter:
+    """
+    Splits a byte stream into lines across arbitrary chunk boundaries
+
+    Blank lines are dropped and a trailing "\\r" is tolerated by the JSON parser.
+    Once the pending partial line grows past max_line_bytes it is discarded up
+    to its newline and reported as a single oversized line.
+    """
+
+    def __init__(self, max_line_bytes: int):
+        self.max_line_bytes = max_line_bytes
+        self._pending = b""
+        self._oversized = False
+
+    def feed(self, chunk: bytes) -> List[Line]:
+        if self._oversized:
+            newline = chunk.find(b"\n")
+            if newline < 0:
+                return []
+            self._oversized = False
+            lines = [self._too_long()]
+            chunk = chunk[newline + 1:]
+        else:
+            lines = []
+
+        if self._pending:
+            chunk = self._pending + chunk
+        pieces = chunk.split(b"\n")
+        self._pending = pieces.pop()
+        for piece in pieces:
+            if len(piece) > self.max_line_bytes:
+                lines.append(self._too_long())
+            elif piece.strip():
+                lines.append(parse_line(piece))
+
+        if len(self._pending) > self.max_line_bytes:
+            self._pending = b""
+            self._oversized = True
+        return lines
+
+    def close(self) -> List[Line]:
+        """Lines left once the body ended: the last one may lack its newline"""
+        if self._oversized:
+            self._oversized = False
+            return [self._too_long()]
+        pending, self._pending = self._pending, b""
+        return [parse_line(pending)] if pending.strip() else []
+
+    def _too_long(self) -> Line:
+        return None, f"Line exceeds {self.max_line_bytes} bytes"
+
+
+async def iter_batches(chunks: AsyncIterator[bytes], batch_size: int, max_line_bytes: int) -> AsyncIterator[List[Line]]:
+    """
+    Yields the lines of an NDJSON byte stream in batches of up to batch_size
+
+    Args:
+        chunks: Body chunks, e.g. Request.stream()
+        batch_size: Lines per yielded batch; the last batch may be shorter
+        max_line_bytes: Longest line that is parsed rather than reported as an error
+    """
+    splitter = LineSplitter(max_line_bytes)
+    batch: List[Line] = []
+    async for chunk in chunks:
+        batch.extend(splitter.feed(chunk))
+        while len(batch) >= batch_size:
+            yield batch[:batch_size]
+            batch = batch[batch_size:]
+    batch.extend(splitter.close())
+    while batch:
+        yield batch[:batch_size]
+        batch = batch[batch_size:]
+
+
+class UploadStreamingResponse(StreamingResponse):
+    """
+    NDJSON response streamed while the request body is still being read
+
+    render receives the request body chunks and returns the response body. Starlette
+    watches for client disconnects by calling receive() alongside the stream, which
+    would swallow body messages the response has yet to read, so that watch starts
+    only once the body has been read in full. A disconnect during the upload
+    surfaces from Request.stream() as ClientDisconnect instead.
+    """
+
+    def __init__(self, request: Request, render: Callable[[AsyncIterator[bytes]], AsyncIterator[bytes]], **kwargs):
+        self._body_read = asyncio.Event()
+        kwargs.setdefault("media_type", "application/x-ndjson")
+        super().__init__(render(self._read_body(request)), **kwargs)
+
+    async def _read_body(self, request: Request) -> AsyncIterator[bytes]:
+        async for chunk in request.stream():
+            yield chunk
+        self._body_read.set()
+
+    async def listen_for_disconnect(self, receive):
+        await self._body_read.wait()
+        await super().listen_for_disconnect(receive)
@@ -0,0 +1,354 @@
+"""
+Transactional email outbox
+
+Requests never talk to the SMTP server. A request that needs an email sent
+adds an email_outbox row in its own transaction (enqueue_email) and returns;
+EmailOutbox, a background worker in every API process, delivers due rows in
+batches over one pooled, authenticated SMTP connection (email_utils.SmtpMailer).
+
+Rows are claimed with a conditional UPDATE and a lease, so several workers can
+share the table without sending a message twice, and a worker that dies
+mid-batch only delays its claimed rows until the lease expires. Failed sends
+are retried with exponential backoff and jitter; a permanent (5xx) refusal or
+OUTBOX_MAX_ATTEMPTS failures move the row to the dead letter state, where it
+stays for inspection until requeued:
+    python -m app.outbox stats
+    python -m app.outbox requeue-dead [--id 12 --id 13]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import smtplib
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from . import metrics, models
+from .email_utils import MESSAGE_ERRORS, SmtpMailer, is_permanent_failure
+
+logger = logging.getLogger(__name__)
+
+# Queue registration emails and run the delivery worker
+EMAIL_OUTBOX = os.getenv("EMAIL_OUTBOX", "false").lower() in ("1", "true", "yes")
+# Messages claimed and sent per round trip to the queue table
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+# How often an idle worker polls for messages enqueued by other processes (its own wake it up)
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "2"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+# Retry delay: OUTBOX_BACKOFF_SECONDS * 2^(attempts - 1), capped, with jitter
+OUTBOX_BACKOFF_SECONDS = float(os.getenv("OUTBOX_BACKOFF_SECONDS", "30"))
+OUTBOX_MAX_BACKOFF_SECONDS = float(os.getenv("OUTBOX_MAX_BACKOFF_SECONDS", "3600"))
+# How long a claimed batch is reserved for its worker; must exceed a batch's worst-case send time
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "600"))
+# Sent messages are deleted after this long
+OUTBOX_RETENTION_DAYS = float(os.getenv("OUTBOX_RETENTION_DAYS", "7"))
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+DEAD = "dead"
+
+
+def enqueue_email(db: Session, recipient: str, subject: str, body: str) -> models.OutboxEmail:
+    """Adds a message to the outbox in the caller's transaction; the caller commits"""
+    now = datetime.utcnow()
+    message = models.OutboxEmail(
+        recipient=recipient, subject=subject, body=body, status=PENDING, attempts=0,
+        created_at=now, next_attempt_at=now,
+    )
+    db.add(message)
+    return message
+
+
+def backoff_seconds(attempts: int, base: float = OUTBOX_BACKOFF_SECONDS, maximum: float = OUTBOX_MAX_BACKOFF_SECONDS) -> float:
+    """Delay before the next try after attempts failures, jittered so retries spread out"""
+    delay = min(maximum, base * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def requeue_dead(db: Session, ids: Optional[List[int]] = None) -> int:
+    """Moves dead letters (all, or the given ids) back to pending with a fresh attempt budget"""
+    T = models.OutboxEmail
+    query = update(T).where(T.status == DEAD)
+    if ids:
+        query = query.where(T.id.in_(ids))
+    count = db.execute(query.values(
+        status=PENDING, attempts=0, next_attempt_at=datetime.utcnow(), claimed_by=None, locked_until=None,
+    )).rowcount
+    db.commit()
+    return count
+
+
+def queue_summary(db: Session) -> dict:
+    """Undelivered messages by status and the age of the oldest one still pending"""
+    T = models.OutboxEmail
+    rows = db.execute(
+        select(T.status, func.count(), func.min(T.created_at))
+        .where(T.status.in_([PENDING, SENDING, DEAD]))
+        .group_by(T.status)
+    ).all()
+    counts = {status: 0 for status in (PENDING, SENDING, DEAD)}
+    oldest = None
+    for status, count, created_at in rows:
+        counts[status] = count
+        if status != DEAD and created_at is not None:
+            oldest = created_at if oldest is None else min(oldest, created_at)
+    lag = (datetime.utcnow() - oldest).total_seconds() if oldest is not None else 0.0
+    return {**counts, "oldest_pending_seconds": round(max(lag, 0.0), 3)}
+
+
+class EmailOutbox:
+    """
+    Background delivery of the email_outbox table
+
+    All database and SMTP work runs on one dedicated thread, which owns the
+    pooled SMTP connection. The worker polls every poll_interval and is woken
+    right away by notify() after a local enqueue commits.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        mailer_factory: Callable[[], SmtpMailer] = SmtpMailer,
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        poll_interval: float = OUTBOX_POLL_SECONDS,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+        backoff: float = OUTBOX_BACKOFF_SECONDS,
+        max_backoff: float = OUTBOX_MAX_BACKOFF_SECONDS,
+        lease: float = OUTBOX_LEASE_SECONDS,
+        retention: timedelta = timedelta(days=OUTBOX_RETENTION_DAYS),
+        summary_interval: float = 5.0,
+    ):
+        self.session_factory = session_factory
+        self.mailer_factory = mailer_factory
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lease = timedelta(seconds=lease)
+        self.retention = retention
+        self.summary_interval = summary_interval
+        self.worker_id = uuid.uuid4().hex[:16]
+
+        self._mailer: Optional[SmtpMailer] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._closing = False
+        self._claims = 0
+        self._last_summary = 0.0
+        self._last_purge = 0.0
+
+        self.sent = 0
+        self.retried = 0
+        self.dead = 0
+        self.batches = 0
+        self.send_seconds = 0.0
+        self.last_batch_rate = 0.0
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+        self.queue: dict = {}
+
+    @property
+    def mailer(self) -> SmtpMailer:
+        if self._mailer is None:
+            self._mailer = self.mailer_factory()
+        return self._mailer
+
+    def _claim(self, db: Session, now: datetime) -> List[models.OutboxEmail]:
+        T = models.OutboxEmail
+        due = or_(
+            and_(T.status == PENDING, T.next_attempt_at <= now),
+            # Left behind by a worker that stopped mid-batch
+            and_(T.status == SENDING, T.locked_until <= now),
+        )
+        ids = db.execute(select(T.id).where(due).order_by(T.next_attempt_at, T.id).limit(self.batch_size)).scalars().all()
+        if not ids:
+            return []
+        self._claims += 1
+        token = f"{self.worker_id}:{self._claims}"
+        # Re-checking due in the UPDATE makes the claim atomic: rows another worker claimed first are skipped
+        db.execute(
+            update(T).where(T.id.in_(ids), due).values(status=SENDING, claimed_by=token, locked_until=now + self.lease),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+        return db.execute(select(T).where(T.claimed_by == token, T.status == SENDING).order_by(T.id)).scalars().all()
+
+    def process_batch(self) -> int:
+        """
+        Claims and sends one batch of due messages, recording each outcome
+
+        Returns:
+            The number of messages claimed
+        """
+        with self.session_factory() as db:
+            messages = self._claim(db, datetime.utcnow())
+            if not messages:
+                return 0
+
+            started = time.perf_counter()
+            for position, message in enumerate(messages):
+                try:
+                    self.mailer.send(message.recipient, message.subject, message.body)
+                except (smtplib.SMTPException, OSError) as e:
+                    retry_at = self._failed(message, e)
+                    if not isinstance(e, MESSAGE_ERRORS):
+                        # The server is unreachable: the rest of the batch waits too, without spending an attempt
+                        for waiting in messages[position + 1:]:
+                            waiting.status, waiting.next_attempt_at = PENDING, retry_at
+                            waiting.claimed_by = waiting.locked_until = None
+                        break
+                else:
+                    self._sent(message)
+            elapsed = time.perf_counter() - started
+            db.commit()
+
+        self.batches += 1
+        self.send_seconds += elapsed
+        self.last_batch_rate = len(messages) / elapsed if elapsed > 0 else 0.0
+        return len(messages)
+
+    def _sent(self, message: models.OutboxEmail):
+        now = datetime.utcnow()
+        message.status, message.sent_at, message.attempts = SENT, now, message.attempts + 1
+        message.claimed_by = message.locked_until = None
+        lag = (now - message.created_at).total_seconds()
+        self.sent += 1
+        self.last_lag_seconds = lag
+        self.max_lag_seconds = max(self.max_lag_seconds, lag)
+        metrics.email_deliveries.inc(SENT)
+        metrics.email_delivery_lag.observe(lag)
+
+    def _failed(self, message: models.OutboxEmail, error: Exception) -> datetime:
+        message.attempts += 1
+        message.last_error = f"{type(error).__name__}: {error}"[:2000]
+        message.claimed_by = message.locked_until = None
+        retry_at = datetime.utcnow() + timedelta(seconds=backoff_seconds(message.attempts, self.backoff, self.max_backoff))
+        if is_permanent_failure(error) or message.attempts >= self.max_attempts:
+            message.status = DEAD
+            self.dead += 1
+            metrics.email_deliveries.inc(DEAD)
+            logger.error(f"Email {message.id} to {message.recipient} moved to dead letters: {message.last_error}")
+        else:
+            message.status, message.next_attempt_at = PENDING, retry_at
+            self.retried += 1
+            metrics.email_deliveries.inc("retried")
+            logger.warning(f"Email {message.id} failed (attempt {message.attempts}), retrying at {retry_at}: {message.last_error}")
+        return retry_at
+
+    def refresh_summary(self, force: bool = False):
+        """Re-reads the queue depth and lag, and purges old sent rows, at most every summary_interval"""
+        if not force and time.monotonic() - self._last_summary < self.summary_interval:
+            return
+        self._last_summary = time.monotonic()
+        with self.session_factory() as db:
+            if time.monotonic() - self._last_purge > 3600:
+                self._last_purge = time.monotonic()
+                T = models.OutboxEmail
+                db.execute(delete(T).where(T.status == SENT, T.sent_at < datetime.utcnow() - self.retention))
+                db.commit()
+            self.queue = queue_summary(db)
+
+    def _cycle(self) -> int:
+        try:
+            processed = self.process_batch()
+        except Exception as e:
+            logger.error(f"Email outbox batch failed: {str(e)}")
+            processed = 0
+        try:
+            # After a batch the figures changed; when idle they are re-read every summary_interval
+            self.refresh_summary(force=processed > 0)
+        except Exception as e:
+            logger.error(f"Email outbox summary failed: {str(e)}")
+        return processed
+
+    async def start(self):
+        """Starts the delivery task on the running event loop"""
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="outbox")
+        self._wake = asyncio.Event()
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Email outbox started (batch_size={self.batch_size}, poll={self.poll_interval}s)")
+
+    async def stop(self):
+        """Stops after the batch in progress; undelivered messages stay queued in the table"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wake.set()
+        await self._task
+        self._task = None
+        if self._mailer is not None:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._mailer.close)
+        self._executor.shutdown(wait=True)
+        logger.info(f"Email outbox stopped after sending {self.sent} emails")
+
+    def notify(self):
+        """Wakes the worker, e.g. right after committing an enqueued message"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while not self._closing:
+            self._wake.clear()
+            processed = await loop.run_in_executor(self._executor, self._cycle)
+            if processed >= self.batch_size:
+                # More may be due; go again without waiting
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        """Delivery counters, send throughput and queue lag"""
+        mailer = self._mailer
+        return {
+            "sent": self.sent,
+            "retried": self.retried,
+            "dead": self.dead,
+            "batches": self.batches,
+            "send_rate_per_second": round(self.sent / self.send_seconds, 3) if self.send_seconds else 0.0,
+            "last_batch_rate_per_second": round(self.last_batch_rate, 3),
+            "last_lag_seconds": round(self.last_lag_seconds, 3),
+            "max_lag_seconds": round(self.max_lag_seconds, 3),
+            "smtp_connections": mailer.connections if mailer is not None else 0,
+            "queue": self.queue,
+        }
+
+
+def create_outbox(session_factory) -> Optional[EmailOutbox]:
+    """The delivery worker when EMAIL_OUTBOX is enabled, otherwise None"""
+    if not EMAIL_OUTBOX:
+        return None
+    return EmailOutbox(session_factory)
+
+
+def main(argv: Optional[List[str]] = None):
+    from .database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["stats", "requeue-dead"])
+    parser.add_argument("--id", type=int, action="append", help="requeue-dead: only these messages")
+    args = parser.parse_args(argv)
+
+    with SessionLocal() as db:
+        if args.command == "requeue-dead":
+            logger.info(f"requeued {requeue_dead(db, args.id)} dead letters")
+        else:
+            logger.info(queue_summary(db))
+
+
+if __name__ == "__main__":
+    main()
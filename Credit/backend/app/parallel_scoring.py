@@ -0,0 +1,131 @@
+"""
+Multi-process portfolio scoring
+
+Scoring a chunk is CPU-bound NumPy and Python work that holds the GIL for most
+of its time, so large portfolios are spread over a process pool instead of
+threads. Workers get the model, encoder tables and compiled scorer once, when
+they start: with the fork start method they inherit the parent's already-loaded
+app.scoring module copy-on-write, otherwise the pool initializer imports it once
+per worker. Tasks then only carry the rows to score.
+
+Results are yielded in input order, and at most max_in_flight chunks are queued
+or being scored at a time so memory stays bounded for streamed inputs.
+"""
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+import pandas as pd
+
+from .bulk_score import DEFAULT_CHUNK_SIZE, resolve_columns, score_chunk
+
+# Default worker count for parallel scoring: one per core
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", str(os.cpu_count() or 1)))
+
+
+def _init_worker():
+    # A no-op after fork (the module is inherited); loads the model once under spawn
+    from . import scoring  # noqa: F401
+
+
+def _start_method() -> str:
+    return "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+class ParallelScorer:
+    """
+    Scores chunks of applications on a pool of worker processes
+
+    Use as a context manager so the pool is shut down afterwards. With one
+    worker everything runs in the calling process.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_in_flight: Optional[int] = None,
+    ):
+        self.workers = max(1, workers if workers is not None else SCORING_WORKERS)
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        self.chunk_size = chunk_size
+        self.max_in_flight = max_in_flight or 2 * self.workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> "ParallelScorer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start(self) -> "ParallelScorer":
+        """Starts the worker processes (nothing to start with a single worker)"""
+        if self.workers > 1 and self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(_start_method()),
+                initializer=_init_worker,
+            )
+        return self
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def imap(self, func: Callable, tasks: Iterable[tuple]) -> Iterator:
+        """Yields func(*task) for each task, in task order"""
+        if self._executor is None:
+            for task in tasks:
+                yield func(*task)
+            return
+
+        pending = deque()
+        for task in tasks:
+            pending.append(self._executor.submit(func, *task))
+            if len(pending) >= self.max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def score_chunks(self, chunks: Iterable[pd.DataFrame], source: Dict[str, str], first_row: int = 0) -> Iterator[pd.DataFrame]:
+        """Scores a stream of input frames, yielding one result frame per input frame in order"""
+        def tasks():
+            row = first_row
+            for frame in chunks:
+                yield frame, source, row
+                row += len(frame)
+
+        return self.imap(score_chunk, tasks())
+
+    def score_frame(self, frame: pd.DataFrame, id_column: Optional[str] = "client_name") -> pd.DataFrame:
+        """
+        Scores an in-memory table of applications
+
+        Args:
+            frame: One row per application, columns named like the API fields or the model features
+            id_column: Column copied to the output as client_name, if present
+
+        Returns:
+            One row per input row, in input order, with the bulk_score output columns
+        """
+        source = resolve_columns(list(frame.columns), id_column)
+        chunks = (frame.iloc[start:start + self.chunk_size] for start in range(0, len(frame), self.chunk_size))
+        results = list(self.score_chunks(chunks, source))
+        if not results:
+            return score_chunk(frame.iloc[:0], source, 0)
+        return pd.concat(results, ignore_index=True)
+
+
+def score_frame(
+    frame: pd.DataFrame,
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    id_column: Optional[str] = "client_name",
+) -> pd.DataFrame:
+    """Scores an in-memory table on a temporary process pool"""
+    with ParallelScorer(workers, chunk_size) as scorer:
+        return scorer.score_frame(frame, id_column)
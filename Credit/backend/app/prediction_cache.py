@@ -0,0 +1,74 @@
+import hashlib
+import os
+import threading
+from typing import Optional, Tuple
+
+from .cache import TTLCache
+
+# Cached /predict results: entry count (0 disables the cache) and lifetime. An entry is a
+# 16-byte digest and a float, so the default size stays around a few megabytes.
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "50000"))
+PREDICTION_CACHE_TTL_SECONDS = float(os.getenv("PREDICTION_CACHE_TTL_SECONDS", "600"))
+
+
+def feature_digest(features: dict) -> bytes:
+    """
+    Canonical hash of a preprocessed application
+
+    Computed from the model features only (the output of preprocess_record), in
+    sorted order, so fields the model never sees and the order fields arrive in
+    do not change the key.
+    """
+    canonical = repr(sorted(features.items())).encode()
+    return hashlib.blake2b(canonical, digest_size=16).digest()
+
+
+class PredictionCache:
+    """
+    Default probabilities of recently scored applications, per model version
+
+    Keys pair the model version with feature_digest(), so entries from one
+    version are never served for another. When the registry swaps versions the
+    entries of every other version are dropped at once (invalidate_others)
+    rather than waiting for LRU eviction or expiry. Only the model output is
+    cached: callers still derive the score, decision and key factors, and still
+    record every prediction. Hits skip category encoding, so the unseen-category
+    counters count an application once per cache entry, not once per request.
+    """
+
+    def __init__(self, max_size: int = 50000, ttl: float = 600.0):
+        self.enabled = max_size > 0
+        self._cache = TTLCache(max_size=max(max_size, 1), default_ttl=ttl)
+        self._lock = threading.Lock()
+        self.invalidated = 0
+
+    def key(self, version: str, features: dict) -> Tuple[str, bytes]:
+        return (version, feature_digest(features))
+
+    def get(self, key: Tuple[str, bytes]) -> Optional[float]:
+        if not self.enabled:
+            return None
+        return self._cache.get(key)
+
+    def set(self, key: Tuple[str, bytes], prob_default: float):
+        if self.enabled:
+            self._cache.set(key, prob_default)
+
+    def invalidate_version(self, version: str) -> int:
+        """Drops the entries of one model version"""
+        return self._invalidate(lambda key, _: key[0] == version)
+
+    def invalidate_others(self, version: str) -> int:
+        """Drops the entries of every version but this one"""
+        return self._invalidate(lambda key, _: key[0] != version)
+
+    def _invalidate(self, predicate) -> int:
+        removed = self._cache.delete_where(predicate)
+        with self._lock:
+            self.invalidated += removed
+        return removed
+
+    def stats(self) -> dict:
+        if not self.enabled:
+            return {"enabled": False}
+        return {"enabled": True, **self._cache.stats(), "invalidated": self.invalidated}
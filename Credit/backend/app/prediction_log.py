@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import time
+from typing import Callable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from . import crud
+from .concurrency import run_db
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class PredictionLogFull(Exception):
+    """Raised when the write-behind queue stays full for longer than the enqueue timeout"""
+
+
+class PredictionLogClosed(RuntimeError):
+    """Raised when a row is queued before start() or once stop() has begun"""
+
+
+class PredictionWriter:
+    """
+    Write-behind log for scored predictions
+
+    Requests enqueue prediction rows into a bounded in-memory queue and return
+    immediately; a background task drains the queue and writes the rows with one
+    multi-row INSERT per batch. A batch is flushed once it reaches batch_size rows
+    or its oldest row is max_age seconds old. When the database falls behind and
+    the queue fills up, enqueue waits up to enqueue_timeout and then raises
+    PredictionLogFull so callers can shed load.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        is_async: bool = False,
+        batch_size: int = 500,
+        max_age: float = 0.25,
+        max_queue: int = 10000,
+        enqueue_timeout: float = 1.0,
+    ):
+        self.session_factory = session_factory
+        # session_factory produces AsyncSessions when is_async is set
+        self.is_async = is_async
+        self.batch_size = batch_size
+        self.max_age = max_age
+        self.max_queue = max_queue
+        self.enqueue_timeout = enqueue_timeout
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        self.enqueued = 0
+        self.flushed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.batches = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+    async def start(self):
+        """Creates the queue and starts the flush task on the running event loop"""
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Prediction write-behind started (batch_size={self.batch_size}, "
+            f"max_age={self.max_age}s, max_queue={self.max_queue})"
+        )
+
+    async def stop(self):
+        """Stops accepting rows and flushes everything still queued"""
+        if self._task is None:
+            return
+        self._closing = True
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        logger.info(f"Prediction write-behind stopped after flushing {self.flushed} rows")
+
+    async def enqueue(self, row: dict):
+        """
+        Queues one prediction row for the next batch
+
+        Raises:
+            PredictionLogFull: If no slot frees up within enqueue_timeout
+            PredictionLogClosed: If the writer is not running, e.g. during shutdown
+        """
+        if self._queue is None or self._closing:
+            raise PredictionLogClosed("Prediction writer is not running")
+        try:
+            await asyncio.wait_for(self._queue.put(row), self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise PredictionLogFull(f"Prediction log queue is full ({self.max_queue} rows)")
+        self.enqueued += 1
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.max_age
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+        # Drain whatever was queued before the stop marker
+        batch = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                batch.append(item)
+            if len(batch) >= self.batch_size:
+                await self._flush(batch)
+                batch = []
+        if batch:
+            await self._flush(batch)
+
+    def _write(self, rows: List[dict]) -> int:
+        db = self.session_factory()
+        try:
+            return crud.insert_prediction_rows(db, rows)
+        finally:
+            db.close()
+
+    async def _write_async(self, rows: List[dict]) -> int:
+        async with self.session_factory() as db:
+            return await db.run_sync(crud.insert_prediction_rows, rows)
+
+    async def _flush(self, rows: List[dict]):
+        started = time.perf_counter()
+        try:
+            if self.is_async:
+                await self._write_async(rows)
+            else:
+                await run_db(self._write, rows)
+            self.flushed += len(rows)
+        except Exception as e:
+            self.failed += len(rows)
+            logger.error(f"Failed to flush {len(rows)} predictions: {str(e)}")
+        elapsed = time.perf_counter() - started
+
+        self.batches += 1
+        self.last_flush_seconds = elapsed
+        self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+        self.total_flush_seconds += elapsed
+
+    def stats(self) -> dict:
+        """Queue depth, throughput counters and flush latency"""
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_capacity": self.max_queue,
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "last_flush_ms": round(self.last_flush_seconds * 1000, 3),
+            "max_flush_ms": round(self.max_flush_seconds * 1000, 3),
+            "avg_flush_ms": round(self.total_flush_seconds * 1000 / self.batches, 3) if self.batches else 0.0,
+        }
@@ -1,18 +1,21 @@
 from pydantic import BaseModel, EmailStr, field_validator, ConfigDict
-from typing import Optional
-from datetime import datetime
+from typing import Dict, Optional, List
+from datetime import date, datetime
 from enum import Enum
 
-# Enums for consistent values
+# Enums for consistent values: the labels scoring.determine_risk_level and
+# scoring.determine_decision produce, as returned by the API and stored with predictions
 class RiskLevel(str, Enum):
-    LOW = "low"
-    MEDIUM = "medium"
-    HIGH = "high"
+    VERY_LOW = "Very Low"
+    LOW = "Low"
+    MEDIUM = "Medium"
+    HIGH = "High"
+    VERY_HIGH = "Very High"
 
 class Decision(str, Enum):
-    APPROVED = "approved"
-    REJECTED = "rejected"
-    PENDING = "pending"
+    APPROVED = "Approved"
+    APPROVED_WITH_CONDITIONS = "Approved with conditions"
+    DECLINED = "Declined"
 
 class EmploymentStatus(str, Enum):
     EMPLOYED = "employed"
@@ -78,6 +81,37 @@ class Prediction(PredictionBase):
     user_id: int
     model_config = ConfigDict(from_attributes=True)
 
+class PredictionPage(BaseModel):
+    items: List[Prediction]
+    next_cursor: Optional[str] = None
+
+# Portfolio analytics schemas
+class ScoreBand(BaseModel):
+    band_start: int
+    band_end: int
+    predictions: int
+
+class PortfolioPeriod(BaseModel):
+    period: date
+    predictions: int
+    approval_rate: float
+    average_score: Optional[float] = None
+    average_loan_amount: Optional[float] = None
+    risk_levels: Dict[str, int]
+
+class PortfolioAnalytics(BaseModel):
+    granularity: str
+    start: Optional[date] = None
+    end: Optional[date] = None
+    predictions: int
+    approval_rate: float
+    average_score: Optional[float] = None
+    average_loan_amount: Optional[float] = None
+    risk_levels: Dict[str, int]
+    decisions: Dict[str, int]
+    score_distribution: List[ScoreBand]
+    periods: List[PortfolioPeriod]
+
 # Response schemas
 class StandardResponse(BaseModel):
     success: bool
@@ -0,0 +1,427 @@
+import logging
+import os
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .compiled_scorer import CompiledScorer
+from .encoding import CategoryEncoder, UNSEEN_FIRST_CLASS
+from .explain import LinearExplainer
+from .model_export import EXPORT_SUFFIX, load_exported
+from .model_registry import ModelRegistry
+
+# pandas (and joblib, which pulls in sklearn when unpickling) are imported on first
+# use: serving an exported .npz model in compiled mode never needs them
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Model artifacts: a directory of versioned <version>.pkl or <version>.npz files that is
+# watched for new versions, or (when MODEL_DIR is unset) a single artifact, by default the
+# pickle produced by the training notebook. Point these at .npz files exported with
+# `python -m app.model_export` for fast worker start-up.
+MODEL_DIR = os.getenv("MODEL_DIR")
+MODEL_PATH = os.getenv("MODEL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "credit_scoring_model.pkl"))
+MODEL_VERSION = os.getenv("MODEL_VERSION", "1.0")
+MODEL_POLL_SECONDS = float(os.getenv("MODEL_POLL_SECONDS", "10"))
+
+# Policy for unseen categories: "first_class" (code 0), "missing" or "reject"
+UNSEEN_CATEGORY_POLICY = os.getenv("UNSEEN_CATEGORY_POLICY", UNSEEN_FIRST_CLASS).lower()
+
+# Scorer selection: "compiled" scores with flat NumPy arrays, "pipeline" calls the sklearn model
+# (pickled artifacts only; exported artifacts always use the compiled scorer)
+SCORER_MODE = os.getenv("SCORER_MODE", "compiled").lower()
+if SCORER_MODE not in ("compiled", "pipeline"):
+    raise RuntimeError(f"Unknown SCORER_MODE '{SCORER_MODE}', expected 'compiled' or 'pipeline'")
+
+# Key factors: "model" lists the features contributing most to the model's logit (see
+# explain.py), "rules" the fixed income/tenure/late-payment/debt-ratio thresholds
+EXPLANATION_MODE = os.getenv("EXPLANATION_MODE", "model").lower()
+if EXPLANATION_MODE not in ("model", "rules"):
+    raise RuntimeError(f"Unknown EXPLANATION_MODE '{EXPLANATION_MODE}', expected 'model' or 'rules'")
+
+# Feature mapping
+FEATURE_MAPPING = {
+    "age": "age",
+    "income": "income",
+    "loanAmount": "loan_amount",
+    "interestRate": "interest_rate",
+    "turnover": "turnover",
+    "customerTenure": "customer_tenure",
+    "avgDaysLateCurrent": "avg_days_late_current",
+    "numLatePaymentsCurrent": "num_late_payments_current",
+    "unpaidAmount": "unpaid_amount",
+    "industrySector": "industry_sector",
+    "creditType": "credit_type",
+    "hasGuarantee": "has_guarantee",
+    "guaranteeType": "guarantee_type",
+    "repaymentFrequency": "repayment_frequency"
+}
+
+GUARANTEE_TRUE_VALUES = ['yes', 'true', '1']
+
+
+class ScoringModel:
+    """
+    One loaded model version with everything needed to score against it
+
+    Holds the sklearn pipeline (None for exported artifacts), the category classes
+    and column lists, the category lookup tables and (in compiled mode) the
+    compiled scorer. Instances are never mutated after construction, so a request
+    that took one keeps scoring against the same version even if the registry
+    swaps in another meanwhile.
+    """
+
+    def __init__(self, model_data: dict, version: str, path: Optional[str] = None):
+        self.version = version
+        self.path = path
+        self.model = model_data.get('model')
+        self.num_cols = model_data['num_cols']
+        self.cat_cols = model_data['cat_cols']
+        if 'classes' in model_data:
+            self.classes = model_data['classes']
+        else:
+            self.classes = {
+                col: [str(value) for value in model_data['label_encoders'][col].classes_] for col in self.cat_cols
+            }
+        self.category_encoder = CategoryEncoder.from_classes(self.classes, UNSEEN_CATEGORY_POLICY)
+
+        self.compiled_scorer: Optional[CompiledScorer] = model_data.get('compiled_scorer')
+        if self.model is None:
+            if self.compiled_scorer is None:
+                raise ValueError(f"Model {version} has neither an sklearn pipeline nor a compiled scorer")
+            if SCORER_MODE == "pipeline":
+                logger.warning(f"Model {version} is an exported artifact, scoring it with the compiled scorer")
+        elif SCORER_MODE == "compiled" and self.compiled_scorer is None:
+            try:
+                self.compiled_scorer = CompiledScorer.from_model_data(model_data)
+            except ValueError as e:
+                logger.warning(f"Cannot compile model {version}, falling back to sklearn pipeline: {str(e)}")
+
+        self.explainer: Optional[LinearExplainer] = None
+        if EXPLANATION_MODE == "model":
+            self.explainer = self._build_explainer(model_data)
+
+    def _build_explainer(self, model_data: dict) -> Optional[LinearExplainer]:
+        scorer = self.compiled_scorer
+        if scorer is None and SCORER_MODE == "pipeline":
+            # Scoring stays on the pipeline; the flattened weights are only read for explanations
+            try:
+                scorer = CompiledScorer.from_model_data(model_data)
+            except ValueError:
+                pass
+        if scorer is None:
+            logger.warning(f"Model {self.version} is not a linear model, using rule-based key factors")
+            return None
+        return LinearExplainer(scorer, self.classes)
+
+    @classmethod
+    def load(cls, path: str, version: str) -> "ScoringModel":
+        """Loads and warms up a pickled or exported artifact; the registry's loader"""
+        if path.endswith(EXPORT_SUFFIX):
+            model_data = load_exported(path)
+        else:
+            import joblib
+
+            model_data = joblib.load(path)
+        scoring_model = cls(model_data, version, path)
+        scoring_model.warm_up()
+        return scoring_model
+
+    def warm_up(self):
+        """
+        Scores a synthetic application through the single and batch paths
+
+        Raises:
+            ValueError: If the model does not produce valid probabilities
+        """
+        features = {col: 1.0 for col in self.num_cols}
+        for col in self.cat_cols:
+            values = self.category_encoder.tables[col].known_values()
+            features[col] = values[0] if values else ""
+        single = self.predict_default_probability(features)
+        columns = {col: np.array([value, value], dtype=object if col in self.cat_cols else float)
+                   for col, value in features.items()}
+        encoded, _ = self.encode_categorical_batch(columns)
+        batch = self.predict_default_probabilities(encoded, 2)
+        if not (0.0 <= single <= 1.0 and np.all((batch >= 0) & (batch <= 1))):
+            raise ValueError(f"Model {self.version} returned invalid probabilities during warm-up")
+
+    def preprocess_record(self, data: dict) -> dict:
+        """Convert form data to a dictionary keyed by model feature"""
+        input_dict = {}
+
+        for form_field, model_feature in FEATURE_MAPPING.items():
+            if form_field in data:
+                if model_feature in self.num_cols:
+                    input_dict[model_feature] = float(data[form_field])
+                elif model_feature == 'has_guarantee':
+                    input_dict[model_feature] = 1 if str(data[form_field]).lower() in GUARANTEE_TRUE_VALUES else 0
+                else:
+                    input_dict[model_feature] = str(data[form_field])
+
+        return input_dict
+
+    def preprocess_columns(self, raw: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Vectorized preprocess_record for columnar input keyed by form field
+
+        Args:
+            raw: One array (or list) of raw values per form field in FEATURE_MAPPING
+
+        Returns:
+            Arrays keyed by model feature: floats for numeric features, 0/1 for
+            has_guarantee and str objects for the other categorical features
+        """
+        columns = {}
+
+        for form_field, model_feature in FEATURE_MAPPING.items():
+            values = np.asarray(raw[form_field], dtype=object)
+            if model_feature in self.num_cols:
+                columns[model_feature] = values.astype(float)
+            elif model_feature == 'has_guarantee':
+                lowered = np.char.lower(values.astype(str))
+                columns[model_feature] = np.isin(lowered, GUARANTEE_TRUE_VALUES).astype(int)
+            else:
+                # str() per element, like preprocess_record; fixed-width numpy strings would truncate
+                columns[model_feature] = np.array([str(value) for value in values], dtype=object)
+
+        return columns
+
+    def encode_categorical_batch(
+        self, columns: Dict[str, np.ndarray], unseen_masks: Optional[Dict[str, np.ndarray]] = None
+    ) -> Tuple[Dict[str, np.ndarray], Dict[int, str]]:
+        """Encode whole categorical columns at once, returning error messages for rejected rows"""
+        return self.category_encoder.encode_columns(columns, unseen_masks)
+
+    def build_model_frame(self, columns: Dict[str, np.ndarray], n_rows: int) -> "pd.DataFrame":
+        """Assemble encoded columns into a single frame ordered like the model's training data"""
+        import pandas as pd
+
+        if not hasattr(self.model, 'feature_names_in_'):
+            return pd.DataFrame(columns)
+
+        frame = {}
+        for feature in self.model.feature_names_in_:
+            if feature in columns:
+                frame[feature] = columns[feature]
+            elif feature in self.cat_cols:
+                frame[feature] = np.full(n_rows, self.category_encoder.encode_value(feature, None))
+            else:
+                frame[feature] = np.zeros(n_rows)
+
+        return pd.DataFrame(frame, columns=list(self.model.feature_names_in_))
+
+    def predict_default_probability(self, features: dict) -> float:
+        """Probability of default for one preprocessed application, using the configured scorer"""
+        return self.predict_encoded_probability(self.category_encoder.encode_record(features))
+
+    def predict_encoded_probability(self, encoded: dict) -> float:
+        """Probability of default for one application whose categoricals are already label codes"""
+        if self.compiled_scorer is not None:
+            return self.compiled_scorer.predict_proba_record(encoded)
+
+        import pandas as pd
+
+        input_df = pd.DataFrame([encoded])
+        if hasattr(self.model, 'feature_names_in_'):
+            missing_features = set(self.model.feature_names_in_) - set(input_df.columns)
+            if missing_features:
+                for feature in missing_features:
+                    if feature in self.cat_cols:
+                        input_df[feature] = self.category_encoder.encode_value(feature, None)
+                    else:
+                        input_df[feature] = 0.0
+            input_df = input_df[self.model.feature_names_in_]
+
+        return float(self.model.predict_proba(input_df)[0][1])
+
+    def predict_default_probabilities(self, encoded: Dict[str, np.ndarray], n_rows: int) -> np.ndarray:
+        """Probabilities of default for an encoded columnar batch, using the configured scorer"""
+        if self.compiled_scorer is not None:
+            return self.compiled_scorer.predict_proba_columns(encoded, n_rows)
+
+        return self.model.predict_proba(self.build_model_frame(encoded, n_rows))[:, 1]
+
+    def key_factors(self, features: dict) -> dict:
+        """Key factors for one preprocessed application that has been scored, per EXPLANATION_MODE"""
+        if self.explainer is None:
+            return get_key_factors(features)
+        encoded = self.category_encoder.encode_record(features, count_unseen=False)
+        return self.explainer.explain_record(encoded, unseen=self.category_encoder.unseen_columns(features))
+
+    def key_factors_batch(
+        self, encoded: Dict[str, np.ndarray], n_rows: int, unseen_masks: Optional[Dict[str, np.ndarray]] = None
+    ) -> List[dict]:
+        """
+        Key factors for an encoded columnar batch, per EXPLANATION_MODE
+
+        Args:
+            unseen_masks: The masks encode_categorical_batch filled, so that fallback codes
+                are not reported as the applicant's category
+        """
+        if self.explainer is None:
+            return get_key_factors_batch(encoded)
+        return self.explainer.explain_columns(encoded, n_rows, unseen_masks=unseen_masks)
+
+
+# Load model and encoders
+try:
+    registry = ModelRegistry(
+        ScoringModel.load,
+        directory=MODEL_DIR,
+        path=MODEL_PATH,
+        version=MODEL_VERSION,
+        poll_interval=MODEL_POLL_SECONDS,
+    )
+    registry.load()
+    logger.info(f"Model version {registry.active.version} and encoders loaded successfully")
+except Exception as e:
+    logger.error(f"Failed to load model: {str(e)}")
+    raise RuntimeError(f"Model loading failed: {str(e)}")
+
+
+def current_model() -> ScoringModel:
+    """The version new work should score against; take it once per request or job"""
+    return registry.active
+
+# Helper functions, scoring against the currently active version
+def preprocess_record(data: dict) -> dict:
+    """Convert form data to a dictionary keyed by model feature"""
+    return current_model().preprocess_record(data)
+
+def preprocess_input(data: dict) -> "pd.DataFrame":
+    """Convert form data to model input format"""
+    import pandas as pd
+
+    return pd.DataFrame([preprocess_record(data)])
+
+def encode_categorical_features(df: "pd.DataFrame") -> "pd.DataFrame":
+    """Encode categorical features using the precomputed lookup tables and the unseen-category policy"""
+    scoring_model = current_model()
+    for col in scoring_model.cat_cols:
+        if col in df.columns:
+            df[col] = scoring_model.category_encoder.encode_value(col, df[col].iloc[0])
+
+    return df
+
+def preprocess_columns(raw: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Vectorized preprocess_record for columnar input keyed by form field"""
+    return current_model().preprocess_columns(raw)
+
+def preprocess_batch(records: List[dict], scoring_model: Optional[ScoringModel] = None) -> Dict[str, np.ndarray]:
+    """Convert a list of form payloads to columnar arrays keyed by model feature"""
+    return (scoring_model or current_model()).preprocess_columns({
+        form_field: [record.get(form_field) for record in records] for form_field in FEATURE_MAPPING
+    })
+
+def encode_categorical_batch(columns: Dict[str, np.ndarray]) -> Tuple[Dict[str, np.ndarray], Dict[int, str]]:
+    """Encode whole categorical columns at once, returning error messages for rejected rows"""
+    return current_model().encode_categorical_batch(columns)
+
+def predict_default_probability(features: dict) -> float:
+    """Probability of default for one preprocessed application, using the configured scorer"""
+    return current_model().predict_default_probability(features)
+
+def predict_default_probabilities(encoded: Dict[str, np.ndarray], n_rows: int) -> np.ndarray:
+    """Probabilities of default for an encoded columnar batch, using the configured scorer"""
+    return current_model().predict_default_probabilities(encoded, n_rows)
+
+# Probabilities of default are capped here so the odds stay positive: a certain
+# default would take log10(0), while the cap already maps to the minimum score
+MAX_PROB_DEFAULT = 1 - 1e-9
+
+def calculate_credit_score(prob_default: float) -> int:
+    """Convert probability of default to credit score (300-850)"""
+    prob_default = min(max(float(prob_default), 0.0), MAX_PROB_DEFAULT)
+    odds = (1 - prob_default) / (prob_default + 1e-9)
+    score = 300 + (50 * np.log10(odds))
+    return int(np.clip(score, 300, 850))
+
+def calculate_credit_scores(prob_default: np.ndarray) -> np.ndarray:
+    """Vectorized calculate_credit_score for a batch of default probabilities"""
+    prob_default = np.clip(prob_default, 0.0, MAX_PROB_DEFAULT)
+    odds = (1 - prob_default) / (prob_default + 1e-9)
+    scores = 300 + (50 * np.log10(odds))
+    return np.clip(scores, 300, 850).astype(int)
+
+def determine_decision(score: int) -> str:
+    """Map a credit score to the lending decision"""
+    return "Approved" if score >= 650 else "Approved with conditions" if score >= 550 else "Declined"
+
+def determine_risk_level(score: int) -> str:
+    """Categorize risk based on credit score"""
+    if score >= 750:
+        return "Very Low"
+    elif score >= 650:
+        return "Low"
+    elif score >= 550:
+        return "Medium"
+    elif score >= 450:
+        return "High"
+    return "Very High"
+
+def determine_decisions(scores: np.ndarray) -> np.ndarray:
+    """Vectorized determine_decision"""
+    return np.select(
+        [scores >= 650, scores >= 550], ["Approved", "Approved with conditions"], "Declined"
+    ).astype(object)
+
+def determine_risk_levels(scores: np.ndarray) -> np.ndarray:
+    """Vectorized determine_risk_level"""
+    return np.select(
+        [scores >= 750, scores >= 650, scores >= 550, scores >= 450],
+        ["Very Low", "Low", "Medium", "High"],
+        "Very High",
+    ).astype(object)
+
+def get_key_factors(input_data: dict) -> dict:
+    """Rule-based key positive/negative factors for decision (EXPLANATION_MODE=rules)"""
+    factors = {"positive": [], "negative": []}
+
+    if input_data.get('income', 0) > 100000:
+        factors["positive"].append("High income")
+    if input_data.get('customer_tenure', 0) > 24:
+        factors["positive"].append("Long customer tenure")
+
+    if input_data.get('avg_days_late_current', 0) > 15:
+        factors["negative"].append("Frequent late payments")
+    if input_data.get('num_late_payments_current', 0) > 3:
+        factors["negative"].append("Multiple late payments")
+
+    debt_ratio = input_data.get('loan_amount', 0) / max(input_data.get('income', 1), 1)
+    if debt_ratio > 0.35:
+        factors["negative"].append(f"High debt ratio ({debt_ratio:.0%})")
+
+    return factors
+
+def get_key_factors_batch(columns: Dict[str, np.ndarray]) -> List[dict]:
+    """get_key_factors for preprocessed columns, with the threshold tests done per column"""
+    income = columns['income']
+    debt_ratio = columns['loan_amount'] / np.maximum(income, 1)
+    flags = zip(
+        (income > 100000).tolist(),
+        (columns['customer_tenure'] > 24).tolist(),
+        (columns['avg_days_late_current'] > 15).tolist(),
+        (columns['num_late_payments_current'] > 3).tolist(),
+        (debt_ratio > 0.35).tolist(),
+        debt_ratio.tolist(),
+    )
+
+    factors = []
+    for high_income, long_tenure, frequent_late, multiple_late, high_debt, ratio in flags:
+        positive, negative = [], []
+        if high_income:
+            positive.append("High income")
+        if long_tenure:
+            positive.append("Long customer tenure")
+        if frequent_late:
+            negative.append("Frequent late payments")
+        if multiple_late:
+            negative.append("Multiple late payments")
+        if high_debt:
+            negative.append(f"High debt ratio ({ratio:.0%})")
+        factors.append({"positive": positive, "negative": negative})
+
+    return factors
@@ -0,0 +1,274 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .concurrency import run_inference
+from .metrics import Histogram
+from .scoring import ScoringModel, calculate_credit_scores, determine_decision, determine_decisions
+
+logger = logging.getLogger(__name__)
+
+# Challenger artifacts scored in the shadow of the serving model, comma separated
+SHADOW_MODELS = [path.strip() for path in os.getenv("SHADOW_MODELS", "").split(",") if path.strip()]
+# Fraction of requests mirrored to the challengers
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "1.0"))
+# Rows waiting for shadow scoring; requests beyond this are not mirrored
+SHADOW_QUEUE_ROWS = int(os.getenv("SHADOW_QUEUE_ROWS", "100000"))
+# Queued requests handled per trip to the inference executor
+SHADOW_DRAIN_SIZE = 256
+# Below this many rows plain Python beats the fixed cost of NumPy calls
+SMALL_BATCH = 16
+
+LATENCY_BUCKETS_MS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000]
+SCORE_DIFF_BUCKETS = [-100, -50, -20, -10, -5, -1, 0, 1, 5, 10, 20, 50, 100]
+
+
+class ComparisonStats:
+    """Running comparison of one challenger against the champion version it shadowed"""
+
+    def __init__(self):
+        self.rows = 0
+        self.skipped_rows = 0
+        self.abs_diff_total = 0.0
+        self.max_abs_diff = 0
+        self.decision_flips = 0
+        self.flips: Dict[str, int] = {}
+        self.score_diff = Histogram("shadow_score_diff", "Challenger minus champion credit score", SCORE_DIFF_BUCKETS)
+        self.challenger_ms = Histogram("shadow_challenger_ms", "Challenger scoring time in milliseconds", LATENCY_BUCKETS_MS)
+
+    def record(self, champion_scores: np.ndarray, challenger_scores: np.ndarray, challenger_ms: float):
+        self.challenger_ms.observe(challenger_ms)
+        if len(champion_scores) <= SMALL_BATCH:
+            for champion, challenger in zip(champion_scores.tolist(), challenger_scores.tolist()):
+                self._record_one(int(champion), int(challenger))
+            return
+
+        diff = challenger_scores.astype(int) - champion_scores.astype(int)
+        self.rows += len(diff)
+        self.abs_diff_total += float(np.abs(diff).sum())
+        self.max_abs_diff = max(self.max_abs_diff, int(np.abs(diff).max()))
+        self.score_diff.observe_array(diff)
+
+        champion_decisions = determine_decisions(champion_scores)
+        challenger_decisions = determine_decisions(challenger_scores)
+        flipped = champion_decisions != challenger_decisions
+        if flipped.any():
+            self.decision_flips += int(flipped.sum())
+            labels = champion_decisions[flipped] + " -> " + challenger_decisions[flipped]
+            for label, n in zip(*np.unique(labels.astype(str), return_counts=True)):
+                self.flips[label] = self.flips.get(label, 0) + int(n)
+
+    def _record_one(self, champion: int, challenger: int):
+        diff = challenger - champion
+        self.rows += 1
+        self.abs_diff_total += abs(diff)
+        self.max_abs_diff = max(self.max_abs_diff, abs(diff))
+        self.score_diff.observe(diff)
+        before, after = determine_decision(champion), determine_decision(challenger)
+        if before != after:
+            self.decision_flips += 1
+            label = f"{before} -> {after}"
+            self.flips[label] = self.flips.get(label, 0) + 1
+
+    def summary(self) -> dict:
+        return {
+            "rows": self.rows,
+            "skipped_rows": self.skipped_rows,
+            "mean_abs_score_diff": round(self.abs_diff_total / self.rows, 3) if self.rows else None,
+            "max_abs_score_diff": self.max_abs_diff,
+            "decision_flips": self.decision_flips,
+            "decision_flip_rate": round(self.decision_flips / self.rows, 5) if self.rows else None,
+            "flips": dict(self.flips),
+            "score_diff": self.score_diff.summary(),
+            "challenger_ms": self.challenger_ms.summary(),
+        }
+
+
+class ShadowScorer:
+    """
+    Champion/challenger scoring off the request path
+
+    The serving path calls submit() with the preprocessed (not yet encoded)
+    features it scored, the champion's credit scores and how long the champion
+    took. That only puts the job on a bounded queue; a background task scores
+    the same features with every challenger on the inference executor and folds
+    the score differences, decision flips and timings into fixed-size aggregates
+    keyed by (champion version, challenger version). When the queue already
+    holds max_pending_rows rows, or a request is not sampled, nothing is
+    mirrored, so shadow scoring can never slow down or fail a request.
+    submit() may be called from the event loop or from executor threads.
+
+    Challengers encode categories with their own tables, so they may be trained
+    with different encoders, but must use the same feature columns.
+    """
+
+    def __init__(self, challengers: List[ScoringModel], sample_rate: float = 1.0, max_pending_rows: int = 100000):
+        self.challengers = challengers
+        self.sample_rate = sample_rate
+        self.max_pending_rows = max_pending_rows
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+        self.pending_rows = 0
+        self.submitted = 0
+        self.dropped = 0
+        self.failed = 0
+        self.champion_ms: Dict[str, Histogram] = {}
+        self.comparisons: Dict[Tuple[str, str], ComparisonStats] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.challengers)
+
+    async def start(self):
+        if not self.enabled:
+            return
+        self._queue = asyncio.Queue()
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Shadow scoring with challengers {[c.version for c in self.challengers]}")
+
+    async def stop(self):
+        """Stops the worker; jobs still queued are discarded"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._queue = None
+        self._loop = None
+
+    def submit(
+        self,
+        champion_version: str,
+        champion_scores: np.ndarray,
+        champion_seconds: float,
+        features: Optional[dict] = None,
+        columns: Optional[Dict[str, np.ndarray]] = None,
+    ) -> bool:
+        """
+        Queues one scored request for the challengers, without waiting
+
+        Pass features for a single application (scored through the record path)
+        or columns for a batch (scored through the columnar path).
+
+        Returns:
+            Whether the request was mirrored
+        """
+        loop = self._loop
+        if loop is None:
+            return False
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        n_rows = len(champion_scores)
+        with self._lock:
+            if self.pending_rows + n_rows > self.max_pending_rows:
+                self.dropped += 1
+                return False
+            self.pending_rows += n_rows
+            self.submitted += 1
+        job = (champion_version, np.asarray(champion_scores), champion_seconds, features, columns)
+        try:
+            loop.call_soon_threadsafe(self._queue.put_nowait, job)
+        except RuntimeError:
+            # The loop closed while an executor thread was finishing a request
+            return False
+        return True
+
+    async def _run(self):
+        while True:
+            jobs = [await self._queue.get()]
+            while len(jobs) < SHADOW_DRAIN_SIZE and not self._queue.empty():
+                jobs.append(self._queue.get_nowait())
+            await run_inference(self._process, jobs)
+
+    def _process(self, jobs: list):
+        """Runs on the inference executor: scores each job with every challenger and aggregates"""
+        for champion_version, champion_scores, champion_seconds, features, columns in jobs:
+            try:
+                results = self._score(features, columns)
+                with self._lock:
+                    self._record(champion_version, champion_scores, champion_seconds, results)
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                logger.error(f"Shadow scoring failed: {str(e)}")
+            finally:
+                with self._lock:
+                    self.pending_rows -= len(champion_scores)
+
+    def _score(self, features: Optional[dict], columns: Optional[Dict[str, np.ndarray]]) -> list:
+        """Runs on the inference executor: (version, kept-row mask, scores, seconds) per challenger"""
+        results = []
+        for challenger in self.challengers:
+            started = time.perf_counter()
+            if features is not None:
+                try:
+                    probabilities = np.array([challenger.predict_default_probability(features)])
+                    keep = np.ones(1, dtype=bool)
+                except ValueError:
+                    probabilities, keep = np.empty(0), np.zeros(1, dtype=bool)
+            else:
+                encoded, errors = challenger.encode_categorical_batch(columns)
+                n_rows = len(next(iter(columns.values())))
+                keep = np.ones(n_rows, dtype=bool)
+                if errors:
+                    keep[list(errors)] = False
+                    encoded = {col: values[keep] for col, values in encoded.items()}
+                probabilities = challenger.predict_default_probabilities(encoded, int(keep.sum()))
+            elapsed = time.perf_counter() - started
+            results.append((challenger.version, keep, calculate_credit_scores(probabilities), elapsed))
+        return results
+
+    def _record(self, champion_version: str, champion_scores: np.ndarray, champion_seconds: float, results: list):
+        self.champion_ms.setdefault(
+            champion_version, Histogram("shadow_champion_ms", "Champion scoring time in milliseconds", LATENCY_BUCKETS_MS)
+        ).observe(champion_seconds * 1000)
+        for challenger_version, keep, scores, seconds in results:
+            stats = self.comparisons.setdefault((champion_version, challenger_version), ComparisonStats())
+            stats.skipped_rows += int((~keep).sum())
+            stats.record(champion_scores[keep], scores, seconds * 1000)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return self._stats()
+
+    def _stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "challengers": [challenger.version for challenger in self.challengers],
+            "sample_rate": self.sample_rate,
+            "queue_rows": self.pending_rows,
+            "queue_capacity_rows": self.max_pending_rows,
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "champion_ms": {version: histogram.summary() for version, histogram in self.champion_ms.items()},
+            "comparisons": [
+                {"champion": champion, "challenger": challenger, **stats.summary()}
+                for (champion, challenger), stats in self.comparisons.items()
+            ],
+        }
+
+
+def load_challengers(paths: List[str]) -> List[ScoringModel]:
+    """Loads challenger artifacts, versioned by file name; ones that fail to load are skipped"""
+    challengers = []
+    for path in paths:
+        version = os.path.splitext(os.path.basename(path))[0]
+        try:
+            challengers.append(ScoringModel.load(path, version))
+        except Exception as e:
+            logger.error(f"Failed to load challenger model {path}, not shadowing it: {str(e)}")
+    return challengers
@@ -0,0 +1,117 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app import analytics, crud, models, schemas
+from app.database import Base
+from app.scoring import determine_decision, determine_risk_level
+
+
+def prediction_rows(n: int, start: datetime = datetime(2025, 1, 30)):
+    scores = [300 + (i * 37) % 551 for i in range(n)]
+    return [
+        {
+            "client_name": f"client-{i}",
+            "timestamp": start + timedelta(hours=5 * i),
+            "credit_score": score,
+            "risk_level": determine_risk_level(score),
+            "decision": determine_decision(score),
+            "loan_amount": 1000.0 + i,
+            "user_id": None if i % 5 == 0 else 1 + i % 2,
+        }
+        for i, score in enumerate(scores)
+    ]
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'analytics.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def rollup_snapshot(db):
+    rows = db.execute(select(models.PredictionRollup).where(models.PredictionRollup.predictions != 0)).scalars()
+    return sorted(
+        (
+            tuple(getattr(row, column) for column in analytics.KEY_COLUMNS),
+            (row.predictions, row.score_sum, round(row.loan_amount_sum, 6), row.loan_amount_count),
+        )
+        for row in rows
+    )
+
+
+def test_incremental_rollups_match_a_rebuild(db):
+    rows = prediction_rows(300)
+    # Several writes landing in the same buckets exercise the upsert
+    for offset in range(0, len(rows), 70):
+        crud.insert_prediction_rows(db, rows[offset:offset + 70])
+    created = crud.create_prediction(
+        db,
+        schemas.PredictionCreate(
+            client_name="single", credit_score=850, income=1.0, loan_amount=500.0, interest_rate=5.0,
+            employment="employed", loan_purpose="home", risk_level="Very Low", decision="Approved",
+        ),
+        user_id=1,
+    )
+    doomed = db.query(models.Prediction).filter(models.Prediction.user_id == 2).first()
+    assert crud.delete_prediction(db, doomed.id, user_id=2)
+
+    incremental = rollup_snapshot(db)
+    analytics.rebuild_rollups(db, batch_size=64)
+
+    assert incremental == rollup_snapshot(db)
+    assert sum(sums[0] for _, sums in incremental) == 300
+    assert (1, created.timestamp.date(), 800, "Very Low", "Approved") in {key for key, _ in incremental}
+
+
+def test_portfolio_summary_matches_the_predictions(db):
+    rows = prediction_rows(300)
+    crud.insert_prediction_rows(db, rows)
+
+    summary = analytics.portfolio_summary(db, user_id=1, granularity="month")
+    mine = [row for row in rows if row["user_id"] == 1]
+
+    assert summary["predictions"] == len(mine)
+    assert summary["approval_rate"] == pytest.approx(sum(r["decision"] in ("Approved", "Approved with conditions") for r in mine) / len(mine))
+    assert summary["average_score"] == pytest.approx(sum(r["credit_score"] for r in mine) / len(mine))
+    assert summary["average_loan_amount"] == pytest.approx(sum(r["loan_amount"] for r in mine) / len(mine))
+    assert summary["risk_levels"] == {
+        level: sum(r["risk_level"] == level for r in mine) for level in {r["risk_level"] for r in mine}
+    }
+    assert sum(band["predictions"] for band in summary["score_distribution"]) == len(mine)
+
+    months = {}
+    for row in mine:
+        month = row["timestamp"].date().replace(day=1)
+        months[month] = months.get(month, 0) + 1
+    assert [(p["period"], p["predictions"]) for p in summary["periods"]] == sorted(months.items())
+
+
+def test_portfolio_summary_filters_days_and_users(db):
+    rows = prediction_rows(300)
+    crud.insert_prediction_rows(db, rows)
+    start, end = date(2025, 2, 3), date(2025, 2, 9)
+
+    summary = analytics.portfolio_summary(db, start=start, end=end, granularity="week")
+
+    expected = [row for row in rows if start <= row["timestamp"].date() <= end]
+    assert summary["predictions"] == len(expected)
+    assert [p["period"] for p in summary["periods"]] == [start]
+
+    with pytest.raises(ValueError):
+        analytics.portfolio_summary(db, granularity="year")
+    with pytest.raises(ValueError):
+        analytics.portfolio_summary(db, start=end, end=start)
+
+
+def test_score_bands_cover_the_score_range():
+    assert analytics.score_band(300) == 300
+    assert analytics.score_band(349) == 300
+    assert analytics.score_band(350) == 350
+    assert analytics.score_band(850) == 800
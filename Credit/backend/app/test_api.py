@@ -0,0 +1,189 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import archive, main, models, schemas
+from app.database import Base
+from app.prediction_log import PredictionLogClosed
+from app.scoring import determine_decision, determine_risk_level
+
+APPLICATION = {
+    "client_name": "Api Test",
+    "age": 35,
+    "income": 60000,
+    "employment": "employed",
+    "loanAmount": 20000,
+    "loanPurpose": "business",
+    "location": "urban",
+    "phoneUsage": "moderate",
+    "utilityPayments": "good",
+    "interestRate": 7.5,
+    "turnover": 2500000,
+    "customerTenure": 12,
+    "avgDaysLateCurrent": 3,
+    "numLatePaymentsCurrent": 1,
+    "unpaidAmount": 0,
+    "industrySector": "Retail",
+    "creditType": "Term Loan",
+    "hasGuarantee": "yes",
+    "guaranteeType": "Collateral",
+    "repaymentFrequency": "Monthly",
+}
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """The app served against a fresh SQLite database, with its background workers running"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'api.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    sessions = sessionmaker(bind=engine)
+    monkeypatch.setattr(main, "SessionLocal", sessions)
+    monkeypatch.setattr(main.prediction_writer, "session_factory", sessions)
+    # The executors are process-wide; later tests still need them
+    monkeypatch.setattr(main, "shutdown_executors", lambda: None)
+    with TestClient(main.app) as client:
+        yield client, sessions
+    engine.dispose()
+
+
+def stored(sessions):
+    with sessions() as db:
+        rows = db.query(models.Prediction).order_by(models.Prediction.id).all()
+        return [(row.client_name, row.credit_score, row.risk_level, row.decision) for row in rows]
+
+
+def wait_for_rows(sessions, count, timeout=5.0):
+    """Stored predictions once the write-behind log has flushed count of them"""
+    deadline = time.monotonic() + timeout
+    while len(rows := stored(sessions)) < count and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return rows
+
+
+def test_every_scorer_label_is_a_schema_label():
+    for score in range(300, 851):
+        prediction = schemas.PredictionCreate(
+            client_name="x", credit_score=score, income=1, loan_amount=1, interest_rate=1,
+            employment="employed", loan_purpose="home",
+            risk_level=determine_risk_level(score), decision=determine_decision(score),
+        )
+        assert prediction.risk_level.value == determine_risk_level(score)
+
+
+def test_batch_predictions_are_saved(api):
+    client, sessions = api
+    records = [APPLICATION, {**APPLICATION, "client_name": "Late payer", "avgDaysLateCurrent": 25}, {**APPLICATION, "age": 12}]
+
+    body = client.post("/predict/batch", json=records).json()
+
+    assert body["succeeded"] == 2
+    results = [item["result"] for item in body["results"][:2]]
+    assert stored(sessions) == [
+        (result["client"], result["creditScore"], result["riskLevel"], result["decision"]) for result in results
+    ]
+
+
+def test_predictions_reach_the_table_through_the_log(api):
+    client, sessions = api
+    result = client.post("/predict", json=APPLICATION).json()
+
+    assert wait_for_rows(sessions, 1) == [
+        (result["client"], result["creditScore"], result["riskLevel"], result["decision"])
+    ]
+    assert main.prediction_writer.stats()["failed"] == 0
+
+
+def login(client, email):
+    client.post("/register", json={"email": email, "username": email.split("@")[0], "password": "secret"})
+    return client.post("/login", data={"username": email, "password": "secret"}).json()["access_token"]
+
+
+def test_portfolio_analytics_cover_scored_applications(api, monkeypatch):
+    client, sessions = api
+    monkeypatch.setattr(main.auth, "ADMIN_EMAILS", frozenset({"analyst@example.com"}))
+    token = login(client, "analyst@example.com")
+    established = {"age": 55, "customerTenure": 200, "turnover": 90000000, "avgDaysLateCurrent": 0, "numLatePaymentsCurrent": 0}
+    applications = [{**APPLICATION, **established}, APPLICATION, {**APPLICATION, "avgDaysLateCurrent": 45}]
+    results = [client.post("/predict", json=application).json() for application in applications]
+    wait_for_rows(sessions, len(results))
+
+    summary = client.get(
+        "/analytics/portfolio", params={"scope": "all"}, headers={"Authorization": f"Bearer {token}"}
+    ).json()
+
+    approved = [r for r in results if r["decision"] in ("Approved", "Approved with conditions")]
+    assert summary["predictions"] == len(results)
+    assert summary["approval_rate"] == pytest.approx(len(approved) / len(results))
+    assert summary["decisions"] == {
+        decision: sum(r["decision"] == decision for r in results) for decision in {r["decision"] for r in results}
+    }
+    assert summary["risk_levels"] == {
+        level: sum(r["riskLevel"] == level for r in results) for level in {r["riskLevel"] for r in results}
+    }
+
+
+def test_portfolio_analytics_across_users_are_for_admins_only(api, monkeypatch):
+    client, _ = api
+    monkeypatch.setattr(main.auth, "ADMIN_EMAILS", frozenset({"admin@example.com"}))
+    headers = {"Authorization": f"Bearer {login(client, 'viewer@example.com')}"}
+
+    assert client.get("/analytics/portfolio", params={"scope": "all"}, headers=headers).status_code == 403
+    assert client.get("/analytics/portfolio", params={"scope": "user"}, headers=headers).status_code == 200
+
+
+def test_cached_predictions_are_still_recorded(api):
+    client, sessions = api
+    # An application no other test scores, so the first request misses the cache
+    application = {**APPLICATION, "client_name": "Resubmitted", "income": 61234}
+    hits = main.prediction_cache.stats()["hits"]
+
+    first = client.post("/predict", json=application).json()
+    second = client.post("/predict", json=application).json()
+
+    assert main.prediction_cache.stats()["hits"] == hits + 1
+    assert second["creditScore"] == first["creditScore"]
+    assert wait_for_rows(sessions, 2) == [("Resubmitted", first["creditScore"], first["riskLevel"], first["decision"])] * 2
+
+
+def test_scored_predictions_are_archived(api, tmp_path):
+    client, sessions = api
+    results = [item["result"] for item in client.post("/predict/batch", json=[APPLICATION] * 3).json()["results"]]
+    prediction_archive = archive.PredictionArchive(str(tmp_path / "archive"))
+
+    with sessions() as db:
+        summary = archive.archive_predictions(db, prediction_archive, datetime.utcnow() + timedelta(days=1))
+
+    assert summary["archived"] == 3 and stored(sessions) == []
+    archived = [row for batch in prediction_archive.iter_batches(10) for row in batch]
+    assert [(row["client_name"], row["credit_score"], row["risk_level"], row["decision"]) for row in archived] == [
+        (result["client"], result["creditScore"], result["riskLevel"], result["decision"]) for result in results
+    ]
+
+
+def test_unrecognized_categories_are_explained_as_such(api):
+    client, _ = api
+    application = {**APPLICATION, "guaranteeType": "Personal"}
+
+    single = client.post("/predict", json=application).json()["keyFactors"]
+    batch = client.post("/predict/batch", json=[application]).json()["results"][0]["result"]["keyFactors"]
+
+    assert batch == single
+    assert "Guarantee type: unrecognized" in single["negative"] + single["positive"]
+    assert not any(factor.startswith("Guarantee type: Collateral") for factor in single["negative"] + single["positive"])
+
+
+def test_predictions_during_shutdown_get_a_retryable_503(api, monkeypatch):
+    client, _ = api
+
+    async def closed(row):
+        raise PredictionLogClosed("Prediction writer is not running")
+
+    monkeypatch.setattr(main.prediction_writer, "enqueue", closed)
+    response = client.post("/predict", json={**APPLICATION, "income": 61235})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,164 @@
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app import analytics, archive, crud, models
+from app.database import Base
+from app.scoring import determine_decision, determine_risk_level
+
+START = datetime(2025, 3, 1)
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'history.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    scores = [300 + (i * 37) % 550 for i in range(360)]
+    rows = [
+        {
+            "client_name": f"client-{i}",
+            # Ten days of history, several rows per timestamp so the id tie-breaker matters
+            "timestamp": START + timedelta(hours=(i // 3) * 2),
+            "credit_score": score,
+            "risk_level": determine_risk_level(score),
+            "decision": determine_decision(score),
+            "loan_amount": 1000.0 + i,
+            "user_id": 1 if i % 4 else 2,
+        }
+        for i, score in enumerate(scores)
+    ]
+    crud.insert_prediction_rows(session, rows)
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def all_pages(db, prediction_archive, order_by, order_direction, limit=13):
+    seen, cursor = [], None
+    while True:
+        page, cursor = crud.get_predictions_page(
+            db, user_id=1, limit=limit, order_by=order_by, order_direction=order_direction,
+            cursor=cursor, archive=prediction_archive,
+        )
+        seen.extend(prediction.id for prediction in page)
+        if cursor is None:
+            return seen
+
+
+def table_rows(db):
+    return db.scalar(select(func.count()).select_from(models.Prediction))
+
+
+def test_archival_moves_old_days_to_parquet_partitions(db, tmp_path):
+    prediction_archive = archive.PredictionArchive(str(tmp_path / "archive"))
+    before = START + timedelta(days=6)
+
+    summary = archive.archive_predictions(db, prediction_archive, before, batch_size=50)
+
+    assert summary["archived"] == summary["deleted"] == 216
+    assert table_rows(db) == 144
+    assert db.scalar(select(func.min(models.Prediction.timestamp))) == before
+    assert sorted(os.listdir(tmp_path / "archive")) == [f"day=2025-03-0{day}" for day in range(1, 7)] + ["manifest.json"]
+    stats = prediction_archive.stats()
+    assert stats["watermark"] == before.isoformat() and stats["rows"] == 216 and stats["unpurged_files"] == 0
+
+    archived = [row for batch in prediction_archive.iter_batches(64) for row in batch]
+    assert sorted(row["id"] for row in archived) == list(range(1, 217))
+    assert archived[0]["risk_level"] == determine_risk_level(archived[0]["credit_score"]) and archived[0]["loan_amount"] >= 1000.0
+
+    # A later run archives only the days that have aged since
+    summary = archive.archive_predictions(db, prediction_archive, before + timedelta(days=2), batch_size=50)
+    assert summary["archived"] == 72 and table_rows(db) == 72
+    with pytest.raises(ValueError):
+        archive.archive_predictions(db, prediction_archive, before)
+
+
+@pytest.mark.parametrize("order_by", ["timestamp", "credit_score"])
+@pytest.mark.parametrize("order_direction", ["asc", "desc"])
+def test_history_pages_span_table_and_archive(db, tmp_path, order_by, order_direction):
+    expected = all_pages(db, None, order_by, order_direction)
+    prediction_archive = archive.PredictionArchive(str(tmp_path / "archive"))
+    archive.archive_predictions(db, prediction_archive, START + timedelta(days=4, hours=7), batch_size=40)
+
+    assert all_pages(db, prediction_archive, order_by, order_direction) == expected
+    assert all_pages(db, prediction_archive, order_by, order_direction, limit=500) == expected
+
+
+def test_analytics_cover_archived_history(db, tmp_path):
+    before = analytics.portfolio_summary(db, granularity="day")
+    prediction_archive = archive.PredictionArchive(str(tmp_path / "archive"))
+    archive.archive_predictions(db, prediction_archive, START + timedelta(days=5), batch_size=64)
+
+    # Archival leaves the rollups alone, and a rebuild reads the archive
+    assert analytics.portfolio_summary(db, granularity="day") == before
+    analytics.rebuild_rollups(db, batch_size=32, archive=prediction_archive)
+    assert analytics.portfolio_summary(db, granularity="day") == before
+
+
+def test_interrupted_run_is_finished_without_duplicates(db, tmp_path, monkeypatch):
+    expected = all_pages(db, None, "timestamp", "desc")
+    prediction_archive = archive.PredictionArchive(str(tmp_path / "archive"))
+    purge = archive.purge_archived
+    calls = []
+
+    def crash_on_publish(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError("killed")
+        return purge(*args, **kwargs)
+
+    monkeypatch.setattr(archive, "purge_archived", crash_on_publish)
+    with pytest.raises(RuntimeError):
+        archive.archive_predictions(db, prediction_archive, START + timedelta(days=3), batch_size=50)
+    monkeypatch.undo()
+
+    # Published but not deleted: the rows are in both places, and read once
+    assert table_rows(db) == 360 and prediction_archive.stats()["unpurged_files"] > 0
+    assert all_pages(db, prediction_archive, "timestamp", "desc") == expected
+
+    # Leftover files of a run that never published are discarded
+    stray = tmp_path / "archive" / "day=2025-03-09" / "part-300-310.parquet"
+    stray.parent.mkdir()
+    stray.write_bytes(b"partial")
+
+    summary = archive.archive_predictions(db, prediction_archive, START + timedelta(days=3), batch_size=50)
+    assert summary["archived"] == 0 and summary["deleted"] == 108
+    assert not stray.exists()
+    assert prediction_archive.stats()["rows"] == 108 and table_rows(db) == 252
+    assert all_pages(db, prediction_archive, "timestamp", "desc") == expected
+
+
+def test_open_day_files_are_capped(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'shuffled.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    # Days out of id order, so every batch spans all of them
+    crud.insert_prediction_rows(db, [
+        {"client_name": f"client-{i}", "timestamp": START + timedelta(days=i % 10, minutes=i), "credit_score": 600,
+         "risk_level": "Medium", "decision": "Approved with conditions", "user_id": 1}
+        for i in range(200)
+    ])
+    expected = all_pages(db, None, "timestamp", "desc")
+    monkeypatch.setattr(archive, "MAX_OPEN_DAY_FILES", 2)
+    prediction_archive = archive.PredictionArchive(str(tmp_path / "archive"))
+    peak = []
+    write = archive.DayFileWriter.write
+
+    def tracked_write(self, rows):
+        write(self, rows)
+        peak.append(self.open_files())
+
+    monkeypatch.setattr(archive.DayFileWriter, "write", tracked_write)
+    summary = archive.archive_predictions(db, prediction_archive, START + timedelta(days=10), batch_size=30)
+
+    assert max(peak) == 2
+    assert summary["archived"] == 200 and summary["files"] > 10 and table_rows(db) == 0
+    assert prediction_archive.stats()["days"] == 10
+    assert all_pages(db, prediction_archive, "timestamp", "desc") == expected
+    assert all_pages(db, prediction_archive, "credit_score", "asc") == sorted(expected)
+    db.close()
+    engine.dispose()
@@ -0,0 +1,47 @@
+import asyncio
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+from app import auth
+from app.cache import TTLCache
+
+
+def test_ttl_cache_expires_and_evicts_least_recently_used():
+    cache = TTLCache(max_size=2, default_ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, expires_at=time.time() - 1)
+    assert cache.get("b") is None
+
+    cache.set("c", 3)
+    assert cache.get("a") == 1
+    cache.set("d", 4)
+    assert cache.get("c") is None
+    assert cache.get("d") == 4
+    assert cache.stats()["evictions"] == 1
+
+
+def test_verified_tokens_are_decoded_once():
+    auth.token_cache.clear()
+    token = auth.create_access_token({"sub": "cached@example.com"})
+    misses = auth.token_cache.misses
+
+    assert asyncio.run(auth.verify_token(token)) == "cached@example.com"
+    assert asyncio.run(auth.verify_token(token)) == "cached@example.com"
+    assert auth.token_cache.misses == misses + 1
+    assert asyncio.run(auth.verify_token(token, token_type="refresh")) is None
+
+
+def test_cached_user_expires_with_token_and_is_invalidated():
+    auth.token_cache.clear()
+    auth.user_cache.clear()
+    token = auth.create_access_token({"sub": "user@example.com"}, expires_delta=timedelta(minutes=5))
+    asyncio.run(auth.verify_token(token))
+    user = SimpleNamespace(id=7, email="user@example.com")
+
+    auth.cache_user(token, user)
+    assert auth.get_cached_user(token) is user
+    assert auth.user_cache._entries[token][1] <= auth.token_cache.peek(token)["exp"]
+
+    assert auth.invalidate_cached_user(7) == 1
+    assert auth.get_cached_user(token) is None
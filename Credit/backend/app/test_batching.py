@@ -0,0 +1,81 @@
+import asyncio
+import copy
+
+import numpy as np
+import pytest
+
+from app.batching import MicroBatcher
+from app.encoding import UNSEEN_REJECT, CategoryEncoder
+from app.scoring import current_model
+
+
+def applications(n, seed=0):
+    """Preprocessed applications, as preprocess_record returns them"""
+    rng = np.random.default_rng(seed)
+    scoring_model = current_model()
+    records = []
+    for _ in range(n):
+        record = {col: float(rng.uniform(0, 50_000)) for col in scoring_model.num_cols}
+        for col in scoring_model.cat_cols:
+            record[col] = str(rng.choice(scoring_model.category_encoder.tables[col].known_values()))
+        records.append(record)
+    return records
+
+
+def test_concurrent_requests_share_model_calls_and_match_unbatched_scores():
+    scoring_model = current_model()
+    records = applications(20)
+
+    async def scenario():
+        batcher = MicroBatcher(max_batch_size=64, max_wait=0.005, latency_budget=0.05)
+        results = await asyncio.gather(*(batcher.predict(scoring_model, record) for record in records))
+        return batcher, results
+
+    batcher, results = asyncio.run(scenario())
+
+    # The first request goes alone to the idle scorer; the rest queue up behind it
+    assert batcher.batches == 2 and batcher.rows == 20 and batcher.largest_batch == 19
+    expected = [scoring_model.predict_default_probability(record) for record in records]
+    np.testing.assert_allclose([prob for prob, _ in results], expected, rtol=1e-9)
+
+
+def test_rejected_application_fails_only_its_own_request():
+    rejecting = copy.copy(current_model())
+    rejecting.category_encoder = CategoryEncoder.from_classes(rejecting.classes, UNSEEN_REJECT)
+    records = applications(3)
+    records[1] = {**records[1], rejecting.cat_cols[0]: "never seen"}
+
+    async def scenario():
+        batcher = MicroBatcher(max_batch_size=3, max_in_flight=0)
+        return await asyncio.gather(*(batcher.predict(rejecting, r) for r in records), return_exceptions=True)
+
+    first, rejected, last = asyncio.run(scenario())
+
+    assert isinstance(rejected, ValueError) and "never seen" in str(rejected)
+    assert first[0] == pytest.approx(rejecting.predict_default_probability(records[0]))
+    assert last[0] == pytest.approx(rejecting.predict_default_probability(records[2]))
+
+
+def test_batches_never_mix_model_versions():
+    champion = current_model()
+    other = copy.copy(champion)
+    records = applications(4)
+
+    async def scenario():
+        batcher = MicroBatcher(max_batch_size=64, max_wait=0.005, latency_budget=0.05, max_in_flight=0)
+        await asyncio.gather(*(batcher.predict(champion if i % 2 else other, r) for i, r in enumerate(records)))
+        return batcher
+
+    assert asyncio.run(scenario()).batches == 4
+
+
+def test_wait_is_capped_by_the_latency_budget():
+    with pytest.raises(ValueError):
+        MicroBatcher(max_wait=0.02, latency_budget=0.01)
+
+    batcher = MicroBatcher(max_wait=0.004, latency_budget=0.01)
+    assert batcher.flush_delay() == 0.004
+    batcher.scoring_seconds_estimate = 0.008
+    assert batcher.flush_delay() == pytest.approx(0.002)
+    batcher.scoring_seconds_estimate = 0.02
+    assert batcher.flush_delay() == 0.0
@@ -0,0 +1,106 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import bulk_score, scoring
+
+
+def portfolio(n_rows, seed=0):
+    """Applications keyed by model feature names, like the training dataset"""
+    rng = np.random.default_rng(seed)
+    tables = scoring.current_model().category_encoder.tables
+    frame = pd.DataFrame({
+        "client_name": [f"client-{i}" for i in range(n_rows)],
+        "age": rng.integers(19, 99, n_rows),
+        "income": rng.uniform(1_000, 300_000, n_rows),
+        "loan_amount": rng.uniform(500, 200_000, n_rows),
+        "interest_rate": rng.uniform(0.5, 30, n_rows),
+        "turnover": rng.uniform(1_000, 6_000_000, n_rows),
+        "customer_tenure": rng.integers(0, 60, n_rows),
+        "avg_days_late_current": rng.integers(0, 30, n_rows),
+        "num_late_payments_current": rng.integers(0, 6, n_rows),
+        "unpaid_amount": rng.uniform(0, 60_000, n_rows),
+        "industry_sector": rng.choice(tables["industry_sector"].known_values() + ["Mining"], n_rows),
+        "credit_type": rng.choice(tables["credit_type"].known_values(), n_rows),
+        "has_guarantee": rng.choice(["Yes", "No"], n_rows),
+        "guarantee_type": rng.choice(tables["guarantee_type"].known_values(), n_rows),
+        "repayment_frequency": rng.choice(tables["repayment_frequency"].known_values(), n_rows),
+    })
+    return frame
+
+
+def expected_scores(frame):
+    """Reference: score each row through the single-application path used by /predict"""
+    scores = []
+    for record in frame.to_dict("records"):
+        form = {field: record[feature] for field, feature in scoring.FEATURE_MAPPING.items()}
+        features = scoring.preprocess_record(form)
+        scores.append(scoring.calculate_credit_score(scoring.predict_default_probability(features)))
+    return scores
+
+
+def test_csv_scores_match_single_application_path(tmp_path):
+    frame = portfolio(250)
+    frame.loc[7, "income"] = None
+    frame.to_csv(tmp_path / "in.csv", index=False)
+
+    summary = bulk_score.score_file(str(tmp_path / "in.csv"), str(tmp_path / "out.csv"), chunk_size=64)
+    result = pd.read_csv(tmp_path / "out.csv")
+
+    assert summary["rows"] == 250 and summary["failed"] == 1 and summary["chunks"] == 4
+    assert list(result["row"]) == list(range(250))
+    assert list(result["client_name"]) == list(frame["client_name"])
+    assert result.loc[7, "error"].startswith("income")
+    scored = result.drop(index=7)
+    assert list(scored["credit_score"].astype(int)) == expected_scores(frame.drop(index=7))
+    assert json.loads(scored["key_factors"].iloc[0]).keys() == {"positive", "negative"}
+
+
+def test_resume_continues_after_last_completed_chunk(tmp_path, monkeypatch):
+    portfolio(300).to_csv(tmp_path / "in.csv", index=False)
+    bulk_score.score_file(str(tmp_path / "in.csv"), str(tmp_path / "full.csv"), chunk_size=50)
+
+    original = bulk_score.score_chunk
+    calls = []
+
+    def failing_score_chunk(frame, source, first_row):
+        calls.append(first_row)
+        if len(calls) == 4:
+            raise RuntimeError("simulated crash")
+        return original(frame, source, first_row)
+
+    monkeypatch.setattr(bulk_score, "score_chunk", failing_score_chunk)
+    with pytest.raises(RuntimeError):
+        bulk_score.score_file(str(tmp_path / "in.csv"), str(tmp_path / "out.csv"), chunk_size=50)
+    monkeypatch.setattr(bulk_score, "score_chunk", original)
+
+    summary = bulk_score.score_file(str(tmp_path / "in.csv"), str(tmp_path / "out.csv"), chunk_size=50, resume=True)
+
+    assert summary["rows"] == 150 and summary["total_rows"] == 300
+    assert (tmp_path / "out.csv").read_bytes() == (tmp_path / "full.csv").read_bytes()
+
+
+def test_resume_rejects_checkpoint_for_other_chunking(tmp_path):
+    portfolio(20).to_csv(tmp_path / "in.csv", index=False)
+    bulk_score.score_file(str(tmp_path / "in.csv"), str(tmp_path / "out.csv"), chunk_size=10)
+
+    with pytest.raises(ValueError):
+        bulk_score.score_file(str(tmp_path / "in.csv"), str(tmp_path / "out.csv"), chunk_size=5, resume=True)
+
+
+def test_parquet_input_and_output(tmp_path):
+    frame = portfolio(120)
+    frame.to_parquet(tmp_path / "in.parquet", index=False, row_group_size=50)
+
+    bulk_score.score_file(str(tmp_path / "in.parquet"), str(tmp_path / "first.parquet"), chunk_size=40)
+    # Resuming a finished run skips every row group and writes nothing new
+    summary = bulk_score.score_file(
+        str(tmp_path / "in.parquet"), str(tmp_path / "first.parquet"), chunk_size=40, resume=True
+    )
+    result = pd.read_parquet(tmp_path / "first.parquet").sort_values("row")
+
+    assert summary["rows"] == 0
+    assert list(result["row"]) == list(range(120))
+    assert list(result["credit_score"]) == expected_scores(frame)
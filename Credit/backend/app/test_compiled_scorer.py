@@ -0,0 +1,74 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from app.compiled_scorer import CompiledScorer
+from app.encoding import CategoryEncoder
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), "credit_scoring_model.pkl")
+
+
+def sample_features(model_data, n_rows, seed=0):
+    """Random preprocessed applications, including unseen categories"""
+    rng = np.random.default_rng(seed)
+    columns = {
+        "age": rng.integers(19, 99, n_rows).astype(float),
+        "income": rng.uniform(1_000, 300_000, n_rows),
+        "loan_amount": rng.uniform(500, 200_000, n_rows),
+        "interest_rate": rng.uniform(0.5, 30, n_rows),
+        "turnover": rng.uniform(1_000, 6_000_000, n_rows),
+        "customer_tenure": rng.integers(0, 60, n_rows).astype(float),
+        "avg_days_late_current": rng.integers(0, 120, n_rows).astype(float),
+        "num_late_payments_current": rng.integers(0, 15, n_rows).astype(float),
+        "unpaid_amount": rng.uniform(0, 60_000, n_rows),
+    }
+    for col in model_data["cat_cols"]:
+        # Raw values, as the API receives them: the classes without the trained suffix
+        choices = [str(value)[:-1] for value in model_data["label_encoders"][col].classes_ if value != "<UNK>"] + ["never-seen"]
+        columns[col] = np.array(rng.choice(choices, n_rows), dtype=object)
+    columns["has_guarantee"] = rng.integers(0, 2, n_rows)
+    return columns
+
+
+def pipeline_probabilities(model_data, columns):
+    """Reference path: label-encode the way the model was trained and call the sklearn pipeline"""
+    model = model_data["model"]
+    frame = {}
+    for feature in model.feature_names_in_:
+        if feature in model_data["cat_cols"]:
+            encoder = model_data["label_encoders"][feature]
+            if feature == "has_guarantee":
+                values = np.where(columns[feature] == 1, "True_", "False_").astype(object)
+            else:
+                values = np.array([f"{value}_" for value in columns[feature]], dtype=object)
+            values[~np.isin(values, encoder.classes_)] = encoder.classes_[0]
+            frame[feature] = encoder.transform(values)
+        elif feature in columns:
+            frame[feature] = columns[feature]
+        else:
+            frame[feature] = 0.0
+    return model.predict_proba(pd.DataFrame(frame, columns=list(model.feature_names_in_)))[:, 1]
+
+
+def test_compiled_scorer_matches_pipeline():
+    model_data = joblib.load(MODEL_PATH)
+    scorer = CompiledScorer.from_model_data(model_data)
+    encoder = CategoryEncoder.from_label_encoders(model_data["label_encoders"], model_data["cat_cols"])
+    columns = sample_features(model_data, 2000)
+
+    expected = pipeline_probabilities(model_data, columns)
+    batch = scorer.predict_proba_columns(encoder.encode_columns(columns)[0])
+    single = np.array([
+        scorer.predict_proba_record(encoder.encode_record({col: values[i] for col, values in columns.items()}))
+        for i in range(200)
+    ])
+
+    np.testing.assert_allclose(batch, expected, rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(single, expected[:200], rtol=1e-9, atol=1e-12)
+
+
+if __name__ == "__main__":
+    test_compiled_scorer_matches_pipeline()
+    print("Compiled scorer matches model.predict_proba")
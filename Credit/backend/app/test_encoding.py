@@ -0,0 +1,67 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+
+from app.encoding import CategoryEncoder, CategoryTable, UnseenCategoryError
+
+MODEL_PATH = os.path.join(os.path.dirname(__file__), "credit_scoring_model.pkl")
+
+CLASSES = ["Lease_", "Overdraft_", "Term Loan_", "<UNK>"]
+
+
+def test_table_encodes_known_values_for_rows_and_arrays():
+    table = CategoryTable("credit_type", CLASSES, "first_class")
+
+    assert table.encode("Term Loan") == (2, False)
+    codes, unseen = table.encode_array(np.array(["Overdraft", "Lease", "Overdraft"], dtype=object))
+    assert codes.tolist() == [1, 0, 1]
+    assert not unseen.any()
+
+
+@pytest.mark.parametrize("policy, fallback", [("first_class", 0), ("most_frequent", 0), ("missing", 3)])
+def test_unseen_values_use_policy_fallback(policy, fallback):
+    table = CategoryTable("credit_type", CLASSES, policy)
+
+    assert table.encode("Mortgage") == (fallback, True)
+    codes, unseen = table.encode_array(np.array(["Mortgage", "Lease", None], dtype=object))
+    assert codes.tolist() == [fallback, 0, fallback]
+    assert unseen.tolist() == [True, False, True]
+
+
+def test_reject_policy_raises_for_rows_and_reports_batch_rows():
+    encoder = CategoryEncoder({"credit_type": CategoryTable("credit_type", CLASSES, "reject")})
+
+    with pytest.raises(UnseenCategoryError):
+        encoder.encode_record({"credit_type": "Mortgage"})
+
+    encoded, errors = encoder.encode_columns({"credit_type": np.array(["Lease", "Mortgage"], dtype=object)})
+    assert encoded["credit_type"].tolist() == [0, -1]
+    assert list(errors) == [1]
+    assert encoder.unseen_counts() == {"credit_type": 2}
+
+
+def test_tables_are_read_only():
+    table = CategoryTable("credit_type", CLASSES, "first_class")
+
+    with pytest.raises(TypeError):
+        table.codes["Mortgage"] = 9
+
+
+def test_raw_values_encode_to_the_classes_the_model_was_trained_on():
+    model_data = joblib.load(MODEL_PATH)
+    label_encoders = model_data["label_encoders"]
+    encoder = CategoryEncoder.from_label_encoders(label_encoders, model_data["cat_cols"])
+    record = {"industry_sector": "Retail", "credit_type": "Term Loan", "has_guarantee": 1,
+              "guarantee_type": "Collateral", "repayment_frequency": "Monthly"}
+    trained = {"industry_sector": "Retail_", "credit_type": "Term Loan_", "has_guarantee": "True_",
+               "guarantee_type": "Collateral_", "repayment_frequency": "Monthly_"}
+
+    assert encoder.encode_record(record) == {col: label_encoders[col].transform([trained[col]])[0] for col in record}
+    codes, unseen = encoder.tables["has_guarantee"].encode_array(np.array([0, 1, 1], dtype=object))
+    assert codes.tolist() == label_encoders["has_guarantee"].transform(["False_", "True_", "True_"]).tolist()
+    assert not unseen.any()
+    assert encoder.encode_value("guarantee_type", None) == label_encoders["guarantee_type"].transform(["nan_"])[0]
+    assert encoder.unseen_counts() == {col: 0 for col in model_data["cat_cols"]}
+    assert encoder.tables["credit_type"].known_values() == ["Lease", "Overdraft", "Revolving Credit", "Term Loan"]
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from app import scoring
+from app.explain import LinearExplainer
+from app.test_bulk_score import portfolio
+
+
+@pytest.fixture(scope="module")
+def model():
+    return scoring.current_model()
+
+
+@pytest.fixture(scope="module")
+def explainer(model):
+    return LinearExplainer(model.compiled_scorer, model.classes)
+
+
+@pytest.fixture(scope="module")
+def encoded(model):
+    frame = portfolio(400)
+    columns = {col: frame[col].to_numpy() for col in model.num_cols + model.cat_cols}
+    columns["has_guarantee"] = (frame["has_guarantee"] == "Yes").astype(int).to_numpy()
+    return model.encode_categorical_batch(columns)[0]
+
+
+def test_contributions_add_up_to_the_model_logit(model, explainer, encoded):
+    contributions = explainer.contributions(encoded)
+    baseline_logit = (
+        model.compiled_scorer.intercept
+        + explainer.num_baseline @ explainer.num_weights
+        + explainer.cat_baseline.sum()
+    )
+    probabilities = model.predict_default_probabilities(encoded, len(contributions))
+
+    logit = contributions.sum(axis=1) + baseline_logit
+    np.testing.assert_allclose(1 / (1 + np.exp(-logit)), probabilities, rtol=1e-12)
+
+
+def test_batch_and_single_explanations_agree(explainer, encoded):
+    batch = explainer.explain_columns(encoded)
+
+    for row in range(0, len(batch), 37):
+        record = {col: values[row] for col, values in encoded.items()}
+        assert explainer.explain_record(record) == batch[row]
+
+
+def test_factors_are_the_strongest_contributions(explainer, encoded):
+    contributions = explainer.contributions(encoded)
+    factors = explainer.explain_columns(encoded, top_k=2, min_contribution=0.0)
+
+    for row, item in enumerate(factors):
+        assert len(item["positive"]) == (contributions[row] < 0).sum().clip(max=2)
+        assert len(item["negative"]) == (contributions[row] > 0).sum().clip(max=2)
+
+
+def test_late_payments_are_reported_as_raising_risk(model):
+    features = {col: 0.0 for col in model.num_cols}
+    features.update({"income": 85000.0, "loan_amount": 50000.0, "avg_days_late_current": 120.0,
+                     "num_late_payments_current": 15.0, "unpaid_amount": 90000.0})
+    for col in model.cat_cols:
+        features[col] = model.category_encoder.tables[col].known_values()[0]
+
+    factors = model.key_factors(features)
+
+    assert "High number of late payments" in factors["negative"]
+    assert not set(factors["positive"]) & set(factors["negative"])
+
+
+def test_unrecognized_categories_are_not_reported_as_their_fallback(model, explainer):
+    features = {col: 0.0 for col in model.num_cols}
+    for col in model.cat_cols:
+        features[col] = model.category_encoder.tables[col].known_values()[0]
+    features["guarantee_type"] = "Personal"
+    fallback = explainer.labels[explainer.cat_label_offsets[model.cat_cols.index("guarantee_type")]]
+    every = len(explainer.labels)
+
+    encoded = model.category_encoder.encode_record(features, count_unseen=False)
+    single = explainer.explain_record(encoded, top_k=every, unseen=model.category_encoder.unseen_columns(features))
+    listed = single["positive"] + single["negative"]
+    assert "Guarantee type: unrecognized" in listed and fallback not in listed
+
+    # Row by row for small batches, with arrays for large ones
+    for n_rows in (3, 20):
+        columns = {col: np.full(n_rows, value, dtype=object if col in model.cat_cols else float)
+                   for col, value in features.items()}
+        unseen_masks = {}
+        encoded_columns, _ = model.encode_categorical_batch(columns, unseen_masks)
+        batch = explainer.explain_columns(encoded_columns, n_rows, top_k=every, unseen_masks=unseen_masks)
+        assert batch == [single] * n_rows
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import feature_store, train
+from app.test_train import history
+
+
+@pytest.fixture
+def csv(tmp_path):
+    path = tmp_path / "history.csv"
+    history(3000).to_csv(path, index=False)
+    return str(path)
+
+
+def test_materializes_compact_arrays_once_per_key(csv, tmp_path, monkeypatch):
+    frame = pd.read_csv(csv, keep_default_na=False, na_values=[""])
+    frame.loc[5, "age"] = None
+    frame.to_csv(csv, index=False)
+    frame = frame.dropna()
+    matrix = feature_store.open_store(csv, store_dir=str(tmp_path / "store"), chunk_size=700)
+
+    assert matrix.n_rows == 2999 and matrix.skipped_rows == 1
+    assert matrix.numeric.dtype == np.float32 and matrix.numeric.flags.f_contiguous
+    assert all(codes.dtype == np.int8 for codes in matrix.codes.values()) and matrix.target.dtype == np.int8
+
+    np.testing.assert_array_equal(matrix.numeric[:, 1], frame["income"].to_numpy(dtype=np.float32))
+    np.testing.assert_array_equal(matrix.target, frame["status"])
+    decoded = np.array(matrix.classes["has_guarantee"], dtype=object)[matrix.codes["has_guarantee"]]
+    np.testing.assert_array_equal(decoded, np.where(frame["has_guarantee"] == "Yes", "1", "0"))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("materialized again")
+
+    monkeypatch.setattr(feature_store, "materialize", fail)
+    assert feature_store.open_store(csv, store_dir=str(tmp_path / "store")).key == matrix.key
+    history(3000, seed=1).to_csv(csv, index=False)
+    with pytest.raises(AssertionError):
+        feature_store.open_store(csv, store_dir=str(tmp_path / "store"))
+
+
+def test_frame_is_a_view_of_the_memory_maps(csv, tmp_path):
+    matrix = feature_store.open_store(csv, store_dir=str(tmp_path / "store"))
+    frame = matrix.frame()
+
+    assert list(frame.columns) == train.NUM_COLS + train.CAT_COLS
+    assert np.shares_memory(frame["income"].to_numpy(), matrix.numeric)
+    assert np.shares_memory(frame["credit_type"].to_numpy(), matrix.codes["credit_type"])
+
+
+def test_training_from_the_store_matches_the_file(csv, tmp_path):
+    matrix = feature_store.open_store(csv, store_dir=str(tmp_path / "store"), chunk_size=700)
+    options = dict(epochs=2, chunk_size=700, holdout_every=5, report=lambda message: None)
+
+    from_store = train.train(matrix, **options)
+    from_file = train.train(csv, **options)
+
+    for col in train.CAT_COLS:
+        assert list(from_store["label_encoders"][col].classes_) == list(from_file["label_encoders"][col].classes_)
+    # Same rows, same holdout, same shuffles: only the float32 rounding of the store differs
+    coef = from_store["model"].named_steps["classifier"].coef_
+    np.testing.assert_allclose(coef, from_file["model"].named_steps["classifier"].coef_, rtol=1e-3, atol=1e-4)
+    assert from_store["training"]["history"][-1]["auc"] == pytest.approx(from_file["training"]["history"][-1]["auc"], abs=1e-3)
+
+
+def test_experiments_read_the_store(csv, tmp_path):
+    matrix = feature_store.open_store(csv, store_dir=str(tmp_path / "store"))
+
+    scores = feature_store.mutual_information(matrix)
+    assert set(scores.index) == set(train.NUM_COLS + train.CAT_COLS)
+    assert scores.index[0] in ("num_late_payments_current", "has_guarantee", "income")
+
+    search = feature_store.grid_search(matrix, {"classifier__max_depth": [2, 4]}, cv=2, n_jobs=1)
+    assert search.best_score_ > 0.6
+    assert (tmp_path / "store" / matrix.key / "transformer_cache").exists()
@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.idempotency import (
+    IdempotencyInProgress, IdempotencyKeyReused, IdempotencyManager, MemoryIdempotencyStore, SqlIdempotencyStore,
+    request_fingerprint,
+)
+
+
+class Scorer:
+    """Stands in for an endpoint: counts calls and takes a moment, so duplicates overlap"""
+
+    def __init__(self, delay=0.02, fail=False):
+        self.calls = 0
+        self.delay = delay
+        self.fail = fail
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("scoring failed")
+        return {"creditScore": 700, "call": self.calls}
+
+
+@pytest.fixture
+def sql_store(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'idempotency.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield SqlIdempotencyStore(sessionmaker(bind=engine), ttl=60)
+    engine.dispose()
+
+
+def test_fingerprint_ignores_key_order():
+    assert request_fingerprint({"a": 1, "b": [1, 2]}) == request_fingerprint({"b": [1, 2], "a": 1})
+    assert request_fingerprint({"a": 1}) != request_fingerprint({"a": 2})
+
+
+def test_concurrent_duplicates_share_one_computation():
+    manager = IdempotencyManager(MemoryIdempotencyStore())
+    scorer = Scorer()
+    fingerprint = request_fingerprint({"income": 1})
+
+    async def scenario():
+        first = await asyncio.gather(*(manager.execute("k", fingerprint, scorer) for _ in range(10)))
+        retry = await manager.execute("k", fingerprint, scorer)
+        return first, retry
+
+    first, retry = asyncio.run(scenario())
+
+    assert scorer.calls == 1
+    assert [replayed for _, replayed in first].count(False) == 1
+    assert all(response == {"creditScore": 700, "call": 1} for response, _ in first)
+    assert retry == ({"creditScore": 700, "call": 1}, True)
+    assert manager.coalesced == 9 and manager.executed == 1
+
+
+def test_key_reused_for_another_payload_is_rejected():
+    manager = IdempotencyManager(MemoryIdempotencyStore())
+
+    async def scenario():
+        await manager.execute("k", request_fingerprint({"income": 1}), Scorer(delay=0))
+        await manager.execute("k", request_fingerprint({"income": 2}), Scorer(delay=0))
+
+    with pytest.raises(IdempotencyKeyReused):
+        asyncio.run(scenario())
+
+
+def test_failures_are_shared_but_not_stored():
+    manager = IdempotencyManager(MemoryIdempotencyStore())
+    failing, working = Scorer(fail=True), Scorer()
+
+    async def scenario():
+        results = await asyncio.gather(*(manager.execute("k", "f", failing) for _ in range(3)), return_exceptions=True)
+        retry = await manager.execute("k", "f", working)
+        return results, retry
+
+    results, retry = asyncio.run(scenario())
+
+    assert failing.calls == 1 and all(isinstance(result, RuntimeError) for result in results)
+    assert retry == ({"creditScore": 700, "call": 1}, False)
+
+
+def test_sql_store_coordinates_workers(sql_store):
+    # Two managers sharing one table behave like two worker processes
+    workers = [IdempotencyManager(sql_store, poll_interval=0.01) for _ in range(2)]
+    scorer = Scorer(delay=0.1)
+
+    async def scenario():
+        return await asyncio.gather(*(worker.execute("k", "f", scorer) for worker in workers))
+
+    results = asyncio.run(scenario())
+
+    assert scorer.calls == 1
+    assert sorted(replayed for _, replayed in results) == [False, True]
+    assert results[0][0] == results[1][0]
+    assert sql_store.get("k").response == {"creditScore": 700, "call": 1}
+
+
+def test_sql_store_gives_up_on_a_claim_held_elsewhere(sql_store):
+    assert sql_store.claim("k", "f")
+    manager = IdempotencyManager(sql_store, wait_timeout=0.05, poll_interval=0.01)
+
+    with pytest.raises(IdempotencyInProgress):
+        asyncio.run(manager.execute("k", "f", Scorer()))
+
+    # An abandoned claim is taken over once it is older than the lock timeout
+    sql_store.lock_timeout = sql_store.lock_timeout * 0
+    assert asyncio.run(manager.execute("k", "f", Scorer(delay=0)))[1] is False
+
+
+def test_memory_store_is_bounded():
+    store = MemoryIdempotencyStore(max_keys=10)
+    for i in range(50):
+        assert store.claim(str(i), "f")
+        store.complete(str(i), "f", {"i": i})
+
+    assert store.stats()["size"] == 10
+    assert store.get("49").response == {"i": 49} and store.get("0") is None
@@ -0,0 +1,87 @@
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import metrics
+from app.concurrency import run_inference
+from app.metrics import Histogram, MetricsRegistry, TimingMiddleware, stage
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("latency_seconds", "Latency", (0.1, 1.0), ("path",))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value, "/x")
+
+    lines = histogram.render()
+
+    assert 'latency_seconds_bucket{path="/x",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{path="/x",le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{path="/x",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{path="/x"} 4' in lines
+    assert "# TYPE latency_seconds histogram" in lines
+
+
+def test_histogram_quantiles_use_bucket_edges():
+    histogram = Histogram("score_diff", "Score difference", [1, 5, 10])
+    for value in [0.5, 2, 3, 4, 50]:
+        histogram.observe(value)
+
+    assert histogram.quantile(0.2) == 1
+    assert histogram.quantile(0.5) == 5
+    assert histogram.quantile(1.0) == 50
+    assert histogram.summary()["buckets"] == {"le_1": 1, "le_5": 3, "le_10": 0, "overflow": 1}
+
+    vectorized = Histogram("score_diff", "Score difference", [1, 5, 10])
+    vectorized.observe_array(np.array([0.5, 2, 3, 4, 50]))
+    assert vectorized.summary() == histogram.summary()
+    assert vectorized.render() == histogram.render()
+
+
+def test_label_values_are_escaped_and_collectors_rendered():
+    registry = MetricsRegistry()
+    counter = registry.counter("events_total", "Events", ("name",))
+    counter.inc('say "hi"\n')
+    registry.add_collector(lambda: [("queue_depth", "gauge", "Depth", [({}, 3)])])
+
+    text = registry.render()
+
+    assert 'events_total{name="say \\"hi\\"\\n"} 1' in text
+    assert "# TYPE queue_depth gauge\nqueue_depth 3\n" in text
+
+
+def test_middleware_times_stages_including_executor_work():
+    app = FastAPI()
+    app.add_middleware(TimingMiddleware)
+
+    def work():
+        with stage("inside_executor"):
+            return 42
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        with stage("lookup"):
+            pass
+        return {"value": await run_inference(work)}
+
+    before = metrics.http_requests.value("GET", "/items/{item_id}", "200")
+    with TestClient(app) as client:
+        response = client.get("/items/7")
+        client.get("/missing")
+
+    timing = response.headers["server-timing"]
+    assert [part.split(";")[0] for part in timing.split(", ")] == ["lookup", "inside_executor", "total"]
+    assert metrics.http_requests.value("GET", "/items/{item_id}", "200") == before + 1
+    assert metrics.http_requests.value("GET", "unmatched", "404") >= 1
+    assert metrics.stage_duration.count("/items/{item_id}", "inside_executor") >= 1
+
+
+def test_server_timing_header_can_be_disabled():
+    app = FastAPI()
+    app.add_middleware(TimingMiddleware, server_timing=False)
+
+    @app.get("/")
+    async def root():
+        return {}
+
+    with TestClient(app) as client:
+        assert "server-timing" not in client.get("/").headers
@@ -0,0 +1,65 @@
+from sqlalchemy import create_engine, inspect, text
+
+from app import archive, models
+from app.migrate import migrate
+
+# The predictions table as create_all made it before the pagination indexes and AUTOINCREMENT
+LEGACY_SCHEMA = [
+    "CREATE TABLE users (id INTEGER NOT NULL PRIMARY KEY, username VARCHAR, email VARCHAR, hashed_password VARCHAR)",
+    """CREATE TABLE predictions (
+        id INTEGER NOT NULL PRIMARY KEY, client_name VARCHAR, credit_score INTEGER, risk_level VARCHAR,
+        decision VARCHAR, timestamp DATETIME, income FLOAT, loan_amount FLOAT, interest_rate FLOAT,
+        employment VARCHAR, loan_purpose VARCHAR, user_id INTEGER REFERENCES users (id)
+    )""",
+    "CREATE INDEX ix_predictions_id ON predictions (id)",
+    "CREATE INDEX ix_predictions_client_name ON predictions (client_name)",
+]
+
+
+def test_legacy_predictions_table_is_upgraded_in_place(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.exec_driver_sql(statement)
+        for i in range(1, 6):
+            conn.exec_driver_sql(
+                "INSERT INTO predictions (id, client_name, credit_score, timestamp, user_id) "
+                "VALUES (?, ?, 600, '2025-03-01 00:00:00', 1)", (i, f"client-{i}")
+            )
+    prediction_archive = archive.PredictionArchive(str(tmp_path / "archive"))
+    prediction_archive.publish({
+        "format": archive.FORMAT_VERSION, "watermark": "2025-02-01T00:00:00",
+        "files": [{"path": "day=2025-01-31/part-40-50.parquet", "day": "2025-01-31", "rows": 11,
+                   "min_id": 40, "max_id": 50, "bytes": 0, "purged": True}],
+    })
+
+    migrate(engine, prediction_archive)
+    migrate(engine, prediction_archive)
+
+    indexes = {index["name"] for index in inspect(engine).get_indexes("predictions")}
+    assert {index.name for index in models.Prediction.__table__.indexes} <= indexes
+    with engine.begin() as conn:
+        ddl = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'predictions'")).scalar()
+        assert "AUTOINCREMENT" in ddl
+        assert conn.execute(text("SELECT id, client_name FROM predictions ORDER BY id")).all() == [
+            (i, f"client-{i}") for i in range(1, 6)
+        ]
+        assert conn.execute(text("SELECT name FROM sqlite_master WHERE name = 'predictions_legacy'")).all() == []
+
+        # New ids continue after the archive, even once the table is emptied
+        conn.execute(text("DELETE FROM predictions"))
+        conn.execute(text("INSERT INTO predictions (client_name) VALUES ('new')"))
+        assert conn.execute(text("SELECT id FROM predictions")).scalar() == 51
+    engine.dispose()
+
+
+def test_missing_indexes_are_added_to_existing_tables(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    migrate(engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_predictions_user_credit_score_id")
+
+    migrate(engine)
+
+    assert "ix_predictions_user_credit_score_id" in {index["name"] for index in inspect(engine).get_indexes("predictions")}
+    engine.dispose()
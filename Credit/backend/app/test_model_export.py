@@ -0,0 +1,48 @@
+import joblib
+import numpy as np
+import pytest
+
+from app.model_export import export_model, load_exported
+from app.model_registry import ModelRegistry
+from app.scoring import MODEL_PATH, ScoringModel
+from app.test_bulk_score import portfolio
+
+
+@pytest.fixture(scope="module")
+def pickled():
+    return ScoringModel(joblib.load(MODEL_PATH), "pickled")
+
+
+def test_exported_model_scores_like_the_pickle(tmp_path, pickled):
+    path = str(tmp_path / "1.0.npz")
+    export_model(joblib.load(MODEL_PATH), path)
+    exported = ScoringModel.load(path, "exported")
+
+    assert exported.model is None
+    assert exported.classes == pickled.classes
+    assert exported.num_cols == pickled.num_cols
+
+    frame = portfolio(500)
+    columns = {col: frame[col].to_numpy() for col in pickled.num_cols + pickled.cat_cols}
+    expected = pickled.predict_default_probabilities(pickled.encode_categorical_batch(columns)[0], len(frame))
+    actual = exported.predict_default_probabilities(exported.encode_categorical_batch(columns)[0], len(frame))
+    np.testing.assert_allclose(actual, expected, rtol=1e-12)
+
+    record = {col: frame[col].iloc[0] for col in columns}
+    assert exported.predict_default_probability(record) == pytest.approx(pickled.predict_default_probability(record))
+
+
+def test_registry_prefers_the_exported_artifact(tmp_path):
+    joblib.dump(joblib.load(MODEL_PATH), tmp_path / "2.pkl")
+    export_model(joblib.load(MODEL_PATH), str(tmp_path / "2.npz"))
+    registry = ModelRegistry(ScoringModel.load, directory=str(tmp_path))
+    registry.load()
+
+    assert registry.active.path.endswith("2.npz")
+
+
+def test_other_npz_files_are_rejected(tmp_path):
+    np.savez(tmp_path / "weights.npz", coef=np.zeros(3))
+
+    with pytest.raises(ValueError):
+        load_exported(str(tmp_path / "weights.npz"))
@@ -0,0 +1,109 @@
+import os
+import shutil
+
+import pytest
+
+from app.model_registry import PIN_FILE, ModelRegistry, version_key
+from app.scoring import MODEL_PATH, ScoringModel
+
+
+class FakeModel:
+    def __init__(self, path, version):
+        self.path = path
+        self.version = version
+
+
+class CountingLoader:
+    def __init__(self):
+        self.loaded = []
+
+    def __call__(self, path, version):
+        with open(path) as f:
+            if f.read() == "broken":
+                raise ValueError("corrupt artifact")
+        self.loaded.append(version)
+        return FakeModel(path, version)
+
+
+def write_artifact(directory, version, content="ok"):
+    with open(os.path.join(directory, f"{version}.pkl"), "w") as f:
+        f.write(content)
+
+
+def test_version_key_sorts_naturally():
+    assert sorted(["1.10", "1.9", "v2", "1.2"], key=version_key) == ["1.2", "1.9", "1.10", "v2"]
+
+
+def test_new_version_is_swapped_in_and_previous_kept(tmp_path):
+    loader = CountingLoader()
+    write_artifact(tmp_path, "1.9")
+    registry = ModelRegistry(loader, directory=str(tmp_path))
+    registry.load()
+    assert registry.active.version == "1.9"
+
+    assert registry.poll() is False
+    write_artifact(tmp_path, "1.10")
+    assert registry.poll() is True
+
+    assert registry.active.version == "1.10"
+    assert registry.previous.version == "1.9"
+    assert registry.stats()["swaps"] == 1
+
+
+def test_broken_artifact_keeps_serving_and_is_not_retried(tmp_path):
+    loader = CountingLoader()
+    write_artifact(tmp_path, "1")
+    registry = ModelRegistry(loader, directory=str(tmp_path))
+    registry.load()
+
+    write_artifact(tmp_path, "2", "broken")
+    assert registry.poll() is False
+    assert registry.poll() is False
+
+    assert registry.active.version == "1"
+    assert loader.loaded == ["1"]
+    assert registry.stats()["last_error"].startswith("2:")
+
+
+def test_pinning_or_removing_the_new_version_rolls_back_without_reloading(tmp_path):
+    loader = CountingLoader()
+    write_artifact(tmp_path, "1")
+    registry = ModelRegistry(loader, directory=str(tmp_path))
+    registry.load()
+    write_artifact(tmp_path, "2")
+    registry.poll()
+
+    with open(tmp_path / PIN_FILE, "w") as f:
+        f.write("1\n")
+    assert registry.poll() is True
+    assert registry.active.version == "1"
+
+    os.remove(tmp_path / PIN_FILE)
+    registry.poll()
+    assert registry.active.version == "2"
+
+    os.remove(tmp_path / "2.pkl")
+    registry.poll()
+    assert registry.active.version == "1"
+    assert loader.loaded == ["1", "2"]
+
+
+def test_rollback_without_previous_version_raises(tmp_path):
+    write_artifact(tmp_path, "1")
+    registry = ModelRegistry(CountingLoader(), directory=str(tmp_path))
+    registry.load()
+
+    with pytest.raises(RuntimeError):
+        registry.rollback()
+
+
+def test_real_artifact_is_loaded_and_warmed_under_its_version(tmp_path):
+    shutil.copy(MODEL_PATH, tmp_path / "2024.06.pkl")
+    registry = ModelRegistry(ScoringModel.load, directory=str(tmp_path))
+    registry.load()
+
+    scoring_model = registry.active
+    assert isinstance(scoring_model, ScoringModel)
+    assert scoring_model.version == "2024.06"
+    features = {col: 1.0 for col in scoring_model.num_cols}
+    assert 0.0 <= scoring_model.predict_default_probability(features) <= 1.0
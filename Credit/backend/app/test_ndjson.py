@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import main, models, ndjson
+from app.database import Base
+
+APPLICATION = {
+    "client_name": "Stream Test",
+    "age": 35,
+    "income": 60000,
+    "employment": "employed",
+    "loanAmount": 20000,
+    "loanPurpose": "business",
+    "location": "urban",
+    "phoneUsage": "moderate",
+    "utilityPayments": "good",
+    "interestRate": 7.5,
+    "turnover": 2500000,
+    "customerTenure": 12,
+    "avgDaysLateCurrent": 3,
+    "numLatePaymentsCurrent": 1,
+    "unpaidAmount": 0,
+    "industrySector": "Retail",
+    "creditType": "Term Loan",
+    "hasGuarantee": "yes",
+    "guaranteeType": "Collateral",
+    "repaymentFrequency": "Monthly",
+}
+
+
+def collect(chunks, batch_size=3, max_line_bytes=64):
+    async def body():
+        for chunk in chunks:
+            yield chunk
+
+    async def scenario():
+        return [batch async for batch in ndjson.iter_batches(body(), batch_size, max_line_bytes)]
+
+    return asyncio.run(scenario())
+
+
+def test_lines_are_reassembled_across_chunk_boundaries():
+    data = b'{"a": 1}\n\n{"a": 2}\r\n[3]\n  \n{"a": 4}'
+    # Every split point, including mid-line and mid-newline
+    for cut in range(len(data)):
+        batches = collect([data[:cut], data[cut:]])
+        assert [len(batch) for batch in batches] == [3, 1]
+        assert [value for batch in batches for value, _ in batch] == [{"a": 1}, {"a": 2}, [3], {"a": 4}]
+
+
+def test_bad_and_oversized_lines_are_reported_inline():
+    long_value = "x" * 100
+    chunks = [b'{"a": 1}\nnot json\n{"a": "', long_value[:50].encode(), long_value[50:].encode(), b'"}\n{"a": 2}\n']
+    lines = [line for batch in collect(chunks, batch_size=10) for line in batch]
+
+    assert lines[0] == ({"a": 1}, None)
+    assert lines[1][0] is None and lines[1][1].startswith("Invalid JSON")
+    assert lines[2] == (None, "Line exceeds 64 bytes")
+    assert lines[3] == ({"a": 2}, None)
+    assert len(lines) == 4
+    # An unterminated oversized last line is still reported once
+    assert collect([b"1\n", b"2" * 100]) == [[(1, None), (None, "Line exceeds 64 bytes")]]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'stream.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(main, "SessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr(main, "STREAM_CHUNK_ROWS", 4)
+    yield TestClient(main.app)
+    engine.dispose()
+
+
+def test_stream_scores_every_line_in_order_and_reports_errors_inline(client):
+    rows = [APPLICATION] * 5 + ["oops"] + [{**APPLICATION, "age": 12}] + [APPLICATION] * 3
+    body = "\n".join(json.dumps(row) for row in rows).encode()
+    body = body.replace(b'"oops"', b"{broken")
+
+    response = client.post("/predict/stream", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    results, summary = lines[:-1], lines[-1]["summary"]
+
+    assert [line["index"] for line in results] == list(range(10))
+    assert results[5]["error"].startswith("Invalid JSON")
+    assert results[6]["error"].startswith("age")
+    scored = [line for line in results if "result" in line]
+    assert len(scored) == 8 and all(line["result"]["client"] == "Stream Test" for line in scored)
+    assert summary == {"total": 10, "succeeded": 8, "failed": 2}
+
+    # Every scored line is recorded, across chunks
+    with main.SessionLocal() as db:
+        rows = db.query(models.Prediction).order_by(models.Prediction.id).all()
+    assert [(row.client_name, row.credit_score, row.risk_level, row.decision) for row in rows] == [
+        (line["result"]["client"], line["result"]["creditScore"], line["result"]["riskLevel"], line["result"]["decision"])
+        for line in scored
+    ]
+
+    # The same applications score identically through /predict/batch
+    batch = client.post("/predict/batch", json=[APPLICATION]).json()
+    assert batch["results"][0]["result"]["creditScore"] == scored[0]["result"]["creditScore"]
+
+
+def test_empty_stream_returns_only_the_summary(client):
+    response = client.post("/predict/stream", content=b"\n\n")
+    assert response.json() == {"summary": {"total": 0, "succeeded": 0, "failed": 0}}
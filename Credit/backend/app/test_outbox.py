@@ -0,0 +1,211 @@
+import asyncio
+import socket
+import socketserver
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, outbox, schemas
+from app.database import Base
+from app.email_utils import SmtpMailer
+
+
+class SmtpStandIn(socketserver.ThreadingTCPServer):
+    """
+    Minimal local SMTP server: EHLO, AUTH PLAIN, MAIL, RCPT, DATA, RSET, QUIT
+
+    Recipients listed in reject get a 550 and those in defer a 451. Records
+    every connection, login and accepted message.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SmtpHandler)
+        self.port = self.server_address[1]
+        self.messages = []
+        self.connections = 0
+        self.logins = 0
+        self.reject = set()
+        self.defer = set()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+    def mailer(self, **kwargs):
+        return SmtpMailer(
+            host="127.0.0.1", port=self.port, username="app", password="secret", sender="noreply@example.com",
+            starttls=False, login=True, timeout=5, **kwargs,
+        )
+
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply("220 localhost ready")
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode().rstrip("\r\n")
+            if not line:
+                return
+            command = line.split(" ", 1)[0].upper()
+            if command == "EHLO":
+                self.reply("250-localhost")
+                self.reply("250 AUTH PLAIN")
+            elif command == "AUTH":
+                server.logins += 1
+                self.reply("235 2.7.0 Authentication successful")
+            elif command == "MAIL":
+                recipients = []
+                self.reply("250 OK")
+            elif command == "RCPT":
+                address = line.split(":", 1)[1].strip("<> ")
+                if address in server.reject:
+                    self.reply("550 5.1.1 No such user")
+                elif address in server.defer:
+                    self.reply("451 4.3.0 Try again later")
+                else:
+                    recipients.append(address)
+                    self.reply("250 OK")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while (data := self.rfile.readline()) not in (b".\r\n", b""):
+                    lines.append(data)
+                server.messages.append((recipients, b"".join(lines).decode()))
+                self.reply("250 OK queued")
+            elif command in ("RSET", "NOOP"):
+                recipients = []
+                self.reply("250 OK")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'outbox.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def enqueue(session_factory, *recipients):
+    with session_factory() as db:
+        for recipient in recipients:
+            outbox.enqueue_email(db, recipient, "Hello", f"Hi {recipient}")
+        db.commit()
+
+
+def statuses(session_factory):
+    with session_factory() as db:
+        T = models.OutboxEmail
+        return {row.recipient: (row.status, row.attempts) for row in db.execute(select(T)).scalars()}
+
+
+def test_batch_is_sent_over_one_authenticated_connection(session_factory):
+    recipients = [f"user{i}@example.com" for i in range(25)]
+    enqueue(session_factory, *recipients)
+
+    with SmtpStandIn() as smtp:
+        worker = outbox.EmailOutbox(session_factory, smtp.mailer, batch_size=10)
+        while worker.process_batch():
+            pass
+        worker.mailer.close()
+
+    assert sorted(rcpt[0] for rcpt, _ in smtp.messages) == sorted(recipients)
+    assert "Subject: Hello" in smtp.messages[0][1]
+    assert smtp.connections == 1 and smtp.logins == 1
+    assert set(statuses(session_factory).values()) == {(outbox.SENT, 1)}
+    assert worker.stats()["sent"] == 25 and worker.batches == 3 and worker.stats()["send_rate_per_second"] > 0
+
+
+def test_refusals_are_retried_or_dead_lettered(session_factory):
+    enqueue(session_factory, "ok@example.com", "gone@example.com", "busy@example.com", "ok2@example.com")
+
+    with SmtpStandIn() as smtp:
+        smtp.reject.add("gone@example.com")
+        smtp.defer.add("busy@example.com")
+        worker = outbox.EmailOutbox(session_factory, smtp.mailer, max_attempts=2, backoff=0.01, max_backoff=0.01)
+        worker.process_batch()
+        assert statuses(session_factory) == {
+            "ok@example.com": (outbox.SENT, 1),
+            "gone@example.com": (outbox.DEAD, 1),
+            "busy@example.com": (outbox.PENDING, 1),
+            "ok2@example.com": (outbox.SENT, 1),
+        }
+
+        time.sleep(0.02)
+        worker.process_batch()
+        assert statuses(session_factory)["busy@example.com"] == (outbox.DEAD, 2)
+
+        smtp.defer.clear()
+        with session_factory() as db:
+            assert outbox.requeue_dead(db) == 2
+        smtp.reject.clear()
+        worker.process_batch()
+        worker.mailer.close()
+
+    # Requeued dead letters start a fresh attempt budget
+    assert set(statuses(session_factory).values()) == {(outbox.SENT, 1)}
+    # One connection throughout: refusals reset the transaction rather than the connection
+    assert smtp.connections == 1
+
+
+def test_unreachable_server_delays_the_batch_without_spending_attempts(session_factory):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    enqueue(session_factory, "a@example.com", "b@example.com", "c@example.com")
+
+    def unreachable():
+        return SmtpMailer(host="127.0.0.1", port=port, starttls=False, login=False, timeout=1)
+
+    worker = outbox.EmailOutbox(session_factory, unreachable, backoff=60)
+    assert worker.process_batch() == 3
+
+    assert sorted(statuses(session_factory).values()) == [(outbox.PENDING, 0), (outbox.PENDING, 0), (outbox.PENDING, 1)]
+    # Nothing is due before the backoff elapses
+    assert worker.process_batch() == 0
+
+
+def test_registration_enqueues_and_the_worker_delivers(session_factory):
+    with session_factory() as db:
+        user = schemas.UserCreate(email="new@example.com", username="new", password="pw")
+        crud.create_user(db, user, hashed_password="hash", welcome_email=True)
+
+    assert statuses(session_factory) == {"new@example.com": (outbox.PENDING, 0)}
+
+    with SmtpStandIn() as smtp:
+        worker = outbox.EmailOutbox(session_factory, smtp.mailer, poll_interval=10)
+
+        async def scenario():
+            await worker.start()
+            worker.notify()
+            for _ in range(200):
+                if smtp.messages:
+                    break
+                await asyncio.sleep(0.01)
+            await worker.stop()
+
+        asyncio.run(scenario())
+
+    assert "Hi new" in smtp.messages[0][1]
+    assert statuses(session_factory) == {"new@example.com": (outbox.SENT, 1)}
+    assert worker.stats()["queue"] == {"pending": 0, "sending": 0, "dead": 0, "oldest_pending_seconds": 0.0}
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models
+from app.database import Base
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'history.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    start = datetime(2025, 1, 1)
+    rows = [
+        {
+            "client_name": f"client-{i}",
+            # Repeated timestamps and scores make the id tie-breaker matter
+            "timestamp": start + timedelta(minutes=i // 3),
+            "credit_score": 300 + (i * 7) % 50,
+            "risk_level": "Very High",
+            "decision": "Declined",
+            "user_id": 1 if i % 4 else 2,
+        }
+        for i in range(250)
+    ]
+    crud.insert_prediction_rows(session, rows)
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.mark.parametrize("order_by", ["timestamp", "credit_score"])
+@pytest.mark.parametrize("order_direction", ["asc", "desc"])
+def test_keyset_pages_cover_history_in_order(db, order_by, order_direction):
+    expected = crud.get_predictions(db, user_id=1, limit=1000, order_by=order_by, order_direction=order_direction)
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = crud.get_predictions_page(
+            db, user_id=1, limit=17, order_by=order_by, order_direction=order_direction, cursor=cursor
+        )
+        seen.extend(prediction.id for prediction in page)
+        if cursor is None:
+            break
+
+    assert seen == [prediction.id for prediction in expected]
+
+
+def test_invalid_cursors_and_columns_are_rejected(db):
+    _, cursor = crud.get_predictions_page(db, user_id=1, limit=5)
+
+    with pytest.raises(ValueError):
+        crud.get_predictions_page(db, user_id=1, cursor="not-a-cursor")
+    with pytest.raises(ValueError):
+        crud.get_predictions_page(db, user_id=1, order_by="credit_score", cursor=cursor)
+    with pytest.raises(ValueError):
+        crud.get_predictions_page(db, user_id=1, order_by="hashed_password")
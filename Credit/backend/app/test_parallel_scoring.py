@@ -0,0 +1,42 @@
+import pandas as pd
+
+from app import bulk_score, parallel_scoring
+from app.test_bulk_score import expected_scores, portfolio
+
+
+def test_pool_results_match_serial_scoring_in_input_order():
+    frame = portfolio(500, seed=3)
+    frame["age"] = frame["age"].astype(object)
+    frame.loc[42, "age"] = "unknown"
+
+    serial = parallel_scoring.score_frame(frame, workers=1, chunk_size=500)
+    pooled = parallel_scoring.score_frame(frame, workers=3, chunk_size=37)
+
+    pd.testing.assert_frame_equal(pooled, serial)
+    assert list(pooled["row"]) == list(range(500))
+    assert pooled.loc[42, "error"].startswith("age")
+    assert list(pooled.drop(index=42)["credit_score"]) == expected_scores(frame.drop(index=42))
+
+
+def test_imap_bounds_work_in_flight_and_keeps_order():
+    with parallel_scoring.ParallelScorer(workers=2, max_in_flight=3) as scorer:
+        results = list(scorer.imap(pow, ((i, 2) for i in range(20))))
+
+    assert results == [i ** 2 for i in range(20)]
+
+
+def test_empty_frame_returns_empty_result():
+    result = parallel_scoring.score_frame(portfolio(0), workers=2)
+
+    assert result.empty
+    assert list(result.columns) == bulk_score.OUTPUT_COLUMNS
+
+
+def test_score_file_with_workers_matches_single_process(tmp_path):
+    portfolio(230, seed=5).to_csv(tmp_path / "in.csv", index=False)
+
+    bulk_score.score_file(str(tmp_path / "in.csv"), str(tmp_path / "serial.csv"), chunk_size=40)
+    summary = bulk_score.score_file(str(tmp_path / "in.csv"), str(tmp_path / "pooled.csv"), chunk_size=40, workers=3)
+
+    assert summary["chunks"] == 6
+    assert (tmp_path / "pooled.csv").read_bytes() == (tmp_path / "serial.csv").read_bytes()
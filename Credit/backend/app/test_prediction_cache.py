@@ -0,0 +1,61 @@
+import time
+
+from app.model_registry import ModelRegistry
+from app.prediction_cache import PredictionCache, feature_digest
+from app.test_model_registry import CountingLoader, write_artifact
+
+FEATURES = {"age": 40.0, "income": 52000.0, "credit_type": "Term Loan", "has_guarantee": 1}
+
+
+def test_digest_ignores_field_order_but_not_values():
+    reordered = dict(reversed(list(FEATURES.items())))
+
+    assert feature_digest(reordered) == feature_digest(FEATURES)
+    assert feature_digest({**FEATURES, "income": 52000.5}) != feature_digest(FEATURES)
+    assert feature_digest({**FEATURES, "has_guarantee": 0}) != feature_digest(FEATURES)
+
+
+def test_entries_are_per_version_and_counted():
+    cache = PredictionCache(max_size=10, ttl=60)
+    cache.set(cache.key("1", FEATURES), 0.25)
+
+    assert cache.get(cache.key("1", dict(FEATURES))) == 0.25
+    assert cache.get(cache.key("2", FEATURES)) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_size_and_ttl_bound_the_cache():
+    cache = PredictionCache(max_size=2, ttl=0.05)
+    for i in range(3):
+        cache.set(cache.key("1", {**FEATURES, "age": float(i)}), 0.1)
+
+    assert cache.stats()["size"] == 2 and cache.stats()["evictions"] == 1
+    time.sleep(0.06)
+    assert cache.get(cache.key("1", {**FEATURES, "age": 2.0})) is None
+
+
+def test_swapping_models_drops_other_versions(tmp_path):
+    cache = PredictionCache(max_size=10, ttl=60)
+    write_artifact(tmp_path, "1")
+    registry = ModelRegistry(CountingLoader(), directory=str(tmp_path))
+    registry.add_listener(lambda model: cache.invalidate_others(model.version))
+    registry.load()
+    cache.set(cache.key("1", FEATURES), 0.25)
+
+    write_artifact(tmp_path, "2")
+    registry.poll()
+    cache.set(cache.key("2", FEATURES), 0.75)
+
+    assert cache.get(cache.key("1", FEATURES)) is None
+    assert cache.get(cache.key("2", FEATURES)) == 0.75
+    assert cache.stats()["invalidated"] == 1
+    assert cache.invalidate_version("2") == 1
+
+
+def test_zero_size_disables_the_cache():
+    cache = PredictionCache(max_size=0)
+    cache.set(cache.key("1", FEATURES), 0.25)
+
+    assert cache.get(cache.key("1", FEATURES)) is None
+    assert cache.stats() == {"enabled": False}
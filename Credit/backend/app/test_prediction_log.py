@@ -0,0 +1,106 @@
+import asyncio
+import threading
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.database import Base
+from app.prediction_log import PredictionLogFull, PredictionWriter
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'predictions.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def prediction_row(i):
+    return {
+        "client_name": f"client-{i}",
+        "credit_score": 600 + i % 200,
+        "risk_level": "Low",
+        "decision": "Approved",
+        "income": 50000.0,
+        "loan_amount": 10000.0,
+        "interest_rate": 5.0,
+        "employment": "employed",
+        "loan_purpose": "business",
+        "user_id": None,
+        "timestamp": datetime.utcnow(),
+    }
+
+
+def test_rows_are_flushed_in_batches_and_on_stop(session_factory):
+    async def scenario():
+        writer = PredictionWriter(session_factory, batch_size=50, max_age=0.05)
+        await writer.start()
+        for i in range(120):
+            await writer.enqueue(prediction_row(i))
+        await asyncio.sleep(0.2)
+        flushed_while_running = writer.flushed
+        for i in range(120, 130):
+            await writer.enqueue(prediction_row(i))
+        await writer.stop()
+        return writer, flushed_while_running
+
+    writer, flushed_while_running = asyncio.run(scenario())
+
+    assert flushed_while_running == 120
+    assert writer.stats()["flushed"] == 130
+    assert writer.stats()["batches"] >= 3
+    db = session_factory()
+    assert db.query(models.Prediction).count() == 130
+    db.close()
+
+
+def test_full_queue_applies_backpressure(session_factory):
+    release = threading.Event()
+
+    def blocking_factory():
+        release.wait(5)
+        return session_factory()
+
+    async def scenario():
+        writer = PredictionWriter(blocking_factory, batch_size=1, max_age=0.01, max_queue=2, enqueue_timeout=0.05)
+        await writer.start()
+        with pytest.raises(PredictionLogFull):
+            for i in range(10):
+                await writer.enqueue(prediction_row(i))
+        release.set()
+        await writer.stop()
+        return writer
+
+    writer = asyncio.run(scenario())
+
+    assert writer.stats()["rejected"] == 1
+    assert writer.stats()["flushed"] == writer.stats()["enqueued"]
+
+
+def test_async_session_factory_writes_natively(tmp_path):
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    url = tmp_path / "predictions.db"
+    sync_engine = create_engine(f"sqlite:///{url}")
+    Base.metadata.create_all(bind=sync_engine)
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{url}")
+        writer = PredictionWriter(async_sessionmaker(bind=engine), is_async=True, batch_size=10, max_age=0.01)
+        await writer.start()
+        for i in range(25):
+            await writer.enqueue(prediction_row(i))
+        await writer.stop()
+        await engine.dispose()
+        return writer
+
+    writer = asyncio.run(scenario())
+
+    assert writer.stats()["flushed"] == 25
+    db = sessionmaker(bind=sync_engine)()
+    assert db.query(models.Prediction).count() == 25
+    db.close()
@@ -0,0 +1,17 @@
+import warnings
+
+import numpy as np
+
+from app.scoring import calculate_credit_score, calculate_credit_scores
+
+
+def test_scalar_and_batch_scores_agree_quietly_at_the_extremes():
+    probabilities = np.concatenate([[0.0, 1e-12, 0.5, 1 - 1e-12, 1.0], np.linspace(0, 1, 1001)])
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        batch = calculate_credit_scores(probabilities)
+        single = [calculate_credit_score(p) for p in probabilities]
+
+    assert batch.tolist() == single
+    assert single[4] == 300
@@ -0,0 +1,96 @@
+import asyncio
+import threading
+
+import numpy as np
+
+from app.scoring import current_model
+from app.shadow import ComparisonStats, ShadowScorer
+
+
+class FixedChallenger:
+    """Challenger that predicts the same default probability for every application"""
+
+    def __init__(self, version, probability):
+        self.version = version
+        self.probability = probability
+
+    def predict_default_probability(self, features):
+        return self.probability
+
+    def encode_categorical_batch(self, columns):
+        return dict(columns), {}
+
+    def predict_default_probabilities(self, encoded, n_rows):
+        return np.full(n_rows, self.probability)
+
+
+def test_small_and_vectorized_comparisons_agree():
+    rng = np.random.default_rng(0)
+    champion = rng.integers(300, 851, 200)
+    challenger = np.clip(champion + rng.integers(-120, 120, 200), 300, 850)
+
+    vectorized = ComparisonStats()
+    vectorized.record(champion, challenger, 1.0)
+    one_by_one = ComparisonStats()
+    for i in range(200):
+        one_by_one.record(champion[i:i + 1], challenger[i:i + 1], 1.0)
+
+    summary, expected = vectorized.summary(), one_by_one.summary()
+    for key in ("rows", "mean_abs_score_diff", "max_abs_score_diff", "decision_flips", "flips"):
+        assert summary[key] == expected[key]
+    assert summary["score_diff"]["buckets"] == expected["score_diff"]["buckets"]
+    assert summary["decision_flips"] > 0
+
+
+def test_requests_are_compared_off_the_request_path():
+    champion = current_model()
+    features = {col: 1.0 for col in champion.num_cols}
+    columns = {col: np.ones(3) for col in champion.num_cols}
+
+    async def scenario():
+        scorer = ShadowScorer([FixedChallenger("safe", 0.01), FixedChallenger("risky", 0.99)])
+        await scorer.start()
+        assert scorer.submit("1.0", np.array([700]), 0.001, features=features)
+        # Batch paths submit from executor threads
+        thread = threading.Thread(
+            target=scorer.submit, args=("1.0", np.array([500, 600, 700]), 0.002), kwargs={"columns": columns}
+        )
+        thread.start()
+        thread.join()
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if scorer.pending_rows == 0 and scorer.submitted == 2:
+                break
+        await scorer.stop()
+        return scorer.stats()
+
+    stats = asyncio.run(scenario())
+
+    comparisons = {item["challenger"]: item for item in stats["comparisons"]}
+    assert stats["submitted"] == 2 and stats["failed"] == 0
+    assert comparisons["safe"]["rows"] == 4
+    assert comparisons["risky"]["flips"] == {"Approved -> Declined": 2, "Approved with conditions -> Declined": 1}
+    assert comparisons["risky"]["challenger_ms"]["count"] == 2
+    assert stats["champion_ms"]["1.0"]["count"] == 2
+
+
+def test_full_queue_drops_instead_of_waiting():
+    async def scenario():
+        scorer = ShadowScorer([FixedChallenger("c", 0.5)], max_pending_rows=5)
+        await scorer.start()
+        accepted = [scorer.submit("1.0", np.zeros(2), 0.0, columns={"income": np.zeros(2)}) for _ in range(4)]
+        await scorer.stop()
+        return scorer, accepted
+
+    scorer, accepted = asyncio.run(scenario())
+
+    assert accepted == [True, True, False, False]
+    assert scorer.dropped == 2
+
+
+def test_disabled_scorer_ignores_submissions():
+    scorer = ShadowScorer([])
+    asyncio.run(scorer.start())
+
+    assert scorer.enabled is False
+    assert scorer.submit("1.0", np.array([700]), 0.0, features={}) is False
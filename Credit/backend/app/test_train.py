@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app import train
+from app.scoring import ScoringModel
+
+
+def history(n_rows, seed=0):
+    """Loans whose default odds follow a known logistic relation, in the notebook's columns"""
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        "age": rng.integers(19, 80, n_rows),
+        "income": rng.uniform(1_000, 300_000, n_rows),
+        "loan_amount": rng.uniform(500, 200_000, n_rows),
+        "interest_rate": rng.uniform(0.5, 30, n_rows),
+        "turnover": rng.uniform(1_000, 6_000_000, n_rows),
+        "customer_tenure": rng.integers(0, 60, n_rows),
+        "avg_days_late_current": rng.integers(0, 30, n_rows),
+        "num_late_payments_current": rng.integers(0, 6, n_rows),
+        "unpaid_amount": rng.uniform(0, 60_000, n_rows),
+        "industry_sector": rng.choice(["Retail", "Agriculture", "Services"], n_rows),
+        "credit_type": rng.choice(["Investment", "Working capital"], n_rows),
+        "has_guarantee": rng.choice(["Yes", "No"], n_rows),
+        "guarantee_type": rng.choice(["Mortgage", "Collateral", "None"], n_rows),
+        "repayment_frequency": rng.choice(["Monthly", "Quarterly"], n_rows),
+    })
+    logit = (
+        -2.0 + 0.5 * frame["num_late_payments_current"] - frame["income"] / 100_000
+        + 1.5 * (frame["has_guarantee"] == "No") + 0.8 * (frame["industry_sector"] == "Retail")
+    )
+    frame["status"] = (rng.random(n_rows) < 1 / (1 + np.exp(-logit))).astype(int)
+    return frame
+
+
+@pytest.fixture(scope="module")
+def trained(tmp_path_factory):
+    path = tmp_path_factory.mktemp("train") / "history.csv"
+    frame = history(6000)
+    frame.loc[3, "income"] = None
+    frame.to_csv(path, index=False)
+    return train.train(str(path), epochs=3, chunk_size=1000, holdout_every=5, report=lambda message: None)
+
+
+def test_learns_the_relation_from_chunks(trained):
+    summary = trained["training"]
+    assert summary["train_rows"] + summary["holdout_rows"] == 5999 and summary["skipped_rows"] == 1
+    assert summary["history"][-1]["auc"] > 0.75
+    assert all(entry["peak_memory_mb"] > 0 and entry["seconds"] > 0 for entry in summary["history"])
+
+    classifier = trained["model"].named_steps["classifier"]
+    features = trained["model"].named_steps["preprocessor"].get_feature_names_out()
+    weights = dict(zip(features, classifier.coef_[0]))
+    assert weights["num__num_late_payments_current"] > 0 and weights["num__income"] < 0
+
+
+def test_design_matrix_matches_the_pipeline_preprocessor(trained, tmp_path):
+    path = tmp_path / "sample.csv"
+    history(300, seed=1).to_csv(path, index=False)
+    reader = train.ChunkReader(str(path), "status", chunk_size=100, holdout_every=10)
+    space = train.FeatureSpace()
+    for numeric, categories, target, holdout in reader:
+        space.update(numeric, target, holdout)
+        space.observe(categories)
+    space.finalize()
+    preprocessor = space.preprocessor()
+
+    for numeric, categories, _, _ in reader:
+        codes = space.encode(categories)
+        expected = preprocessor.transform(pd.DataFrame(dict(zip(train.NUM_COLS, numeric.T), **codes)))
+        expected = expected.toarray() if hasattr(expected, "toarray") else expected
+        np.testing.assert_allclose(space.design_matrix(numeric, codes), expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize("suffix", [".pkl", ".npz"])
+def test_artifact_is_served_like_the_notebook_model(trained, tmp_path, suffix):
+    output = str(tmp_path / f"2.0{suffix}")
+    train.save(trained, output)
+    model = ScoringModel.load(output, "2.0")
+
+    frame = history(200, seed=2)
+    columns = {col: frame[col].to_numpy() for col in train.NUM_COLS + train.CAT_COLS}
+    columns["has_guarantee"] = (frame["has_guarantee"] == "Yes").astype(int).to_numpy()
+    encoded, errors = model.encode_categorical_batch(columns)
+    assert not errors and not any(model.category_encoder.unseen_counts().values())
+
+    served = model.predict_default_probabilities(encoded, len(frame))
+    reference = trained["model"].predict_proba(pd.DataFrame(encoded)[train.NUM_COLS + train.CAT_COLS])[:, 1]
+    np.testing.assert_allclose(served, reference, rtol=1e-9)
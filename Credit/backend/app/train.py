@@ -0,0 +1,482 @@
+"""
+Out-of-core training of the credit scoring model
+
+Replaces the notebook's in-memory fit for datasets that do not fit in memory.
+The input (CSV or Parquet, with the notebook's column names) is streamed in
+chunks, so peak memory is bounded by the chunk size, not the file size:
+
+1. One statistics pass fits the scaler (StandardScaler.partial_fit), collects
+   the category vocabularies and counts the classes.
+2. Each epoch streams the file again and updates a logistic-loss averaged
+   SGDClassifier with partial_fit, chunk by chunk, rows shuffled within each
+   chunk. Sample weights reproduce the notebook's class_weight='balanced'.
+
+Every holdout_every-th row is held out of training; after each epoch the
+holdout log-loss and AUC are reported with the epoch's wall-clock time and the
+process's peak memory, and training stops early once the log-loss stops
+improving by tol.
+
+The result has the keys the API loads (model, label_encoders, num_cols,
+cat_cols): a scikit-learn Pipeline of the same ColumnTransformer as the notebook
+and the SGD classifier, so it is served by the pipeline and the compiled scorer
+alike. Categoricals are normalized as the API preprocesses them (has_guarantee
+as 1/0), so served applications find their categories.
+
+Usage (from Credit/backend):
+    python -m app.train history.csv models/2.0.pkl --epochs 5 --chunk-size 100000
+    python -m app.train history.parquet models/2.0.npz
+    python -m app.train history.csv models/2.0.pkl --feature-store
+"""
+import argparse
+import logging
+import os
+import resource
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .encoding import CategoryTable, UNSEEN_FIRST_CLASS
+
+logger = logging.getLogger(__name__)
+
+# The notebook's features
+NUM_COLS = [
+    'age', 'income', 'loan_amount', 'interest_rate', 'turnover',
+    'customer_tenure', 'avg_days_late_current', 'num_late_payments_current', 'unpaid_amount',
+]
+CAT_COLS = ['industry_sector', 'credit_type', 'has_guarantee', 'guarantee_type', 'repayment_frequency']
+
+# Class every vocabulary includes for values training never saw
+UNKNOWN_CLASS = "<UNK>"
+# Spellings scoring.preprocess_record reads as a guarantee
+GUARANTEE_TRUE_VALUES = ('yes', 'true', '1')
+
+DEFAULT_CHUNK_SIZE = 100000
+
+
+def peak_memory_mb() -> float:
+    """Peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def iter_chunks(path: str, columns: List[str], chunk_size: int) -> Iterator["pd.DataFrame"]:
+    """Streams the listed columns of a CSV or Parquet file in chunks of chunk_size rows"""
+    if path.lower().endswith((".parquet", ".pq")):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+        return
+
+    import pandas as pd
+
+    # Only empty fields are missing: categories such as guarantee_type "None" stay strings, as the API sends them
+    with pd.read_csv(
+        path, usecols=columns, chunksize=chunk_size, dtype={col: str for col in CAT_COLS},
+        keep_default_na=False, na_values=[""],
+    ) as reader:
+        yield from reader
+
+
+def holdout_mask(first_row: int, n_rows: int, holdout_every: Optional[int]) -> np.ndarray:
+    """Marks every holdout_every-th row by its position in the file; none when holdout_every is 0 or None"""
+    if not holdout_every:
+        return np.zeros(n_rows, dtype=bool)
+    return (np.arange(first_row, first_row + n_rows) % holdout_every) == 0
+
+
+def normalize_categories(col: str, values: "pd.Series") -> np.ndarray:
+    """Category values as the API sends them to the encoder: has_guarantee as '1'/'0', missing values as 'missing'"""
+    text = values.astype(str)
+    if col == 'has_guarantee':
+        return np.where(text.str.strip().str.lower().isin(GUARANTEE_TRUE_VALUES).to_numpy(), "1", "0").astype(object)
+    normalized = text.to_numpy(dtype=object)
+    normalized[values.isna().to_numpy()] = "missing"
+    return normalized
+
+
+def encode_normalized(table: CategoryTable, values: np.ndarray) -> np.ndarray:
+    """
+    table.encode_array() for values from normalize_categories(): distinct values
+    are found by hashing rather than sorting the object array, which dominates
+    on large chunks
+    """
+    import pandas as pd
+
+    positions, uniques = pd.factorize(values)
+    return np.array([table.encode(value)[0] for value in uniques], dtype=np.int64)[positions]
+
+
+class ChunkReader:
+    """
+    Streams (numeric matrix, categorical arrays, target, holdout mask) per chunk
+
+    Rows with a missing or non-numeric feature are skipped. The target is the
+    target column or, when the data has none, the notebook's definition
+    avg_days_late_current > 0.
+    """
+
+    def __init__(self, path: str, target: str, chunk_size: int, holdout_every: Optional[int]):
+        self.path = path
+        self.target = target
+        self.chunk_size = chunk_size
+        self.holdout_every = holdout_every
+        self.skipped = 0
+
+        available = self._columns()
+        missing = [col for col in NUM_COLS + CAT_COLS if col not in available]
+        if missing:
+            raise ValueError(f"Training data is missing columns: {', '.join(missing)}")
+        self.has_target = target in available
+        self.columns = NUM_COLS + CAT_COLS + ([target] if self.has_target else [])
+
+    def _columns(self) -> List[str]:
+        if self.path.lower().endswith((".parquet", ".pq")):
+            import pyarrow.parquet as pq
+
+            return pq.ParquetFile(self.path).schema_arrow.names
+        import pandas as pd
+
+        return list(pd.read_csv(self.path, nrows=0).columns)
+
+    def __iter__(self) -> Iterator[Tuple[np.ndarray, Dict[str, np.ndarray], np.ndarray, np.ndarray]]:
+        import pandas as pd
+
+        self.skipped = 0
+        first_row = 0
+        for frame in iter_chunks(self.path, self.columns, self.chunk_size):
+            n_rows = len(frame)
+            numeric = np.column_stack([pd.to_numeric(frame[col], errors="coerce").to_numpy(dtype=float) for col in NUM_COLS])
+            holdout = holdout_mask(first_row, n_rows, self.holdout_every)
+            first_row += n_rows
+
+            valid = np.isfinite(numeric).all(axis=1)
+            if self.has_target:
+                target = pd.to_numeric(frame[self.target], errors="coerce").to_numpy(dtype=float)
+                valid &= np.isfinite(target)
+            else:
+                target = (numeric[:, NUM_COLS.index('avg_days_late_current')] > 0).astype(float)
+            if not valid.all():
+                self.skipped += int((~valid).sum())
+                frame, numeric, target, holdout = frame[valid], numeric[valid], target[valid], holdout[valid]
+
+            categories = {col: normalize_categories(col, frame[col]) for col in CAT_COLS}
+            yield numeric, categories, target.astype(np.int64), holdout
+
+
+class FeatureSpace:
+    """
+    The scaler, vocabularies and one-hot layout fitted in the statistics pass
+
+    design_matrix() produces exactly what the notebook's ColumnTransformer
+    outputs, so the classifier trained on it drops into that pipeline.
+    """
+
+    def __init__(self):
+        from sklearn.preprocessing import StandardScaler
+
+        self.scaler = StandardScaler()
+        self.vocabularies: Dict[str, set] = {col: set() for col in CAT_COLS}
+        self.class_counts = np.zeros(2, dtype=np.int64)
+        self.holdout_rows = 0
+
+    def update(self, numeric: np.ndarray, target: np.ndarray, holdout: np.ndarray):
+        """Adds a chunk's training rows to the scaler statistics and class counts"""
+        train = ~holdout
+        if train.any():
+            self.scaler.partial_fit(numeric[train])
+            self.class_counts += np.bincount(target[train], minlength=2)[:2]
+        self.holdout_rows += int(holdout.sum())
+
+    def observe(self, categories: Dict[str, np.ndarray]):
+        """Adds a chunk's category values to the vocabularies"""
+        import pandas as pd
+
+        for col, values in categories.items():
+            self.vocabularies[col].update(pd.unique(values).tolist())
+
+    def finalize(self):
+        """Builds the label classes (sorted, as LabelEncoder keeps them) and the one-hot layout"""
+        if self.class_counts.min() == 0:
+            raise ValueError(f"Training data needs both classes, got counts {self.class_counts.tolist()}")
+        self.classes = {col: sorted(self.vocabularies[col] | {UNKNOWN_CLASS}) for col in CAT_COLS}
+        self.tables = {col: CategoryTable(col, self.classes[col], UNSEEN_FIRST_CLASS) for col in CAT_COLS}
+        # One-hot categories are the label codes seen in the data; the unknown class never is
+        self.onehot_codes = {
+            col: np.array([code for code, value in enumerate(self.classes[col]) if value in self.vocabularies[col]])
+            for col in CAT_COLS
+        }
+        self.onehot_offsets = {}
+        offset = len(NUM_COLS)
+        for col in CAT_COLS:
+            position = np.full(len(self.classes[col]), -1, dtype=np.int64)
+            position[self.onehot_codes[col]] = np.arange(len(self.onehot_codes[col])) + offset
+            self.onehot_offsets[col] = position
+            offset += len(self.onehot_codes[col])
+        self.n_features = offset
+
+        total = self.class_counts.sum()
+        # class_weight='balanced': n_samples / (n_classes * class count)
+        self.class_weights = total / (2 * self.class_counts)
+
+    def encode(self, categories: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        return {col: encode_normalized(self.tables[col], values) for col, values in categories.items()}
+
+    def design_matrix(self, numeric: np.ndarray, codes: Dict[str, np.ndarray]) -> np.ndarray:
+        n_rows = numeric.shape[0]
+        matrix = np.zeros((n_rows, self.n_features))
+        matrix[:, :len(NUM_COLS)] = self.scaler.transform(numeric)
+        rows = np.arange(n_rows)
+        for col in CAT_COLS:
+            position = self.onehot_offsets[col][codes[col]]
+            known = position >= 0
+            matrix[rows[known], position[known]] = 1.0
+        return matrix
+
+    def label_encoders(self) -> dict:
+        from sklearn.preprocessing import LabelEncoder
+
+        encoders = {}
+        for col in CAT_COLS:
+            encoder = LabelEncoder()
+            encoder.classes_ = np.array(self.classes[col], dtype=object)
+            encoders[col] = encoder
+        return encoders
+
+    def preprocessor(self):
+        """The notebook's ColumnTransformer, fitted to this feature space"""
+        import pandas as pd
+        from sklearn.compose import ColumnTransformer
+        from sklearn.pipeline import Pipeline
+        from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+        preprocessor = ColumnTransformer(
+            transformers=[
+                ('num', Pipeline(steps=[('scaler', StandardScaler())]), NUM_COLS),
+                ('cat', Pipeline(steps=[('onehot', OneHotEncoder(handle_unknown='ignore'))]), CAT_COLS),
+            ],
+            remainder='drop',
+        )
+        # Fitted on a template frame holding every code, which gives the one-hot encoder
+        # exactly the training categories; the scaler then takes the streamed statistics
+        n_rows = max(len(codes) for codes in self.onehot_codes.values())
+        template = {col: np.resize(self.scaler.mean_[i], n_rows) for i, col in enumerate(NUM_COLS)}
+        template.update({col: np.resize(self.onehot_codes[col], n_rows) for col in CAT_COLS})
+        preprocessor.fit(pd.DataFrame(template))
+
+        scaler = preprocessor.named_transformers_['num'].named_steps['scaler']
+        for attribute in ('mean_', 'var_', 'scale_', 'n_samples_seen_'):
+            setattr(scaler, attribute, getattr(self.scaler, attribute))
+        return preprocessor
+
+
+def encoded_chunks(reader: ChunkReader, space: FeatureSpace) -> Iterator[Tuple[np.ndarray, Dict[str, np.ndarray], np.ndarray, np.ndarray]]:
+    """The reader's chunks with label codes in place of the category values"""
+    for numeric, categories, target, holdout in reader:
+        yield numeric, space.encode(categories), target, holdout
+
+
+def holdout_metrics(classifier, space: FeatureSpace, chunks, max_auc_rows: int = 200000) -> dict:
+    """Weighted log-loss over every holdout row and AUC over up to max_auc_rows of them"""
+    from sklearn.metrics import roc_auc_score
+
+    loss, weight_sum = 0.0, 0.0
+    scores: List[np.ndarray] = []
+    targets: List[np.ndarray] = []
+    kept = 0
+    for numeric, codes, target, holdout in chunks:
+        if not holdout.any():
+            continue
+        target = target[holdout]
+        matrix = space.design_matrix(numeric[holdout], {col: values[holdout] for col, values in codes.items()})
+        probability = np.clip(classifier.predict_proba(matrix)[:, 1], 1e-15, 1 - 1e-15)
+        weights = space.class_weights[target]
+        loss -= float(np.sum(weights * np.where(target == 1, np.log(probability), np.log(1 - probability))))
+        weight_sum += float(weights.sum())
+        if kept < max_auc_rows:
+            take = min(max_auc_rows - kept, len(target))
+            scores.append(probability[:take])
+            targets.append(target[:take])
+            kept += take
+
+    if not weight_sum:
+        return {"log_loss": None, "auc": None}
+    all_targets = np.concatenate(targets)
+    auc = roc_auc_score(all_targets, np.concatenate(scores)) if len(np.unique(all_targets)) == 2 else None
+    return {"log_loss": loss / weight_sum, "auc": auc}
+
+
+def train(
+    source,
+    target: str = "status",
+    epochs: int = 5,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    holdout_every: int = 10,
+    alpha: float = 1e-5,
+    eta0: float = 0.01,
+    tol: float = 1e-4,
+    seed: int = 42,
+    report=logger.info,
+) -> dict:
+    """
+    Trains on a CSV or Parquet file without loading it into memory
+
+    Args:
+        source: Path of the training data, or a feature_store.FeatureMatrix already
+            materialized from it, which skips parsing and encoding the file every pass
+
+    Returns:
+        The model artifact: model, label_encoders, num_cols, cat_cols, preprocessor,
+        and a training summary with the per-epoch metrics and timings
+
+    Raises:
+        ValueError: If the data lacks feature columns or one of the classes
+    """
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.pipeline import Pipeline
+
+    space = FeatureSpace()
+    started = time.perf_counter()
+    if isinstance(source, str):
+        reader = ChunkReader(source, target, chunk_size, holdout_every)
+        for numeric, categories, target_values, holdout in reader:
+            space.update(numeric, target_values, holdout)
+            space.observe(categories)
+        space.finalize()
+        source_name, skipped_rows = os.path.basename(source), reader.skipped
+
+        def chunks():
+            return encoded_chunks(reader, space)
+    else:
+        for numeric, _, target_values, holdout in source.chunks(chunk_size, holdout_every):
+            space.update(numeric, target_values, holdout)
+        space.vocabularies = {col: set(values) for col, values in source.vocabularies.items()}
+        space.finalize()
+        if space.classes != source.classes:
+            raise ValueError("Feature store classes do not match the training vocabularies")
+        source_name, skipped_rows = source.source, source.skipped_rows
+
+        def chunks():
+            return source.chunks(chunk_size, holdout_every)
+
+    train_rows = int(space.class_counts.sum())
+    report(
+        f"statistics pass: {train_rows} training rows, {space.holdout_rows} holdout rows, "
+        f"{skipped_rows} skipped, default rate {space.class_counts[1] / train_rows:.3f}, "
+        f"{time.perf_counter() - started:.1f}s, peak memory {peak_memory_mb():.0f} MB"
+    )
+
+    # Averaged SGD with a constant step: the average converges within an epoch or two, where
+    # the default 1 / (alpha * t) schedule takes huge first steps for a small alpha
+    classifier = SGDClassifier(
+        loss="log_loss", alpha=alpha, learning_rate="constant", eta0=eta0, average=True, random_state=seed
+    )
+    rng = np.random.default_rng(seed)
+    history = []
+    best_loss = np.inf
+    for epoch in range(1, epochs + 1):
+        started = time.perf_counter()
+        for numeric, codes, target_values, holdout in chunks():
+            train_rows_in_chunk = ~holdout
+            if not train_rows_in_chunk.any():
+                continue
+            order = rng.permutation(np.flatnonzero(train_rows_in_chunk))
+            matrix = space.design_matrix(numeric[order], {col: values[order] for col, values in codes.items()})
+            labels = target_values[order]
+            classifier.partial_fit(matrix, labels, classes=np.array([0, 1]), sample_weight=space.class_weights[labels])
+        train_seconds = time.perf_counter() - started
+
+        metrics = holdout_metrics(classifier, space, chunks())
+        entry = {
+            "epoch": epoch,
+            "seconds": round(train_seconds, 3),
+            "rows_per_second": round(train_rows / train_seconds) if train_seconds else None,
+            "peak_memory_mb": round(peak_memory_mb(), 1),
+            **metrics,
+        }
+        history.append(entry)
+        auc = f"{metrics['auc']:.4f}" if metrics["auc"] is not None else "n/a"
+        log_loss = f"{metrics['log_loss']:.4f}" if metrics["log_loss"] is not None else "n/a"
+        report(
+            f"epoch {epoch}: {train_seconds:.1f}s ({entry['rows_per_second']} rows/s), holdout log-loss {log_loss}, "
+            f"AUC {auc}, peak memory {entry['peak_memory_mb']:.0f} MB"
+        )
+        if metrics["log_loss"] is not None:
+            if best_loss - metrics["log_loss"] < tol:
+                report(f"holdout log-loss improved by less than {tol}, stopping")
+                break
+            best_loss = metrics["log_loss"]
+
+    model = Pipeline(steps=[('preprocessor', space.preprocessor()), ('classifier', classifier)])
+    return {
+        "model": model,
+        "preprocessor": model.named_steps['preprocessor'],
+        "label_encoders": space.label_encoders(),
+        "num_cols": list(NUM_COLS),
+        "cat_cols": list(CAT_COLS),
+        "training": {
+            "source": source_name,
+            "train_rows": train_rows,
+            "holdout_rows": space.holdout_rows,
+            "skipped_rows": skipped_rows,
+            "history": history,
+        },
+    }
+
+
+def save(model_data: dict, output: str):
+    """Writes a pickled artifact, or an exported one when output ends in .npz"""
+    directory = os.path.dirname(output)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    from .model_export import EXPORT_SUFFIX, export_model
+
+    if output.endswith(EXPORT_SUFFIX):
+        export_model(model_data, output)
+        return
+    import joblib
+
+    joblib.dump(model_data, output)
+
+
+def main(argv: Optional[List[str]] = None):
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("data", help="CSV or Parquet training data with the notebook's columns")
+    parser.add_argument("output", help="Artifact to write: <version>.pkl, or <version>.npz for the exported format")
+    parser.add_argument("--target", default="status", help="Target column; derived as the notebook does when absent")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows held in memory at a time")
+    parser.add_argument("--holdout-every", type=int, default=10, help="Hold out every Nth row for evaluation")
+    parser.add_argument("--alpha", type=float, default=1e-5, help="L2 regularization strength")
+    parser.add_argument("--eta0", type=float, default=0.01, help="SGD step size")
+    parser.add_argument("--tol", type=float, default=1e-4, help="Stop when holdout log-loss improves by less")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--feature-store", action="store_true",
+        help="Train from the cached feature matrix of the data (built on first use), see app.feature_store",
+    )
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    source = args.data
+    if args.feature_store:
+        from .feature_store import open_store
+
+        source = open_store(args.data, target=args.target, chunk_size=args.chunk_size)
+    model_data = train(
+        source, target=args.target, epochs=args.epochs, chunk_size=args.chunk_size,
+        holdout_every=args.holdout_every, alpha=args.alpha, eta0=args.eta0, tol=args.tol, seed=args.seed,
+    )
+    save(model_data, args.output)
+    logger.info(
+        f"wrote {args.output} in {time.perf_counter() - started:.1f}s total, peak memory {peak_memory_mb():.0f} MB"
+    )
+
+
+if __name__ == "__main__":
+    main()
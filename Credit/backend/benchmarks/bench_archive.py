@@ -0,0 +1,110 @@
+"""
+Prediction archival: run time and memory, storage, and the cost of reading history
+
+Seeds a SQLite database like bench_pagination (one prediction per second, 80%
+for one heavy user), then
+- times bulk inserts into the full table;
+- archives all but the last --keep-days days and reports rows/s, the growth of
+  peak memory during the run, and table versus Parquet size;
+- times the same inserts into the trimmed table;
+- times the first /predictions page and one past every table row (in timestamp order).
+
+Run from Credit/backend:
+    python benchmarks/bench_archive.py --rows 1000000 --db /tmp/archive.db
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import crud  # noqa: E402
+from app.archive import PredictionArchive, archive_predictions  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.train import peak_memory_mb  # noqa: E402
+from bench_pagination import HEAVY_USER, seed, timed  # noqa: E402
+
+
+def insert_rate(session, rows: int) -> float:
+    now = datetime.utcnow()
+    batch = [
+        {"client_name": f"new-{i}", "timestamp": now, "credit_score": 600, "risk_level": "Medium",
+         "decision": "Approved with conditions", "user_id": HEAVY_USER}
+        for i in range(500)
+    ]
+    started = time.perf_counter()
+    for _ in range(rows // len(batch)):
+        crud.insert_prediction_rows(session, batch)
+    return rows / (time.perf_counter() - started)
+
+
+def cursor_at(session, archive, order_by: str, depth: int, step: int = 5000):
+    """Cursor of the page starting depth rows into the heavy user's history"""
+    cursor = None
+    for _ in range(depth // step):
+        _, cursor = crud.get_predictions_page(
+            session, HEAVY_USER, limit=step, order_by=order_by, cursor=cursor, archive=archive
+        )
+    return cursor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Total predictions to seed")
+    parser.add_argument("--db", default="/tmp/bench_archive.db")
+    parser.add_argument("--keep-days", type=int, default=2, help="Days left in the table")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--inserts", type=int, default=20000)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    archive_dir = args.db + ".archive"
+    for path in (args.db, archive_dir):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+    engine = create_engine(f"sqlite:///{args.db}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    seed(session, args.rows)
+    table_mb = os.path.getsize(args.db) / 2**20
+    print(f"Seeded {args.rows} predictions over {args.rows / 86400:.1f} days ({table_mb:.0f} MB)")
+    last = datetime.fromisoformat(str(session.execute(text("SELECT max(timestamp) FROM predictions")).scalar()))
+    print(f"inserts into the full table:    {insert_rate(session, args.inserts):>10,.0f} rows/s")
+
+    before = last.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=args.keep_days - 1)
+    archive = PredictionArchive(archive_dir)
+    memory_before = peak_memory_mb()
+    started = time.perf_counter()
+    summary = archive_predictions(session, archive, before, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - started
+    stats = archive.stats()
+    print(f"archived {summary['archived']} rows into {stats['files']} files over {stats['days']} days "
+          f"in {elapsed:.1f}s ({summary['archived'] / elapsed:,.0f} rows/s), "
+          f"peak memory +{peak_memory_mb() - memory_before:.0f} MB")
+    session.execute(text("VACUUM"))
+    print(f"table {table_mb:.0f} MB -> {os.path.getsize(args.db) / 2**20:.0f} MB, "
+          f"archive {stats['bytes'] / 2**20:.0f} MB")
+    print(f"inserts into the trimmed table: {insert_rate(session, args.inserts):>10,.0f} rows/s")
+
+    live_rows = session.execute(text("SELECT count(*) FROM predictions WHERE user_id = :u"), {"u": HEAVY_USER}).scalar()
+    print(f"{'order':<14} {'first page ms':>14} {'deep page ms':>13}")
+    for order_by in ("timestamp", "credit_score"):
+        # Past every table row in timestamp order
+        cursor = cursor_at(session, archive, order_by, live_rows + 50000)
+        first = timed(lambda: crud.get_predictions_page(
+            session, HEAVY_USER, limit=args.page_size, order_by=order_by, archive=archive), 10)
+        archived = timed(lambda: crud.get_predictions_page(
+            session, HEAVY_USER, limit=args.page_size, order_by=order_by, cursor=cursor, archive=archive), 10)
+        print(f"{order_by:<14} {first:>14.2f} {archived:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
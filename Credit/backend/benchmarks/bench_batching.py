@@ -0,0 +1,75 @@
+"""
+/predict throughput and tail latency with micro-batching on and off
+
+Starts the API once per mode, with the result cache disabled so every request
+reaches the model, and reports p50/p99 latency and throughput at each client
+concurrency level, followed by the batcher's own stats (average and largest
+batch, longest batching wait) from /health. Pass --url to measure an already
+running server.
+
+Run from Credit/backend (needs httpx and uvicorn):
+    python benchmarks/bench_batching.py --requests 3000 --levels 1 8 32 128
+"""
+import argparse
+import asyncio
+
+import httpx
+
+from bench_concurrency import run_level, start_server, wait_until_ready
+
+MODES = {
+    "unbatched": {"PREDICT_BATCHING": "false", "PREDICTION_CACHE_SIZE": "0"},
+    "batched": {"PREDICT_BATCHING": "true", "PREDICTION_CACHE_SIZE": "0"},
+}
+
+
+def report(label: str, url: str, levels, total: int):
+    # Warm up connections, the model and the database
+    asyncio.run(run_level(url, 4, 50))
+    for concurrency in levels:
+        stats = asyncio.run(run_level(url, concurrency, total))
+        print(f"{label:<10} {concurrency:>6} {stats['p50']:>10.2f} {stats['p99']:>10.2f} {stats['rps']:>10.1f}")
+
+    batching = httpx.get(f"{url}/health").json().get("predict_batching")
+    if batching:
+        print(
+            f"{'':<10} batches {batching['batches']}, avg size {batching['avg_batch_size']}, "
+            f"largest {batching['largest_batch']}, longest wait {batching['max_wait_observed_ms']} ms "
+            f"(budget {batching['latency_budget_ms']} ms)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Benchmark a running server instead of starting one per mode")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per concurrency level")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--max-wait-ms", type=float, help="PREDICT_BATCH_MAX_WAIT_MS for the batched mode")
+    parser.add_argument("--max-size", type=int, help="PREDICT_BATCH_MAX_SIZE for the batched mode")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'conc':>6} {'p50 ms':>10} {'p99 ms':>10} {'req/s':>10}")
+    if args.url:
+        report("server", args.url, args.levels, args.requests)
+        return
+
+    for mode in args.modes:
+        env = dict(MODES[mode])
+        if mode == "batched" and args.max_wait_ms is not None:
+            env["PREDICT_BATCH_MAX_WAIT_MS"] = str(args.max_wait_ms)
+        if mode == "batched" and args.max_size is not None:
+            env["PREDICT_BATCH_MAX_SIZE"] = str(args.max_size)
+        url = f"http://127.0.0.1:{args.port}"
+        server = start_server(args.port, env)
+        try:
+            wait_until_ready(url)
+            report(mode, url, args.levels, args.requests)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
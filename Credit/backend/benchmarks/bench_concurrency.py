@@ -0,0 +1,133 @@
+"""
+Load test for /predict at increasing client concurrency
+
+Starts the API twice, once with scoring and database work inline on the event
+loop (INFERENCE_WORKERS=0, DB_WORKERS=0, the behaviour before the executors were
+introduced) and once with the bounded executors, then reports p50/p99 latency and
+throughput at each concurrency level. Pass --url to measure an already running server.
+
+Run from Credit/backend (needs httpx and uvicorn):
+    python benchmarks/bench_concurrency.py --requests 2000 --levels 1 16 64
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+APPLICATION = {
+    "client_name": "Load Test",
+    "age": 35,
+    "income": 60000,
+    "employment": "employed",
+    "loanAmount": 20000,
+    "loanPurpose": "business",
+    "location": "urban",
+    "phoneUsage": "moderate",
+    "utilityPayments": "good",
+    "interestRate": 7.5,
+    "turnover": 2500000,
+    "customerTenure": 12,
+    "avgDaysLateCurrent": 3,
+    "numLatePaymentsCurrent": 1,
+    "unpaidAmount": 0,
+    "industrySector": "Retail",
+    "creditType": "Term Loan",
+    "hasGuarantee": "yes",
+    "guaranteeType": "Collateral",
+    "repaymentFrequency": "Monthly",
+}
+
+MODES = {
+    "inline": {"INFERENCE_WORKERS": "0", "DB_WORKERS": "0"},
+    "executor": {},
+}
+
+
+async def run_level(url: str, concurrency: int, total: int) -> dict:
+    latencies = []
+    remaining = iter(range(total))
+
+    async def client(session: httpx.AsyncClient):
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await session.post(f"{url}/predict", json=APPLICATION)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    ms = np.array(latencies) * 1000
+    return {
+        "p50": np.percentile(ms, 50),
+        "p99": np.percentile(ms, 99),
+        "rps": len(latencies) / elapsed,
+    }
+
+
+def wait_until_ready(url: str, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{url}/health").status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become ready")
+
+
+def start_server(port: int, extra_env: dict) -> subprocess.Popen:
+    env = {**os.environ, **extra_env}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+
+
+def report(label: str, url: str, levels, total: int):
+    # Warm up connections, the model and the database
+    asyncio.run(run_level(url, 4, 50))
+    for concurrency in levels:
+        stats = asyncio.run(run_level(url, concurrency, total))
+        print(f"{label:<10} {concurrency:>6} {stats['p50']:>10.2f} {stats['p99']:>10.2f} {stats['rps']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Benchmark a running server instead of starting one per mode")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per concurrency level")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'conc':>6} {'p50 ms':>10} {'p99 ms':>10} {'req/s':>10}")
+    if args.url:
+        report("server", args.url, args.levels, args.requests)
+        return
+
+    for mode in args.modes:
+        url = f"http://127.0.0.1:{args.port}"
+        server = start_server(args.port, MODES[mode])
+        try:
+            wait_until_ready(url)
+            report(mode, url, args.levels, args.requests)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
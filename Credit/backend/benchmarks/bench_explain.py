@@ -0,0 +1,69 @@
+"""
+Per-row cost of key factors: model-derived contributions versus the fixed rules
+
+Encodes a synthetic portfolio once, then times LinearExplainer.explain_columns
+and the rule-based get_key_factors_batch on batches of each size, plus the
+single-application path /predict takes (ScoringModel.key_factors on a
+preprocessed record). Reports microseconds per row, best of --repeat runs.
+
+Run from Credit/backend:
+    python benchmarks/bench_explain.py --sizes 1 16 256 4096 65536
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import scoring  # noqa: E402
+from app.explain import LinearExplainer  # noqa: E402
+from bench_parallel_scoring import synthetic_portfolio  # noqa: E402
+
+
+def best_of(repeat: int, func, *args) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 16, 256, 4096, 65536])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--singles", type=int, default=2000, help="Records timed on the single-application path")
+    args = parser.parse_args()
+
+    scoring_model = scoring.current_model()
+    explainer = scoring_model.explainer or LinearExplainer(scoring_model.compiled_scorer, scoring_model.classes)
+    frame = synthetic_portfolio(max(args.sizes + [args.singles]))
+    raw = {field: frame[feature].to_numpy() for field, feature in scoring.FEATURE_MAPPING.items()}
+    columns = scoring_model.preprocess_columns(raw)
+    encoded, errors = scoring_model.encode_categorical_batch(columns)
+    assert not errors
+
+    print(f"{'rows':>8} {'model us/row':>14} {'rules us/row':>14}")
+    for size in args.sizes:
+        batch = {col: values[:size] for col, values in encoded.items()}
+        model_seconds = best_of(args.repeat, explainer.explain_columns, batch, size)
+        rules_seconds = best_of(args.repeat, scoring.get_key_factors_batch, batch)
+        print(f"{size:>8} {model_seconds / size * 1e6:>14.2f} {rules_seconds / size * 1e6:>14.2f}")
+
+    records = [{col: values[row] for col, values in columns.items()} for row in range(args.singles)]
+
+    def explain_singles(explain):
+        for record in records:
+            explain(record)
+
+    model_seconds = best_of(args.repeat, explain_singles, lambda record: (
+        explainer.explain_record(scoring_model.category_encoder.encode_record(record, count_unseen=False))
+    ))
+    rules_seconds = best_of(args.repeat, explain_singles, scoring.get_key_factors)
+    print(f"{'single':>8} {model_seconds / args.singles * 1e6:>14.2f} {rules_seconds / args.singles * 1e6:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
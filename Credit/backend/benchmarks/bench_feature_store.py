@@ -0,0 +1,78 @@
+"""
+Cold and warm load times of the training data: notebook-style parsing versus the feature store
+
+Writes a synthetic dataset in the notebook's columns, then times
+- the notebook's load: pd.read_csv and LabelEncoder.fit_transform per categorical;
+- a cold feature store: hashing, two streaming passes and writing the arrays;
+- a warm feature store: hashing the file and memory-mapping the arrays;
+- a full scan of the warm store (every page read, the cost of a first experiment).
+
+Run from Credit/backend:
+    python benchmarks/bench_feature_store.py --rows 500000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.feature_store import open_store  # noqa: E402
+from app.train import CAT_COLS, peak_memory_mb  # noqa: E402
+from bench_parallel_scoring import synthetic_portfolio  # noqa: E402
+
+
+def notebook_load(path: str):
+    from sklearn.preprocessing import LabelEncoder
+
+    frame = pd.read_csv(path)
+    for col in CAT_COLS:
+        frame[col] = LabelEncoder().fit_transform(frame[col].astype(str))
+    return frame
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_feature_store_")
+    try:
+        path = os.path.join(workdir, "history.csv")
+        synthetic_portfolio(args.rows).drop(columns=["client_name"]).to_csv(path, index=False)
+        store_dir = os.path.join(workdir, "store")
+        print(f"{args.rows} rows, CSV {os.path.getsize(path) / 1e6:.1f} MB")
+
+        frame, seconds = timed(notebook_load, path)
+        print(f"notebook load (read_csv + LabelEncoder): {seconds:8.3f}s  {frame.memory_usage(deep=True).sum() / 1e6:7.1f} MB in memory")
+        del frame
+
+        matrix, seconds = timed(open_store, path, store_dir=store_dir, chunk_size=args.chunk_size)
+        print(f"feature store, cold:                      {seconds:8.3f}s  {matrix.nbytes / 1e6:7.1f} MB on disk")
+        matrix, seconds = timed(open_store, path, store_dir=store_dir, chunk_size=args.chunk_size)
+        print(f"feature store, warm:                      {seconds:8.3f}s")
+
+        def scan():
+            return float(np.asarray(matrix.numeric, dtype=np.float64).sum()) + sum(int(c.sum()) for c in matrix.codes.values())
+
+        _, seconds = timed(scan)
+        print(f"warm store, full scan:                    {seconds:8.3f}s")
+        print(f"peak memory {peak_memory_mb():.0f} MB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
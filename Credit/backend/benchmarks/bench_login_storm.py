@@ -0,0 +1,84 @@
+"""
+Scoring latency while a login storm is running
+
+Measures /predict p50/p99 on a quiet server, then again while many clients
+hammer /login, for two configurations: bcrypt on the shared default thread pool
+(PASSWORD_HASH_WORKERS=0, no admission control) and on the dedicated bounded
+password pool. Login outcomes are counted so shed requests (503) are visible.
+
+Run from Credit/backend (needs httpx and uvicorn):
+    python benchmarks/bench_login_storm.py --storm-clients 64 --requests 500
+"""
+import argparse
+import asyncio
+from collections import Counter
+
+import httpx
+
+from bench_concurrency import run_level, start_server, wait_until_ready
+
+MODES = {
+    "default-pool": {"PASSWORD_HASH_WORKERS": "0"},
+    "bounded": {},
+}
+
+USER = {"email": "storm@example.com", "username": "storm", "password": "storm-password"}
+
+
+async def login_storm(url: str, clients: int, stop: asyncio.Event) -> Counter:
+    outcomes = Counter()
+    form = {"username": USER["email"], "password": USER["password"]}
+
+    async def client(session: httpx.AsyncClient):
+        while not stop.is_set():
+            response = await session.post(f"{url}/login", data=form)
+            outcomes[response.status_code] += 1
+
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=clients), timeout=120) as session:
+        await asyncio.gather(*(client(session) for _ in range(clients)))
+    return outcomes
+
+
+async def measure_under_storm(url: str, concurrency: int, total: int, storm_clients: int):
+    stop = asyncio.Event()
+    storm = asyncio.create_task(login_storm(url, storm_clients, stop))
+    await asyncio.sleep(1)  # let the storm build up
+    stats = await run_level(url, concurrency, total)
+    stop.set()
+    outcomes = await storm
+    return stats, outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="/predict requests per measurement")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent /predict clients")
+    parser.add_argument("--storm-clients", type=int, default=64, help="Concurrent /login clients")
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=list(MODES))
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    url = f"http://127.0.0.1:{args.port}"
+    print(f"{'mode':<14} {'phase':<7} {'p50 ms':>10} {'p99 ms':>10} {'req/s':>10}  logins")
+    for mode in args.modes:
+        server = start_server(args.port, MODES[mode])
+        try:
+            wait_until_ready(url)
+            httpx.post(f"{url}/register", json=USER)
+            asyncio.run(run_level(url, 4, 50))
+
+            quiet = asyncio.run(run_level(url, args.concurrency, args.requests))
+            print(f"{mode:<14} {'quiet':<7} {quiet['p50']:>10.2f} {quiet['p99']:>10.2f} {quiet['rps']:>10.1f}")
+
+            storm, outcomes = asyncio.run(
+                measure_under_storm(url, args.concurrency, args.requests, args.storm_clients)
+            )
+            logins = ", ".join(f"{code}: {count}" for code, count in sorted(outcomes.items()))
+            print(f"{mode:<14} {'storm':<7} {storm['p50']:>10.2f} {storm['p99']:>10.2f} {storm['rps']:>10.1f}  {logins}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+/predictions page latency by depth: OFFSET paging vs keyset cursors
+
+Seeds a SQLite database with one heavy user's history (plus other users' rows),
+then times fetching a page at depth 0, 10k and 100k with crud.get_predictions
+(offset/limit) and crud.get_predictions_page (cursor seek).
+
+Run from Credit/backend:
+    python benchmarks/bench_pagination.py --rows 200000 --db /tmp/pagination.db
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import crud, models  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.scoring import determine_decision, determine_risk_level  # noqa: E402
+
+HEAVY_USER = 1
+
+
+def seed(session, rows: int):
+    start = datetime(2024, 1, 1)
+    rng = np.random.default_rng(0)
+    chunk = 20000
+    for offset in range(0, rows, chunk):
+        n = min(chunk, rows - offset)
+        scores = rng.integers(300, 851, n)
+        users = np.where(rng.random(n) < 0.8, HEAVY_USER, rng.integers(2, 50, n))
+        crud.insert_prediction_rows(session, [
+            {
+                "client_name": f"client-{offset + i}",
+                "timestamp": start + timedelta(seconds=offset + i),
+                "credit_score": int(scores[i]),
+                "risk_level": determine_risk_level(int(scores[i])),
+                "decision": determine_decision(int(scores[i])),
+                "user_id": int(users[i]),
+            }
+            for i in range(n)
+        ])
+
+
+def timed(func, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return float(np.median(samples)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000, help="Total predictions to seed")
+    parser.add_argument("--db", default="/tmp/bench_pagination.db")
+    parser.add_argument("--depths", type=int, nargs="+", default=[0, 10000, 100000])
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+    engine = create_engine(f"sqlite:///{args.db}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    seed(session, args.rows)
+    heavy_rows = session.query(models.Prediction).filter(models.Prediction.user_id == HEAVY_USER).count()
+    print(f"Seeded {args.rows} predictions, {heavy_rows} for the heavy user")
+
+    print(f"{'order':<14} {'depth':>8} {'offset ms':>10} {'keyset ms':>10}")
+    for order_by in ("timestamp", "credit_score"):
+        for depth in args.depths:
+            if depth >= heavy_rows:
+                continue
+            cursor = None
+            if depth:
+                # Cursor for the row just before the page, located once outside the timing
+                previous = crud.get_predictions(session, HEAVY_USER, skip=depth - 1, limit=1, order_by=order_by)[0]
+                cursor = crud.encode_prediction_cursor(previous, order_by, "desc")
+
+            offset_ms = timed(
+                lambda: crud.get_predictions(session, HEAVY_USER, skip=depth, limit=args.page_size, order_by=order_by),
+                args.repeats,
+            )
+            keyset_ms = timed(
+                lambda: crud.get_predictions_page(
+                    session, HEAVY_USER, limit=args.page_size, order_by=order_by, cursor=cursor
+                ),
+                args.repeats,
+            )
+            print(f"{order_by:<14} {depth:>8} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+
+    session.close()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
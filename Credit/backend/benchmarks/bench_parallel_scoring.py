@@ -0,0 +1,87 @@
+"""
+Portfolio scoring throughput by worker count
+
+Builds a synthetic portfolio shaped like the training data (the notebook's
+num_cols and cat_cols, with a few unseen categories) and scores it in memory with
+parallel_scoring.ParallelScorer for each worker count, reporting rows/sec and
+speedup over one worker. Pool start-up is timed separately from scoring.
+
+Run from Credit/backend:
+    python benchmarks/bench_parallel_scoring.py --rows 1000000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import scoring  # noqa: E402
+from app.parallel_scoring import ParallelScorer  # noqa: E402
+
+
+def synthetic_portfolio(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    frame = {
+        "client_name": np.array([f"client-{i}" for i in range(n_rows)], dtype=object),
+        "age": rng.integers(19, 99, n_rows),
+        "income": rng.uniform(1_000, 300_000, n_rows),
+        "loan_amount": rng.uniform(500, 200_000, n_rows),
+        "interest_rate": rng.uniform(0.5, 30, n_rows),
+        "turnover": rng.uniform(1_000, 6_000_000, n_rows),
+        "customer_tenure": rng.integers(0, 60, n_rows),
+        "avg_days_late_current": rng.integers(0, 30, n_rows),
+        "num_late_payments_current": rng.integers(0, 6, n_rows),
+        "unpaid_amount": rng.uniform(0, 60_000, n_rows),
+    }
+    scoring_model = scoring.current_model()
+    for col in scoring_model.cat_cols:
+        choices = scoring_model.category_encoder.tables[col].known_values() + ["Unseen"]
+        frame[col] = rng.choice(np.array(choices, dtype=object), n_rows)
+    frame["has_guarantee"] = rng.choice(np.array(["Yes", "No"], dtype=object), n_rows)
+    return pd.DataFrame(frame)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument(
+        "--workers", type=int, nargs="+",
+        default=sorted({1, 2, 4, os.cpu_count() or 1}), help="Worker counts to compare",
+    )
+    args = parser.parse_args()
+
+    print(f"Generating {args.rows} synthetic applications...")
+    frame = synthetic_portfolio(args.rows)
+    print(f"{os.cpu_count()} CPUs available, chunk size {args.chunk_size}")
+    print(f"{'workers':>7} {'startup s':>10} {'score s':>9} {'rows/s':>12} {'speedup':>8} {'efficiency':>10}")
+
+    baseline = None
+    for workers in args.workers:
+        scorer = ParallelScorer(workers, args.chunk_size)
+        started = time.perf_counter()
+        scorer.start()
+        # Touch every worker once so process start-up is not counted as scoring time
+        list(scorer.imap(len, [("warm",)] * workers))
+        startup = time.perf_counter() - started
+
+        started = time.perf_counter()
+        result = scorer.score_frame(frame)
+        elapsed = time.perf_counter() - started
+        scorer.close()
+
+        assert len(result) == args.rows and result["row"].is_monotonic_increasing
+        baseline = baseline or elapsed
+        speedup = baseline / elapsed
+        print(
+            f"{workers:>7} {startup:>10.2f} {elapsed:>9.2f} {args.rows / elapsed:>12,.0f} "
+            f"{speedup:>7.2f}x {speedup / workers:>9.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
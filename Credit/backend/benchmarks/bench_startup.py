@@ -0,0 +1,96 @@
+"""
+Worker import-to-ready time by model artifact format
+
+Starts fresh interpreters that import app.main, run the startup handlers and
+score one application, which is when a new worker can take traffic. Reports the
+wall time from process spawn to ready, the part of it spent importing app.main,
+and whether pandas/sklearn ended up loaded, for the pickled artifact and for
+the same model exported with app.model_export.
+
+No database is needed: schema creation is a separate step (app.migrate) and the
+prediction log only connects when it has something to write.
+
+Run from Credit/backend:
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.scoring import MODEL_PATH  # noqa: E402
+
+CHILD = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+from app.main import app
+from app.scoring import current_model
+imported = time.perf_counter()
+
+async def serve():
+    async with app.router.lifespan_context(app):
+        scoring_model = current_model()
+        scoring_model.predict_default_probability({col: 1.0 for col in scoring_model.num_cols})
+        return time.perf_counter()
+
+ready = asyncio.run(serve())
+print(json.dumps({
+    "import": imported - started,
+    "in_process": ready - started,
+    "heavy_modules": [name for name in ("pandas", "sklearn", "imblearn", "scipy") if name in sys.modules],
+}))
+"""
+
+
+def measure(model_path: str, runs: int) -> dict:
+    env = {name: value for name, value in os.environ.items() if name not in ("MODEL_DIR", "SHADOW_MODELS")}
+    env.update(MODEL_PATH=model_path, PYTHONWARNINGS="ignore")
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+        ).stdout
+        total = time.perf_counter() - started
+        result = json.loads(output.strip().splitlines()[-1])
+        result["total"] = total
+        samples.append(result)
+    return {
+        "import": statistics.median(s["import"] for s in samples),
+        "in_process": statistics.median(s["in_process"] for s in samples),
+        "total": statistics.median(s["total"] for s in samples),
+        "heavy_modules": samples[-1]["heavy_modules"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes per format (median is reported)")
+    parser.add_argument("--model", default=MODEL_PATH, help="Pickled artifact to compare against its export")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        exported = os.path.join(tmp, "model.npz")
+        subprocess.run(
+            [sys.executable, "-m", "app.model_export", args.model, exported], cwd=BACKEND_DIR, check=True,
+            capture_output=True,
+        )
+
+        print(f"{'artifact':>8} {'import s':>9} {'ready s':>8} {'spawn-to-ready s':>17}  heavy modules loaded")
+        for label, path in (("pickle", args.model), ("npz", exported)):
+            result = measure(path, args.runs)
+            print(
+                f"{label:>8} {result['import']:>9.3f} {result['in_process']:>8.3f} {result['total']:>17.3f}  "
+                f"{', '.join(result['heavy_modules']) or '-'}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Throughput and server memory of /predict/stream on a large NDJSON upload
+
+Starts the API, uploads --rows synthetic applications as one chunked NDJSON
+request (every --bad-every'th line is malformed, to exercise inline errors) and
+reads the streamed results while the upload is still in progress, as a client of
+this endpoint must. Reports rows/s and the server's resident memory sampled
+during the stream, which should stay flat however many rows are sent.
+
+The upload uses a raw socket with a writer thread: httpx and http.client send the
+whole body before reading the response, which deadlocks once the unread results
+fill the socket buffers.
+
+Run from Credit/backend (needs httpx and uvicorn):
+    python benchmarks/bench_stream.py --rows 1000000
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_concurrency import APPLICATION, start_server, wait_until_ready  # noqa: E402
+
+LINES_PER_WRITE = 500
+
+
+def application_lines(n_distinct: int, seed: int = 0) -> list:
+    """Encoded NDJSON lines of varied applications, cycled through by the upload"""
+    rng = np.random.default_rng(seed)
+    lines = []
+    for i in range(n_distinct):
+        application = {
+            **APPLICATION,
+            "client_name": f"client-{i}",
+            "age": int(rng.integers(19, 99)),
+            "income": round(float(rng.uniform(1_000, 300_000)), 2),
+            "loanAmount": round(float(rng.uniform(500, 200_000)), 2),
+            "interestRate": round(float(rng.uniform(0.5, 30)), 2),
+            "avgDaysLateCurrent": int(rng.integers(0, 30)),
+            "numLatePaymentsCurrent": int(rng.integers(0, 6)),
+        }
+        lines.append(json.dumps(application).encode() + b"\n")
+    return lines
+
+
+def rss_mb(pid: int) -> dict:
+    """Current and peak resident memory of a process, from /proc"""
+    values = {}
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                values[key] = int(value.split()[0]) / 1024
+    return values
+
+
+def upload(sock: socket.socket, rows: int, lines: list, bad_every: int):
+    """Writes the request body in HTTP chunks of LINES_PER_WRITE lines"""
+    block = []
+    for i in range(rows):
+        block.append(b"{not json\n" if bad_every and i % bad_every == bad_every - 1 else lines[i % len(lines)])
+        if len(block) == LINES_PER_WRITE or i == rows - 1:
+            data = b"".join(block)
+            sock.sendall(b"%x\r\n%s\r\n" % (len(data), data))
+            block = []
+    sock.sendall(b"0\r\n\r\n")
+
+
+def stream(port: int, pid: int, rows: int, lines: list, bad_every: int) -> dict:
+    sock = socket.create_connection(("127.0.0.1", port))
+    sock.sendall(
+        b"POST /predict/stream HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+        b"Content-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n"
+    )
+    started = time.perf_counter()
+    writer = threading.Thread(target=upload, args=(sock, rows, lines, bad_every), daemon=True)
+    writer.start()
+
+    response = http.client.HTTPResponse(sock)
+    response.begin()
+    assert response.status == 200, response.status
+    received = errors = 0
+    summary = None
+    samples = []
+    next_sample = rows // 10
+    for line in response:
+        if line.startswith(b'{"summary"'):
+            summary = json.loads(line)["summary"]
+            continue
+        received += 1
+        if b'"error"' in line[:40]:
+            errors += 1
+        if received >= next_sample:
+            samples.append((received, rss_mb(pid)["VmRSS"]))
+            next_sample += rows // 10
+    elapsed = time.perf_counter() - started
+    writer.join()
+    sock.close()
+    return {"received": received, "errors": errors, "summary": summary, "seconds": elapsed, "samples": samples}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-rows", type=int, default=1000, help="STREAM_CHUNK_ROWS for the server")
+    parser.add_argument("--bad-every", type=int, default=1000, help="Make every Nth line malformed (0: none)")
+    parser.add_argument("--port", type=int, default=8768)
+    args = parser.parse_args()
+
+    lines = application_lines(1000)
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            "DATABASE_URL": f"sqlite:///{os.path.join(tmp, 'stream.db')}",
+            "MIGRATE_ON_STARTUP": "true",
+            "STREAM_CHUNK_ROWS": str(args.chunk_rows),
+        }
+        server = start_server(args.port, env)
+        try:
+            wait_until_ready(f"http://127.0.0.1:{args.port}")
+            idle = rss_mb(server.pid)
+            print(f"Streaming {args.rows} applications in chunks of {args.chunk_rows} rows "
+                  f"(server RSS at start {idle['VmRSS']:.0f} MB)")
+            result = stream(args.port, server.pid, args.rows, lines, args.bad_every)
+            after = rss_mb(server.pid)
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(f"{'rows':>10} {'server RSS MB':>14}")
+    for received, rss in result["samples"]:
+        print(f"{received:>10} {rss:>14.0f}")
+    print(f"{result['received']} results ({result['errors']} inline errors) in {result['seconds']:.1f}s: "
+          f"{result['received'] / result['seconds']:,.0f} rows/s")
+    print(f"summary line: {result['summary']}")
+    print(f"server RSS: start {idle['VmRSS']:.0f} MB, end {after['VmRSS']:.0f} MB, peak {after['VmHWM']:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()